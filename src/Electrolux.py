@@ -1,12 +1,19 @@
 import json
 from pathlib import Path
 
-import cv2
 import numpy as np
 
 from src.components.matrix_cam import MatrixCam
+from src.exposure.cache import ExposureCache
+from src.exposure.controller import ExposureController, SATURATION_MIN, SATURATION_MAX
+from src.transformation.hdr import merge_exposures
 from src.transformation.utils import eval_saturation
-from scipy.optimize import minimize
+from src.utils.catalog import AcquisitionCatalog
+from src.utils.image_writer import ImageWriter, NPY, write_image
+from src.utils.instrumentation import metrics
+
+# default config of the acquisitions
+CONFIG_PATH = Path("settings") / "config.json"
 
 
 def photo(cam: MatrixCam, exposure: float) -> tuple:
@@ -19,21 +26,22 @@ def photo(cam: MatrixCam, exposure: float) -> tuple:
     cam.set_exposure(int(exposure))
     img = cam.take_photo()
 
-    saturation_value = eval_saturation(img)
+    saturation_value = eval_saturation(img, cam.max_value)
 
     return img, saturation_value
 
 
-def binary_search(cam: MatrixCam, acquisition_attributes: json) -> int:
+def binary_search(cam: MatrixCam, acquisition_attributes: json, initial_exposure: float = None) -> int:
     """
     Search the perfect exposure time and save the image
     :param cam: camera
     :param acquisition_attributes: attributes for the saving of the image
+    :param initial_exposure: first exposure time, None for the middle of the range
     :return: exposure time
     """
     max_exposure = acquisition_attributes["max_exposure"]
     min_exposure = acquisition_attributes["min_exposure"]
-    search = int((min_exposure + max_exposure) / 2)
+    search = int((min_exposure + max_exposure) / 2) if initial_exposure is None else int(initial_exposure)
     while True:
         return_img, saturation_value = photo(cam, search)
         print("exposure:" + str(search))
@@ -57,6 +65,7 @@ def binary_search(cam: MatrixCam, acquisition_attributes: json) -> int:
             return search
 
 
+@metrics.timed('optimizer_step')
 def exposure_energy(x0: np.ndarray, params: list) -> float:
     """
     Energy function for the calculate of perfect exposure
@@ -70,25 +79,22 @@ def exposure_energy(x0: np.ndarray, params: list) -> float:
     return abs(saturation_value - 0.2)
 
 
-def main_automatic_acquisition() -> None:
+def search_exposure(cam: MatrixCam, acquisition_attributes: json, initial_exposure: float = None) -> tuple:
     """
-    Automatic acquisition
-    :return: none
+    Search the perfect exposure with binary_search refined by Nelder-Mead, one photo per step
+    :param cam: camera
+    :param acquisition_attributes: attributes for the saving of the image
+    :param initial_exposure: first exposure time of the binary search, None for the middle of the range
+    :return: exposure time, image and saturation
     """
+    # scipy takes half a second to import, only this fallback needs it
+    from scipy.optimize import minimize
 
-    # read json and create list
-    config_path = Path("settings") / "config.json"
-    with config_path.open() as filestream:
-        acquisition_attributes = json.load(filestream)
-
-    # set camera and calculate an initial exposure
-    cam = MatrixCam()
-
-    initial_exposure = binary_search(cam, acquisition_attributes["automatic_acquisition"])
+    initial_exposure = binary_search(cam, acquisition_attributes, initial_exposure)
 
     # set information and calculate the perfect exposure whit minimize
     x0 = np.array([initial_exposure])
-    params = [cam, acquisition_attributes["automatic_acquisition"]]
+    params = [cam, acquisition_attributes]
     bounds = [(1000, 999000)]
     res = \
         minimize(exposure_energy, x0, args=params, method='Nelder-Mead', tol=1e-2,
@@ -98,14 +104,203 @@ def main_automatic_acquisition() -> None:
     # take the optimal photo
     res = int(res)
     img, saturation_value = photo(cam, res)
+
+    return res, img, saturation_value
+
+
+def read_config(config_path=CONFIG_PATH) -> dict:
+    """
+    Read the config of the acquisitions
+    :param config_path: json file
+    :return: config
+    """
+    with Path(config_path).open() as filestream:
+        return json.load(filestream)
+
+
+def find_initial_exposure(cam: MatrixCam, automatic_acquisition: dict, acquisition_attributes: dict,
+                          cache: ExposureCache) -> tuple:
+    """
+    Start of the search from the last exposure of the same material and filter
+    :param cam: camera
+    :param automatic_acquisition: attributes of the acquisition
+    :param acquisition_attributes: whole config
+    :param cache: exposure cache
+    :return: initial exposure (None if unknown), min and max exposure of the search
+    """
+    material = automatic_acquisition["material"]
+    filter_name = automatic_acquisition["filtro"]
+    min_exposure = automatic_acquisition["min_exposure"]
+    max_exposure = automatic_acquisition["max_exposure"]
+    entry = cache.get(cam.serial, material, filter_name)
+    if entry is None and "catalog" in acquisition_attributes:
+        # no recent run on this camera: use the newest saved image of the material and filter
+        with AcquisitionCatalog(acquisition_attributes["catalog"].get("path", Path("data") / "catalog.sqlite")) \
+                as catalog:
+            catalog.update(automatic_acquisition["directory"])
+            catalog_exposure = catalog.latest_exposure(material, filter_name)
+        if catalog_exposure is not None:
+            entry = {"exposure": catalog_exposure}
+    if entry is None:
+        return None, min_exposure, max_exposure
+
+    min_exposure, max_exposure = cache.bounds(entry, min_exposure, max_exposure,
+                                              acquisition_attributes.get("exposure_cache", {}).get("margin", 4.0))
+    print('Cached exposure: {}'.format(entry["exposure"]))
+    return entry["exposure"], min_exposure, max_exposure
+
+
+def acquire(cam: MatrixCam, automatic_acquisition: dict, acquisition_attributes: dict, cache: ExposureCache,
+            writer: ImageWriter, initial_exposure: float = None) -> tuple:
+    """
+    Search the exposure of one acquisition, save its photo and update the cache
+    :param cam: open camera
+    :param automatic_acquisition: attributes of the acquisition
+    :param acquisition_attributes: whole config
+    :param cache: exposure cache
+    :param writer: writer of the photo
+    :param initial_exposure: first exposure time, None to take it from the cache or the catalog
+    :return: exposure time, image, saturation and path of the photo (with the extension of the writer format)
+    """
+    material = automatic_acquisition["material"]
+    filter_name = automatic_acquisition["filtro"]
+    if "pixel_format" in automatic_acquisition and automatic_acquisition["pixel_format"] != cam.pixel_format.name:
+        # e.g. Mono12 keeps the dynamic range for the separation of diffuse and specular
+        cam.set_pixel_format(automatic_acquisition["pixel_format"])
+
+    min_exposure = automatic_acquisition["min_exposure"]
+    max_exposure = automatic_acquisition["max_exposure"]
+    if initial_exposure is None:
+        initial_exposure, min_exposure, max_exposure = find_initial_exposure(cam, automatic_acquisition,
+                                                                             acquisition_attributes, cache)
+
+    result = None
+    if automatic_acquisition.get("exposure_control", "model") == "model":
+        # predict the exposure from the histogram of every photo
+        controller = ExposureController(min_exposure, max_exposure, max_value=cam.max_value)
+        # search on a smaller readout, the result is checked on the full frame
+        roi = automatic_acquisition.get("search_roi")
+        result = controller.run(cam, initial_exposure, tuple(roi) if roi is not None else None,
+                                automatic_acquisition.get("search_decimation", 1))
+
+    if result is not None and result.converged:
+        res, img, saturation_value = result.exposure, result.image, result.saturation
+    else:
+        # fall back to the search
+        res, img, saturation_value = search_exposure(cam, automatic_acquisition, initial_exposure)
+
+    # save the photo
+    path = writer.write(automatic_acquisition["directory"] + material + "_" + filter_name + "_00_%06d.png" % res, img)
+
+    if SATURATION_MIN < saturation_value <= SATURATION_MAX:
+        cache.put(cam.serial, material, filter_name, res, saturation_value)
+        cache.save()
+
+    return res, img, saturation_value, path
+
+
+def open_outputs(acquisition_attributes: dict) -> tuple:
+    """
+    Create exposure cache and image writer from the config, enable the instrumentation
+    :param acquisition_attributes: whole config
+    :return: exposure cache and image writer
+    """
+    cache_attributes = acquisition_attributes.get("exposure_cache", {})
+    cache = ExposureCache(cache_attributes.get("path", Path("settings") / "exposure_cache.json"),
+                          cache_attributes.get("max_age", 8 * 3600), cache_attributes.get("max_entries", 256))
+    if acquisition_attributes.get("instrumentation", {}).get("enabled", False):
+        metrics.enable()
+
+    # the photos are encoded in background while the camera goes on
+    writer_attributes = acquisition_attributes.get("image_writer", {})
+    writer = ImageWriter(writer_attributes.get("format", "png"), writer_attributes.get("png_level"),
+                         writer_attributes.get("workers", 2), writer_attributes.get("max_queue", 8))
+    return cache, writer
+
+
+def close_outputs(acquisition_attributes: dict, writer: ImageWriter) -> None:
+    """
+    Flush the image writer and report the instrumentation
+    :param acquisition_attributes: whole config
+    :param writer: image writer
+    :return: none
+    """
+    writer.close()
+
+    if metrics.enabled:
+        # latency of every stage of the run
+        metrics.report()
+        instrumentation_attributes = acquisition_attributes.get("instrumentation", {})
+        if "output" in instrumentation_attributes:
+            metrics.save(instrumentation_attributes["output"])
+
+
+def main_automatic_acquisition(acquisition_attributes: dict = None) -> None:
+    """
+    Automatic acquisition
+    :param acquisition_attributes: config, None to read settings/config.json
+    :return: none
+    """
+
+    # read json
+    if acquisition_attributes is None:
+        acquisition_attributes = read_config()
+    automatic_acquisition = acquisition_attributes["automatic_acquisition"]
+    cache, writer = open_outputs(acquisition_attributes)
+
+    # open the camera once for the whole search
+    with MatrixCam() as cam:
+        res, img, saturation_value, _ = acquire(cam, automatic_acquisition, acquisition_attributes, cache, writer)
     print('The optimised exposure value is: {}'.format(res))
     print('The saturation value is: {:.2f}'.format(saturation_value))
-    # save the photo
-    cv2.imwrite(
-        acquisition_attributes["automatic_acquisition"]["directory"] + acquisition_attributes["automatic_acquisition"][
-            "material"] + "_" + \
-        acquisition_attributes["automatic_acquisition"]["filtro"] + "_00_%06d.png" % res, img)
-    cam.close()
+    print('Photos taken: {}'.format(cam.captures))
+    close_outputs(acquisition_attributes, writer)
+
+
+def main_batch_acquisition(acquisition_attributes: dict = None) -> None:
+    """
+    Batch acquisition: every job of `acquisition_jobs` in one camera session, see AcquisitionScheduler
+    :param acquisition_attributes: config, None to read settings/config.json
+    :return: none
+    """
+    from src.batch_acquisition import AcquisitionScheduler
+
+    if acquisition_attributes is None:
+        acquisition_attributes = read_config()
+    cache, writer = open_outputs(acquisition_attributes)
+
+    with MatrixCam() as cam:
+        scheduler = AcquisitionScheduler(acquisition_attributes, cache, writer)
+        scheduler.run(cam)
+    scheduler.report()
+    close_outputs(acquisition_attributes, writer)
+
+
+def main_bracketing_acquisition(acquisition_attributes: dict = None) -> None:
+    """
+    Bracketing acquisition: one photo for every exposure of the config in a single session, merged
+    into a float radiance map saved as .npy
+    :param acquisition_attributes: config, None to read settings/config.json
+    :return: none
+    """
+
+    # read json
+    if acquisition_attributes is None:
+        acquisition_attributes = read_config()
+    bracketing_acquisition = acquisition_attributes["bracketing_acquisition"]
+    exposures = bracketing_acquisition["exposures"]
+
+    with MatrixCam() as cam:
+        if "pixel_format" in bracketing_acquisition:
+            cam.set_pixel_format(bracketing_acquisition["pixel_format"])
+        images = cam.capture_bracket(exposures)
+    for exposure, img in zip(exposures, images):
+        print('exposure: {} saturation: {:.2f}'.format(exposure, eval_saturation(img, cam.max_value)))
+
+    # the radiance map is in pixel values of the shortest exposure
+    radiance = merge_exposures(images, exposures, cam.max_value)
+    write_image(bracketing_acquisition["directory"] + bracketing_acquisition["material"] + "_" +
+                bracketing_acquisition["filtro"] + "_00_%06d.npy" % min(exposures), radiance, NPY)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,204 @@
+import time
+from typing import List, Optional
+
+from src.Electrolux import acquire, find_initial_exposure
+from src.components.matrix_cam import MatrixCam
+from src.exposure.cache import ExposureCache
+from src.utils.image_writer import ImageWriter
+
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+# keys every job must have, after the defaults of `automatic_acquisition`
+REQUIRED_KEYS = ('material', 'filtro', 'directory', 'min_exposure', 'max_exposure')
+
+
+class AcquisitionJob:
+    def __init__(self, index: int, attributes: dict):
+        """
+        One acquisition of a batch and its outcome
+        :param index: position of the job in the config
+        :param attributes: attributes of the acquisition, same keys of `automatic_acquisition`
+        """
+        self.index = index
+        self.attributes = attributes
+        self.material = attributes.get("material")
+        self.filter_name = attributes.get("filtro")
+        self.pixel_format = attributes.get("pixel_format")
+
+        # exposure expected before the run, used only to order the jobs
+        self.expected_exposure = None
+
+        # outcome
+        self.status = None
+        self.exposure = None
+        self.saturation = None
+        self.path = None
+        self.captures = 0
+        self.attempts = 0
+        self.seconds = 0.0
+        self.error = None
+
+    def missing_keys(self) -> List[str]:
+        return [key for key in REQUIRED_KEYS if key not in self.attributes]
+
+    @property
+    def valid(self) -> bool:
+        return not self.missing_keys()
+
+    def __repr__(self) -> str:
+        return 'AcquisitionJob({}, {}, {})'.format(self.index, self.material, self.filter_name)
+
+
+class AcquisitionScheduler:
+    def __init__(self, acquisition_attributes: dict, cache: ExposureCache, writer: ImageWriter):
+        """
+        Run a list of acquisitions on one open camera. The jobs are ordered to limit the device
+        reconfigurations (jobs with the same pixel format run together) and the exposure swings (every
+        group runs by expected exposure, one group up and the next down), the exposure found by a job
+        is the start of the search of the related jobs. A failed job is tried again and then skipped,
+        the other jobs go on.
+
+        The jobs are the list `acquisition_jobs` of the config, every job takes the missing keys from
+        `automatic_acquisition`:
+
+        >>> "acquisition_jobs": [{"material": "forno1", "filtro": "ortogonale"},
+        >>>                      {"material": "forno1", "filtro": "parallelo", "pixel_format": "Mono12"}]
+
+        :param acquisition_attributes: whole config
+        :param cache: exposure cache
+        :param writer: writer of the photos
+        """
+        self.acquisition_attributes = acquisition_attributes
+        self.cache = cache
+        self.writer = writer
+        self.retries = acquisition_attributes.get("batch_acquisition", {}).get("retries", 1)
+
+        defaults = acquisition_attributes.get("automatic_acquisition", {})
+        self.jobs = [AcquisitionJob(i, dict(defaults, **attributes))
+                     for i, attributes in enumerate(acquisition_attributes.get("acquisition_jobs", []))]
+        self.session_seconds = 0.0
+
+    def order(self, cam: MatrixCam, jobs: List[AcquisitionJob]) -> List[AcquisitionJob]:
+        """
+        Order the jobs: by pixel format, starting from the current one of the camera, and inside a
+        pixel format by expected exposure. A job without a known exposure follows the jobs of the same
+        material, the unknown materials go at the end of their group.
+        :param cam: open camera
+        :param jobs: jobs to order
+        :return: ordered jobs
+        """
+        by_material = {}
+        for job in jobs:
+            if not job.valid:
+                continue
+            job.expected_exposure = find_initial_exposure(cam, job.attributes, self.acquisition_attributes,
+                                                          self.cache)[0]
+            if job.expected_exposure is not None:
+                by_material.setdefault(job.material, []).append(job.expected_exposure)
+        for job in jobs:
+            if job.expected_exposure is None and job.material in by_material:
+                job.expected_exposure = max(by_material[job.material])
+
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.pixel_format or cam.pixel_format.name, []).append(job)
+
+        ordered = []
+        ascending = True
+        for pixel_format in sorted(groups, key=lambda name: name != cam.pixel_format.name):
+            # the next group starts from the exposure where this one ends
+            direction = 1 if ascending else -1
+            ordered.extend(sorted(groups[pixel_format], key=lambda job: (
+                job.expected_exposure is None, direction * (job.expected_exposure or 0), str(job.material),
+                str(job.filter_name))))
+            ascending = not ascending
+        return ordered
+
+    def initial_exposure(self, job: AcquisitionJob, found: dict, last_exposure: Optional[int]) -> Optional[float]:
+        """
+        Start of the search of a job
+        :param job: job
+        :param found: exposures found in this session by material and filter
+        :param last_exposure: exposure of the last job
+        :return: exposure found in this session for the same material and filter, else the one expected
+                 from the cache or the catalog, else the last exposure of the session (None to search from
+                 the middle of the range)
+        """
+        if (job.material, job.filter_name) in found:
+            return found[(job.material, job.filter_name)]
+        if job.expected_exposure is not None:
+            return job.expected_exposure
+        return last_exposure
+
+    def run_job(self, cam: MatrixCam, job: AcquisitionJob, initial_exposure: Optional[float]) -> None:
+        """
+        Run a job with its retries
+        :param cam: open camera
+        :param job: job
+        :param initial_exposure: first exposure time of the search
+        :return: none
+        """
+        if job.attributes.get("skip", False) or not job.valid:
+            job.status = SKIPPED
+            job.error = 'skip' if job.valid else 'missing {}'.format(', '.join(job.missing_keys()))
+            return
+
+        start = time.perf_counter()
+        captures = cam.captures
+        while job.status is None:
+            job.attempts += 1
+            try:
+                job.exposure, _, job.saturation, job.path = acquire(cam, job.attributes, self.acquisition_attributes,
+                                                                    self.cache, self.writer, initial_exposure)
+                job.status = DONE
+            except Exception as e:
+                job.error = '{}: {}'.format(type(e).__name__, e)
+                print('Job {} failed (attempt {}): {}'.format(job.index, job.attempts, job.error))
+                if job.attempts > self.retries:
+                    job.status = FAILED
+                else:
+                    # frames of the failed attempt must not reach the next one
+                    cam.reset_the_queue(cam.device_interface)
+                    # the last exposure may be the cause, search again from the cache
+                    initial_exposure = None
+        job.captures = cam.captures - captures
+        job.seconds = time.perf_counter() - start
+
+    def run(self, cam: MatrixCam) -> List[AcquisitionJob]:
+        """
+        Run every job on an open camera
+        :param cam: open camera
+        :return: jobs in run order with their outcome
+        """
+        start = time.perf_counter()
+        found = {}
+        last_exposure = None
+        jobs = self.order(cam, self.jobs)
+        for job in jobs:
+            print('Job {}: {} {}'.format(job.index, job.material, job.filter_name))
+            self.run_job(cam, job, self.initial_exposure(job, found, last_exposure))
+            if job.status == DONE:
+                found[(job.material, job.filter_name)] = job.exposure
+                last_exposure = job.exposure
+        self.session_seconds = time.perf_counter() - start
+        self.jobs = jobs
+        return jobs
+
+    def report(self) -> None:
+        """
+        Print the outcome of every job and the time of the session
+        :return: none
+        """
+        print('{:>4s} {:16s} {:12s} {:8s} {:>9s} {:>8s} {:>8s} {:>9s}'.format(
+            'job', 'material', 'filter', 'status', 'exposure', 'satur.', 'photos', 'seconds'))
+        for job in self.jobs:
+            print('{:4d} {:16s} {:12s} {:8s} {:>9s} {:>8s} {:8d} {:9.2f}{}'.format(
+                job.index, str(job.material), str(job.filter_name), str(job.status),
+                '' if job.exposure is None else str(job.exposure),
+                '' if job.saturation is None else '{:.2f}'.format(job.saturation),
+                job.captures, job.seconds, '' if job.error is None else '  ' + job.error))
+        print('Jobs done: {}/{}, photos: {}, session time: {:.2f} s'.format(
+            sum(job.status == DONE for job in self.jobs), len(self.jobs),
+            sum(job.captures for job in self.jobs), self.session_seconds))
@@ -0,0 +1,227 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+
+from src.transformation.conversions import compute_diff_spec_uint8
+from src.utils.catalog import AcquisitionCatalog
+from src.utils.filenames import ORTHOGONAL_FILTERS, PARALLEL_FILTERS, parse_acquisition_name
+from src.utils.image_writer import write_image
+
+STAGES = ('decode', 'process', 'encode')
+
+
+class ImagePair:
+    def __init__(self, material: str, orthogonal_path: Path, parallel_path: Path, output_directory: Path):
+        """
+        Orthogonal and parallel images of a material and the outputs computed from them
+        :param material: material
+        :param orthogonal_path: image with the orthogonal filter
+        :param parallel_path: image with the parallel filter
+        :param output_directory: directory of the diffuse and specular images
+        """
+        self.material = material
+        self.orthogonal_path = orthogonal_path
+        self.parallel_path = parallel_path
+        self.diffuse_path = output_directory / '{}_diffuse_00_0000000.png'.format(material)
+        self.specular_path = output_directory / '{}_speculare_00_0000000.png'.format(material)
+
+    def is_up_to_date(self) -> bool:
+        """
+        Check if the outputs are newer than both inputs
+        :return: True if there is nothing to do
+        """
+        try:
+            newest_input = max(os.stat(self.orthogonal_path).st_mtime, os.stat(self.parallel_path).st_mtime)
+            oldest_output = min(os.stat(self.diffuse_path).st_mtime, os.stat(self.specular_path).st_mtime)
+        except FileNotFoundError:
+            return False
+        return oldest_output >= newest_input
+
+
+def _filter_kind(filter_name: str) -> Optional[str]:
+    if filter_name in ORTHOGONAL_FILTERS:
+        return 'orthogonal'
+    if filter_name in PARALLEL_FILTERS:
+        return 'parallel'
+    return None
+
+
+def _walk_acquisitions(directory: Path):
+    """
+    Acquisition files of a directory tree read from disk
+    :return: generator of directory, material, filter, mtime and path
+    """
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if not file.endswith('.png'):
+                continue
+            name = parse_acquisition_name(file)
+            if name is None:
+                continue
+            path = Path(root) / file
+            yield root, name.material, name.filter_name, os.stat(path).st_mtime, path
+
+
+def _catalog_acquisitions(directory: Path, catalog: AcquisitionCatalog):
+    """
+    Acquisition files of a directory tree read from the catalog
+    :return: generator of directory, material, filter, mtime and path
+    """
+    catalog.update(directory)
+    for entry in catalog.query(directory=directory):
+        yield os.path.dirname(entry.path), entry.material, entry.filter_name, entry.mtime, Path(entry.path)
+
+
+def discover_pairs(directory: Path, output_directory: Optional[Path] = None,
+                   catalog: Optional[AcquisitionCatalog] = None) -> List[ImagePair]:
+    """
+    Find the orthogonal/parallel pairs named <material>_<filter>_00_<exposure>.png, when a material
+    has more images with the same filter the newest one is used
+    :param directory: directory of the acquisitions, sub directories included
+    :param output_directory: directory of the outputs, None to write next to the inputs
+    :param catalog: catalog of the acquisitions, None to walk the directory
+    :return: list of pairs
+    """
+    if catalog is None:
+        acquisitions = _walk_acquisitions(directory)
+    else:
+        acquisitions = _catalog_acquisitions(directory, catalog)
+
+    newest = {}
+    for root, material, filter_name, mtime, path in acquisitions:
+        kind = _filter_kind(filter_name)
+        if kind is None:
+            continue
+        key = (root, material, kind)
+        if key not in newest or mtime > newest[key][0]:
+            newest[key] = (mtime, path)
+
+    pairs = []
+    for (root, material, kind), (_, orthogonal_path) in sorted(newest.items()):
+        if kind != 'orthogonal' or (root, material, 'parallel') not in newest:
+            continue
+        parallel_path = newest[(root, material, 'parallel')][1]
+        pair_output_directory = Path(root) if output_directory is None else Path(output_directory)
+        pairs.append(ImagePair(material, orthogonal_path, parallel_path, pair_output_directory))
+
+    return pairs
+
+
+def process_pair(pair: ImagePair) -> dict:
+    """
+    Decode, separate and encode a pair, runs in a worker process
+    :param pair: pair to process
+    :return: time of every stage in seconds
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    orthogonal_img = cv2.imread(str(pair.orthogonal_path))
+    parallel_img = cv2.imread(str(pair.parallel_path))
+    if orthogonal_img is None or parallel_img is None:
+        raise IOError('cannot read {} or {}'.format(pair.orthogonal_path, pair.parallel_path))
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output_diffuse, output_pure_specular = compute_diff_spec_uint8(orthogonal_img, parallel_img)
+    timings['process'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pair.diffuse_path.parent.mkdir(parents=True, exist_ok=True)
+    # atomic writes: an interrupted batch never leaves a partial output that looks up to date
+    write_image(pair.specular_path, output_pure_specular)
+    write_image(pair.diffuse_path, output_diffuse)
+    timings['encode'] = time.perf_counter() - start
+
+    return timings
+
+
+def run_batch(pairs: List[ImagePair], workers: Optional[int] = None, max_in_flight: Optional[int] = None,
+              force: bool = False) -> dict:
+    """
+    Process the pairs on a process pool, at most max_in_flight pairs are submitted at once
+    :param pairs: pairs to process
+    :param workers: number of processes, None for the number of cpus
+    :param max_in_flight: max number of pairs submitted and not completed, None for 2 * workers
+    :param force: process also the pairs with up to date outputs
+    :return: report with processed, skipped and failed pairs, throughput and stage times
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    todo = [pair for pair in pairs if force or not pair.is_up_to_date()]
+    report = {
+        'processed': 0,
+        'skipped': len(pairs) - len(todo),
+        'failed': [],
+        'stage_seconds': {stage: 0.0 for stage in STAGES},
+    }
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        remaining = iter(todo)
+        while True:
+            # keep the pool fed without queueing every pair
+            for pair in remaining:
+                pending[executor.submit(process_pair, pair)] = pair
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pair = pending.pop(future)
+                try:
+                    timings = future.result()
+                except Exception as e:
+                    report['failed'].append((pair.material, str(e)))
+                    continue
+                report['processed'] += 1
+                for stage in STAGES:
+                    report['stage_seconds'][stage] += timings[stage]
+    report['elapsed'] = time.perf_counter() - start
+    report['pairs_per_second'] = report['processed'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+
+    return report
+
+
+def print_report(report: dict) -> None:
+    """
+    Print the report of run_batch
+    :param report: report
+    :return: none
+    """
+    print('processed {} pairs, skipped {} up to date, {} failed in {:.2f} s ({:.2f} pairs/s)'.format(
+        report['processed'], report['skipped'], len(report['failed']), report['elapsed'], report['pairs_per_second']))
+    for stage in STAGES:
+        mean = report['stage_seconds'][stage] / max(report['processed'], 1)
+        print('  {:8s} {:8.2f} ms/pair'.format(stage, mean * 1000))
+    for material, error in report['failed']:
+        print('  failed {}: {}'.format(material, error))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compute diffuse and specular images of every acquisition pair')
+    parser.add_argument('directory', type=Path, nargs='?', default=Path('data'))
+    parser.add_argument('--output', type=Path, default=None, help='output directory, default next to the inputs')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-in-flight', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='process also the pairs with up to date outputs')
+    parser.add_argument('--catalog', type=Path, default=None, help='catalog database used instead of walking')
+    args = parser.parse_args()
+
+    if args.catalog is None:
+        pairs = discover_pairs(args.directory, args.output)
+    else:
+        with AcquisitionCatalog(args.catalog) as catalog:
+            pairs = discover_pairs(args.directory, args.output, catalog)
+    print_report(run_batch(pairs, args.workers, args.max_in_flight, args.force))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Photos and time of a list of acquisitions on the simulated camera: one camera session and one cold
+search for every job, in config order, against the scheduler (one session, jobs ordered by pixel
+format and exposure, exposures shared between the jobs):
+
+    python -m src.benchmarks.bench_batch_acquisition --materials 4
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from src.components import simulated_acquire
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--materials', type=int, default=4)
+    parser.add_argument('--scene-exposure', type=int, default=100000)
+    parser.add_argument('--time-scale', type=float, default=0.1)
+    parser.add_argument('--open-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=640, height=480, scene_exposure=args.scene_exposure, time_scale=args.time_scale,
+                              open_delay=args.open_delay)
+    from src.Electrolux import acquire
+    from src.batch_acquisition import AcquisitionScheduler, DONE
+    from src.components.matrix_cam import MatrixCam
+    from src.exposure.cache import ExposureCache
+    from src.utils.image_writer import ImageWriter
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the two filters of every material, half of the materials in 12 bit, in an unfavourable order
+        jobs = [{"material": "forno{}".format(i), "filtro": filter_name,
+                 "pixel_format": "Mono12" if i % 2 else "Mono8"}
+                for filter_name in ("ortogonale", "parallelo") for i in range(args.materials)]
+        acquisition_attributes = {
+            "automatic_acquisition": {"min_exposure": 1000, "max_exposure": 999000,
+                                      "directory": directory + "/"},
+            "acquisition_jobs": jobs,
+        }
+
+        # one session for every job, the cache starts empty as on a new camera
+        start = time.perf_counter()
+        captures = 0
+        with ImageWriter() as writer, contextlib.redirect_stdout(io.StringIO()):
+            cache = ExposureCache(Path(directory) / 'cache_sessions.json')
+            for job in jobs:
+                cache.entries = {}
+                with MatrixCam() as cam:
+                    acquire(cam, dict(acquisition_attributes["automatic_acquisition"], **job), acquisition_attributes,
+                            cache, writer)
+                captures += cam.captures
+        sessions_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ImageWriter() as writer, contextlib.redirect_stdout(io.StringIO()):
+            scheduler = AcquisitionScheduler(acquisition_attributes,
+                                             ExposureCache(Path(directory) / 'cache_scheduler.json'), writer)
+            with MatrixCam() as cam:
+                scheduled_jobs = scheduler.run(cam)
+        scheduler_time = time.perf_counter() - start
+        assert all(job.status == DONE for job in scheduled_jobs)
+
+    print('{} jobs'.format(len(jobs)))
+    print('session per job: {:4d} photos {:8.2f} s'.format(captures, sessions_time))
+    print('scheduler:       {:4d} photos {:8.2f} s'.format(cam.captures, scheduler_time))
+    scheduler.report()
+
+
+if __name__ == '__main__':
+    main()
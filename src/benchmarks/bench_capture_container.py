@@ -0,0 +1,71 @@
+"""
+Time to save and to reload a run of frames as loose png files and in a capture container, on the
+simulated camera:
+
+    python -m src.benchmarks.bench_capture_container --frames 30
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.components import simulated_acquire
+from src.utils.capture_container import CaptureContainer
+from src.utils.filenames import acquisition_filename
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--width', type=int, default=2592)
+    parser.add_argument('--height', type=int, default=1944)
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=args.width, height=args.height, exposure=1000, readout_delay=0, open_delay=0)
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam, tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        cam.reset_the_queue(cam.device_interface)
+        frames = cam.acquire_frames(cam.device, cam.device_interface, -1, args.frames)
+
+        start = time.perf_counter()
+        paths = []
+        for i, img in enumerate(frames):
+            paths.append(directory / 'png' / acquisition_filename('forno1', 'ortogonale', i + 1))
+            paths[-1].parent.mkdir(exist_ok=True)
+            cv2.imwrite(str(paths[-1]), img)
+        png_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with CaptureContainer(directory / 'run.capture', cam.get_format()) as container:
+            for i, img in enumerate(frames):
+                container.append(img, i + 1, serial=cam.serial, material='forno1', filter_name='ortogonale')
+        container_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        png_sum = sum(int(cv2.imread(str(path), cv2.IMREAD_GRAYSCALE).sum(dtype=np.int64)) for path in paths)
+        png_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        container = CaptureContainer(directory / 'run.capture')
+        container_sum = sum(int(frame.sum(dtype=np.int64)) for frame in container.frames)
+        container_read = time.perf_counter() - start
+        assert png_sum == container_sum
+
+        # the export gives back the loose files
+        exported = container.export_png(directory / 'export', [0])
+        assert np.array_equal(cv2.imread(str(exported[0]), cv2.IMREAD_GRAYSCALE), frames[0][:, :, 0])
+
+    print('{} frames of {}x{}'.format(args.frames, args.width, args.height))
+    print('{:18s} write {:8.1f} ms/frame  read {:8.1f} ms/frame'.format(
+        'png files', png_write * 1000 / args.frames, png_read * 1000 / args.frames))
+    print('{:18s} write {:8.1f} ms/frame  read {:8.1f} ms/frame'.format(
+        'capture container', container_write * 1000 / args.frames, container_read * 1000 / args.frames))
+
+
+if __name__ == '__main__':
+    main()
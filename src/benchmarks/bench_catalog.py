@@ -0,0 +1,88 @@
+"""
+Time of the acquisition catalog on a synthetic tree of empty acquisition files compared to a full
+directory walk:
+
+    python -m src.benchmarks.bench_catalog --files 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from src.utils.catalog import AcquisitionCatalog
+from src.utils.filenames import acquisition_filename, parse_acquisition_name
+
+FILTERS = ('nofiltro', 'filtroortogonale', 'filtroparallelo')
+
+
+def create_tree(root: Path, files: int, files_per_directory: int) -> None:
+    """
+    Create empty acquisition files
+    :param root: root directory
+    :param files: number of files
+    :param files_per_directory: number of files in every directory
+    :return: none
+    """
+    for i in range(files):
+        directory = root / 'acquisizione_{}'.format(i // files_per_directory)
+        if i % files_per_directory == 0:
+            directory.mkdir()
+        name = acquisition_filename('materiale{}'.format(i % 50), FILTERS[i % 3], 1000 + i, gain=i % 16)
+        (directory / name).touch()
+
+
+def walk_gain_range(root: Path, filter_name: str) -> tuple:
+    """
+    Gain range computed walking the tree, as done before the catalog
+    """
+    gains = []
+    for directory, dirs, files in os.walk(root):
+        for file in files:
+            name = parse_acquisition_name(file)
+            if name is not None and name.filter_name == filter_name:
+                gains.append(name.gain)
+    return min(gains), max(gains)
+
+
+def timed(fun) -> tuple:
+    start = time.perf_counter()
+    result = fun()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--files-per-directory', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'data'
+        root.mkdir()
+        create_tree(root, args.files, args.files_per_directory)
+
+        with AcquisitionCatalog(Path(tmp) / 'catalog.sqlite') as catalog:
+            _, first_update = timed(lambda: catalog.update(root))
+            rescanned, incremental_update = timed(lambda: catalog.update(root))
+            (root / 'acquisizione_0' / acquisition_filename('nuovo', 'nofiltro', 1)).touch()
+            rescanned_after_add, update_after_add = timed(lambda: catalog.update(root))
+            catalog_range, catalog_query = timed(lambda: catalog.gain_range(filter_name='filtroparallelo'))
+            files, material_query = timed(lambda: catalog.query(material='materiale7', filter_name='nofiltro'))
+            exposure, latest_query = timed(lambda: catalog.latest_exposure('materiale7', 'nofiltro'))
+
+        walk_range, walk = timed(lambda: walk_gain_range(root, 'filtroparallelo'))
+        assert walk_range == tuple(catalog_range)
+
+    print('files: {}'.format(args.files))
+    print('first update            {:9.1f} ms'.format(first_update))
+    print('update, no changes      {:9.1f} ms ({} directories listed)'.format(incremental_update, rescanned))
+    print('update, one new file    {:9.1f} ms ({} directories listed)'.format(update_after_add, rescanned_after_add))
+    print('gain range, catalog     {:9.1f} ms'.format(catalog_query))
+    print('gain range, os.walk     {:9.1f} ms'.format(walk))
+    print('files of a material     {:9.1f} ms ({} files)'.format(material_query, len(files)))
+    print('latest exposure         {:9.1f} ms'.format(latest_query))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Startup of the command line and latency of the acquisitions on the simulated camera: a new process
+for every job (what the line PLC does today) against jobs sent to a resident daemon:
+
+    python -m src.benchmarks.bench_cli --jobs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.daemon import send_job
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def run(arguments: list, cwd: str) -> float:
+    """
+    Run the command line in a new process
+    :param arguments: arguments of src.cli
+    :param cwd: working directory
+    :return: wall time in seconds
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'src.cli'] + arguments, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / 'settings').mkdir()
+        config = {"automatic_acquisition": {"min_exposure": 1000, "max_exposure": 999000, "material": "forno1",
+                                            "filtro": "ortogonale", "directory": "out/"}}
+        with (Path(directory) / 'settings' / 'config.json').open('w') as filestream:
+            json.dump(config, filestream)
+
+        help_time = min(run(['--help'], directory) for _ in range(3))
+        process_times = [run(['--simulated', 'acquire', '--material', 'forno{}'.format(i)], directory)
+                         for i in range(args.jobs)]
+
+        env = dict(os.environ, PYTHONPATH=str(ROOT))
+        start = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, '-m', 'src.cli', '--simulated', 'daemon', '--port', str(args.port)],
+                                  cwd=directory, env=env, stdout=subprocess.PIPE, text=True)
+        try:
+            # the daemon prints a line when it accepts jobs
+            while 'Daemon ready' not in daemon.stdout.readline():
+                if daemon.poll() is not None:
+                    raise RuntimeError('the daemon did not start')
+            startup_time = time.perf_counter() - start
+
+            daemon_times = []
+            for i in range(args.jobs):
+                start = time.perf_counter()
+                answer = send_job({"command": "acquire", "material": "forno{}".format(i)}, port=args.port)
+                daemon_times.append(time.perf_counter() - start)
+                assert answer["ok"], answer
+            send_job({"command": "shutdown"}, port=args.port)
+        finally:
+            daemon.wait(timeout=30)
+
+    print('cli --help:                {:8.1f} ms'.format(help_time * 1000))
+    print('daemon startup:            {:8.1f} ms'.format(startup_time * 1000))
+    print('acquire, process per job:  {:8.1f} ms/job (first {:.1f} ms)'.format(
+        sum(process_times) / len(process_times) * 1000, process_times[0] * 1000))
+    print('acquire, daemon:           {:8.1f} ms/job (first {:.1f} ms)'.format(
+        sum(daemon_times) / len(daemon_times) * 1000, daemon_times[0] * 1000))
+
+
+if __name__ == '__main__':
+    main()
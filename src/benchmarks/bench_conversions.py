@@ -0,0 +1,80 @@
+"""
+Time and peak memory per megapixel of the sRGB/linear conversions compared to the reference
+implementations, the results are also checked against the references:
+
+    python -m src.benchmarks.bench_conversions --megapixels 5
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.transformation.conversions import linear_to_srgb, linear_to_srgb_reference, srgb_to_linear, \
+    srgb_to_linear_reference
+from src.transformation.utils import min_max_scaling
+
+
+def measure(fun) -> tuple:
+    """
+    Run a function once
+    :param fun: function to run
+    :return: elapsed time in seconds, peak of the allocated memory in bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    fun()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def check_equivalence(rng: np.random.Generator) -> None:
+    """
+    The fast paths must give the results of the reference implementations
+    """
+    img_float = rng.uniform(-0.1, 1.1, size=(257, 311, 3))
+    img_uint8 = rng.integers(0, 256, size=(257, 311, 3), dtype=np.uint8)
+    img_uint16 = rng.integers(0, 65536, size=(257, 311), dtype=np.uint16)
+    for fast, reference in ((linear_to_srgb, linear_to_srgb_reference), (srgb_to_linear, srgb_to_linear_reference)):
+        np.testing.assert_allclose(fast(img_float), reference(img_float), rtol=0, atol=1e-12)
+        np.testing.assert_allclose(fast(img_float.astype(np.float32)), reference(img_float), rtol=0, atol=1e-6)
+        np.testing.assert_array_equal(fast(img_uint8), reference(min_max_scaling(img_uint8.astype(float), 0, 255)))
+        np.testing.assert_array_equal(fast(img_uint16),
+                                      reference(min_max_scaling(img_uint16.astype(float), 0, 65535)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', type=float, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    check_equivalence(rng)
+
+    width = 2592
+    height = int(args.megapixels * 1e6 / width)
+    megapixels = width * height / 1e6
+    img_uint8 = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+    img_float = img_uint8 / 255
+    img_float32 = img_float.astype(np.float32)
+    out_float32 = np.empty_like(img_float32)
+
+    for name, fast, reference in (('linear_to_srgb', linear_to_srgb, linear_to_srgb_reference),
+                                  ('srgb_to_linear', srgb_to_linear, srgb_to_linear_reference)):
+        cases = (
+            ('reference float64', lambda: reference(img_float)),
+            ('float64', lambda: fast(img_float)),
+            ('float32 out=', lambda: fast(img_float32, out=out_float32)),
+            ('uint8 lut', lambda: fast(img_uint8)),
+            ('uint8 lut float32 out=', lambda: fast(img_uint8, out=out_float32)),
+        )
+        for case, fun in cases:
+            elapsed, peak = measure(fun)
+            print('{:15s} {:24s} {:7.2f} ms/MP  {:7.2f} MB/MP'.format(
+                name, case, elapsed * 1000 / megapixels, peak / 2 ** 20 / megapixels))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Exposure search with and without the exposure tags of the frames on the simulated camera: without
+tags every photo resets and primes the request queue, with tags the queue keeps running and only
+the frames started before the photo or taken with an old exposure are discarded:
+
+    python -m src.benchmarks.bench_exposure_tags --reset-delay 0.005
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.components import simulated_acquire
+
+SCENE_EXPOSURES = (30000, 100000, 300000)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-scale', type=float, default=0.1)
+    parser.add_argument('--reset-delay', type=float, default=0.005, help='time of a queue reset in the driver')
+    parser.add_argument('--photos', type=int, default=20, help='photos of the sweep of exposures')
+    args = parser.parse_args()
+
+    simulated_acquire.install()
+    from src.components.matrix_cam import MatrixCam
+    from src.exposure.controller import ExposureController
+    from src.utils.instrumentation import metrics
+
+    metrics.enable()
+    print('{:6s} {:>10s} {:>8s} {:>6s} {:>7s} {:>10s} {:>12s}'.format(
+        'tags', 'case', 'photos', 'stale', 'resets', 'ms', 'reset ms'))
+    for tags in (False, True):
+        for scene_exposure in SCENE_EXPOSURES:
+            simulated_acquire.configure(scene_exposure=scene_exposure, time_scale=args.time_scale, open_delay=0,
+                                        reset_delay=args.reset_delay, exposure_tags=tags)
+            cases = (
+                ('search', lambda cam: ExposureController(max_value=cam.max_value).run(cam, 500000)),
+                ('sweep', lambda cam: [(cam.set_exposure(1000 + 5000 * (i % 4)), cam.take_photo())
+                                       for i in range(args.photos)]),
+            )
+            for name, case in cases:
+                metrics.reset()
+                with contextlib.redirect_stdout(io.StringIO()), MatrixCam() as cam:
+                    start = time.perf_counter()
+                    case(cam)
+                    elapsed = time.perf_counter() - start
+                resets = metrics.summary().get('reset_the_queue', {'count': 0, 'total_ms': 0.0})
+                print('{:6s} {:>10s} {:8d} {:6d} {:7d} {:10.1f} {:12.1f}'.format(
+                    str(tags), '{}/{}'.format(name, scene_exposure // 1000), cam.captures, cam.stale_frames,
+                    resets['count'], elapsed * 1000, resets['total_ms']))
+
+
+if __name__ == '__main__':
+    main()
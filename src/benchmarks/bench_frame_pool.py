@@ -0,0 +1,61 @@
+"""
+Peak memory and time of a multi-frame capture returned as a list of arrays and streamed through a
+FramePool, measured on the simulated camera:
+
+    python -m src.benchmarks.bench_frame_pool --frames 100
+"""
+import argparse
+import time
+import tracemalloc
+
+from src.components import simulated_acquire
+
+
+def run(capture) -> tuple:
+    """
+    Run a capture and measure it
+    :param capture: function that does the capture
+    :return: elapsed time in seconds and peak of the allocated memory in bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    capture()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=1024)
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=args.width, height=args.height, exposure=1000, readout_delay=0.001)
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam:
+        cam.reset_the_queue(cam.device_interface)
+
+        def list_capture():
+            images = cam.acquire_frames(cam.device, cam.device_interface, -1, args.frames)
+            return sum(int(img[0, 0, 0]) for img in images)
+
+        pool = cam.frame_pool(capacity=3)
+
+        def pool_capture():
+            total = 0
+            for handle in cam.iter_frames(cam.device, cam.device_interface, -1, args.frames, pool):
+                total += int(handle.image[0, 0, 0])
+                handle.release()
+            return total
+
+        for name, capture in (('list of arrays', list_capture), ('frame pool', pool_capture)):
+            elapsed, peak = run(capture)
+            print('{:16s} {:7.1f} frames/s  peak {:8.1f} MB'.format(name, args.frames / elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Peak memory and time of the per pixel statistics of N frames, keeping the list of frames and with
+the running accumulators, measured on the simulated camera:
+
+    python -m src.benchmarks.bench_frame_stack --frames 100
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.components import simulated_acquire
+
+
+def run(capture) -> tuple:
+    """
+    Run a capture and measure it
+    :param capture: function that does the capture
+    :return: result, elapsed time in seconds and peak of the allocated memory in bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = capture()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=1024)
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=args.width, height=args.height, exposure=1000, readout_delay=0.001,
+                              open_delay=0)
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam:
+        def list_capture():
+            cam.reset_the_queue(cam.device_interface)
+            stack = np.stack(cam.acquire_frames(cam.device, cam.device_interface, -1, args.frames))
+            return stack.mean(axis=0), stack.var(axis=0, ddof=1), stack.max(axis=0)
+
+        (mean, variance, maximum), list_time, list_peak = run(list_capture)
+        summary, summary_time, summary_peak = run(lambda: cam.acquire_summary(args.frames))
+
+    # same statistics up to the noise of different frames
+    assert abs(summary.mean.mean() - mean.mean()) < 1
+    print('{} frames of {}x{}'.format(args.frames, args.width, args.height))
+    print('list of frames   {:7.1f} frames/s  peak {:8.1f} MB'.format(args.frames / list_time, list_peak / 2 ** 20))
+    print('running summary  {:7.1f} frames/s  peak {:8.1f} MB'.format(args.frames / summary_time,
+                                                                      summary_peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
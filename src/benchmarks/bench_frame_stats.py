@@ -0,0 +1,64 @@
+"""
+Time of the frame statistics on 5-20 MP frames compared to the mask based saturation:
+
+    python -m src.benchmarks.bench_frame_stats
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.transformation.frame_stats import compute_frame_statistics, count_saturated
+from src.transformation.utils import eval_saturation
+
+RESOLUTIONS = {
+    '5 MP': (1944, 2592),
+    '12 MP': (3000, 4000),
+    '20 MP': (3648, 5472),
+}
+
+
+def mask_saturation(input_img: np.ndarray) -> float:
+    """
+    Previous implementation of `eval_saturation`
+    """
+    white_mask = input_img == 255
+    return (np.sum(white_mask) * 100) / white_mask.size
+
+
+def best_time(fun, repeat: int) -> float:
+    """
+    Best time of `repeat` runs in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for name, shape in RESOLUTIONS.items():
+        img = rng.integers(0, 256, size=shape + (1,), dtype=np.uint8)
+        assert eval_saturation(img) == mask_saturation(img)
+        assert compute_frame_statistics(img).saturation == mask_saturation(img)
+
+        cases = (
+            ('mask saturation', lambda: mask_saturation(img)),
+            ('eval_saturation', lambda: eval_saturation(img)),
+            ('count_saturated step 4', lambda: count_saturated(img, step=4)),
+            ('frame statistics', lambda: compute_frame_statistics(img)),
+            ('frame statistics step 4', lambda: compute_frame_statistics(img, step=4)),
+        )
+        for case, fun in cases:
+            print('{:6s} {:24s} {:8.2f} ms'.format(name, case, best_time(fun, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
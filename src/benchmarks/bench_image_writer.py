@@ -0,0 +1,65 @@
+"""
+Time of a capture loop that saves every frame, with cv2.imwrite on the capture thread and with the
+background ImageWriter, on the simulated camera:
+
+    python -m src.benchmarks.bench_image_writer --frames 20
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from src.components import simulated_acquire
+from src.utils.image_writer import ImageWriter, NPY, PNG, TIFF
+
+
+def capture_loop(cam, frames: int, save) -> float:
+    """
+    Take photos and save them
+    :param cam: camera
+    :param frames: number of photos
+    :param save: function of index and image
+    :return: time of the loop in seconds
+    """
+    start = time.perf_counter()
+    for i in range(frames):
+        save(i, cam.take_photo())
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--width', type=int, default=2592)
+    parser.add_argument('--height', type=int, default=1944)
+    parser.add_argument('--exposure', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=args.width, height=args.height, exposure=args.exposure, open_delay=0)
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam, tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        loop = capture_loop(cam, args.frames, lambda i, img: None)
+        print('{:28s} loop {:7.1f} ms/frame'.format('no saving', loop * 1000 / args.frames))
+
+        loop = capture_loop(cam, args.frames, lambda i, img: cv2.imwrite(str(directory / 'sync_{}.png'.format(i)), img))
+        print('{:28s} loop {:7.1f} ms/frame'.format('cv2.imwrite png', loop * 1000 / args.frames))
+
+        for image_format, png_level in ((PNG, None), (PNG, 1), (TIFF, None), (NPY, None)):
+            writer = ImageWriter(image_format, png_level, args.workers)
+            start = time.perf_counter()
+            loop = capture_loop(cam, args.frames, lambda i, img: writer.write(directory / 'async_{}'.format(i), img))
+            writer.close()
+            total = time.perf_counter() - start
+            name = 'ImageWriter {} {}'.format(image_format, '' if png_level is None else png_level)
+            print('{:28s} loop {:7.1f} ms/frame  total {:7.1f} ms/frame  blocked {:6.1f} ms  {:6.2f} MB/frame'.format(
+                name, loop * 1000 / args.frames, total * 1000 / args.frames, writer.blocked_seconds * 1000,
+                writer.bytes_written / writer.written / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Cost of a span with the instrumentation disabled and enabled, then the per stage report of a run of
+photos on the simulated camera:
+
+    python -m src.benchmarks.bench_instrumentation --photos 50
+"""
+import argparse
+import time
+
+from src.components import simulated_acquire
+from src.utils.instrumentation import metrics, span
+
+
+def span_cost(calls: int) -> float:
+    """
+    Time of an empty span in nanoseconds
+    """
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        with span('empty'):
+            pass
+    return (time.perf_counter_ns() - start) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--photos', type=int, default=50)
+    parser.add_argument('--output', default=None, help='json or csv file of the report')
+    args = parser.parse_args()
+
+    start = time.perf_counter_ns()
+    for _ in range(args.calls):
+        pass
+    loop = (time.perf_counter_ns() - start) / args.calls
+
+    metrics.disable()
+    disabled = span_cost(args.calls) - loop
+    metrics.enable()
+    enabled = span_cost(args.calls) - loop
+    metrics.reset()
+    print('span disabled {:6.0f} ns  enabled {:6.0f} ns'.format(disabled, enabled))
+
+    simulated_acquire.install(exposure=5000, open_delay=0.05)
+    from src.components.matrix_cam import MatrixCam
+    from src.transformation.conversions import srgb_to_linear
+    from src.transformation.utils import eval_saturation
+
+    with MatrixCam() as cam:
+        for i in range(args.photos):
+            cam.set_exposure(5000 + 100 * i)
+            img = cam.take_photo()
+            eval_saturation(img)
+            srgb_to_linear(img)
+
+    metrics.report()
+    if args.output is not None:
+        metrics.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Capture throughput of a FrameStream on the simulated camera with the live preview off, with the
+preview done inline by the consumer (resize and JPEG of every frame, as test_acquisition.py does
+with imshow) and with the LivePreview tapped on the stream, without and with an MJPEG client:
+
+    python -m src.benchmarks.bench_live_preview --frames 200 --max-fps 10 --decimation 4
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+import urllib.request
+
+import cv2
+
+from src.components import simulated_acquire
+
+
+def read_mjpeg(url: str, stop: threading.Event, counter: list) -> None:
+    """
+    MJPEG client: read the stream and count the images
+    :param url: address of the stream
+    :param stop: set to stop reading
+    :param counter: list with the number of images, incremented in place
+    :return: none
+    """
+    with urllib.request.urlopen(url, timeout=5) as response:
+        while not stop.is_set():
+            line = response.readline()
+            if not line:
+                return
+            if line.startswith(b'Content-Length:'):
+                response.readline()
+                response.read(int(line.split(b':')[1]))
+                counter[0] += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--width', type=int, default=2592)
+    parser.add_argument('--height', type=int, default=2048)
+    parser.add_argument('--max-fps', type=float, default=10)
+    parser.add_argument('--decimation', type=int, default=4)
+    parser.add_argument('--port', type=int, default=0, help='port of the preview server, 0 for a free port')
+    args = parser.parse_args()
+
+    simulated_acquire.install(width=args.width, height=args.height, exposure=1000, readout_delay=0.001,
+                              open_delay=0)
+    from src.components.live_preview import LivePreview
+    from src.components.matrix_cam import MatrixCam
+
+    def inline_preview(img) -> None:
+        small = cv2.resize(img, None, fx=1 / args.decimation, fy=1 / args.decimation,
+                           interpolation=cv2.INTER_AREA)
+        cv2.imencode('.jpg', small)
+
+    print('{:24s} {:>10s} {:>8s} {:>9s} {:>9s} {:>10s}'.format(
+        'preview', 'frames/s', 'dropped', 'previews', 'received', 'tap us'))
+    for name in ('off', 'inline', 'tap', 'tap + client'):
+        with contextlib.redirect_stdout(io.StringIO()), MatrixCam() as cam:
+            pool = cam.frame_pool(capacity=4)
+            preview = None
+            client = None
+            stop = threading.Event()
+            received = [0]
+            with cam.stream(policy='drop_oldest', pool=pool) as frames:
+                if name.startswith('tap'):
+                    preview = LivePreview(args.max_fps, args.decimation, cam.pixel_format.max_value,
+                                          port=args.port if name == 'tap + client' else None)
+                    preview.attach(frames)
+                if name == 'tap + client':
+                    url = 'http://{}:{}/'.format(*preview.address)
+                    client = threading.Thread(target=read_mjpeg, args=(url, stop, received), daemon=True)
+                    client.start()
+
+                start = time.perf_counter()
+                for _ in range(args.frames):
+                    handle = frames.get()
+                    if name == 'inline':
+                        inline_preview(handle.image)
+                    handle.release()
+                elapsed = time.perf_counter() - start
+                dropped = frames.dropped
+
+            if preview is not None:
+                stop.set()
+                preview.close()
+            if client is not None:
+                client.join(timeout=2)
+
+        tap_us = preview.tap_seconds / max(preview.taken, 1) * 1e6 if preview is not None else 0.0
+        print('{:24s} {:10.1f} {:8d} {:9d} {:9d} {:10.1f}'.format(
+            name, args.frames / elapsed, dropped, preview.encoded if preview is not None else 0, received[0],
+            tap_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Wall-clock time of exposure control and capture on several simulated cameras, one after the other
+and with the MultiCamCoordinator:
+
+    python -m src.benchmarks.bench_multi_cam --cameras 3
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from src.components import simulated_acquire
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, default=3)
+    parser.add_argument('--captures', type=int, default=3)
+    args = parser.parse_args()
+
+    simulated_acquire.install(device_count=args.cameras, open_delay=0.05, close_delay=0.01)
+    from src.components.matrix_cam import MatrixCam
+    from src.components.multi_cam import MultiCamCoordinator
+    from src.exposure.controller import ExposureController
+
+    # every camera sees a scene with a different brightness
+    cam_ids = list(range(args.cameras))
+    for cam_id, device in zip(cam_ids, simulated_acquire.DeviceManager().devices):
+        device.settings['scene_exposure'] = 50000 * (cam_id + 1)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        slowest = 0.0
+        for cam_id in cam_ids:
+            cam_start = time.perf_counter()
+            with MatrixCam(cam_id) as cam:
+                result = ExposureController(max_value=cam.max_value).run(cam)
+                for _ in range(args.captures):
+                    cam.take_photo()
+            slowest = max(slowest, time.perf_counter() - cam_start)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with MultiCamCoordinator(cam_ids) as cams:
+            results = cams.auto_expose()
+            captures = cams.capture(args.captures)
+        coordinated = time.perf_counter() - start
+
+    print('cameras: {}, captures: {}'.format(args.cameras, args.captures))
+    print('sequential   {:7.2f} s'.format(sequential))
+    print('slowest cam  {:7.2f} s'.format(slowest))
+    print('coordinated  {:7.2f} s'.format(coordinated))
+    print('max trigger spread {:.2f} ms'.format(max(capture.trigger_spread for capture in captures) * 1000))
+    for cam_id, result in results.items():
+        print('  cam {} {}'.format(cam_id, result))
+
+
+if __name__ == '__main__':
+    main()
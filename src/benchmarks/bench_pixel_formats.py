@@ -0,0 +1,76 @@
+"""
+Correctness and time of the frame read of every pixel format, with a padded line pitch, on the
+simulated camera:
+
+    python -m src.benchmarks.bench_pixel_formats --width 2592 --height 1944
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.components import simulated_acquire
+from src.components.pixel_formats import PIXEL_FORMATS, pack, unpack
+
+FORMATS = ('Mono8', 'Mono10', 'Mono12', 'Mono16', 'Mono10p', 'Mono12p', 'Mono10Packed', 'Mono12Packed')
+
+
+def best_time(fun, repeat: int) -> float:
+    """
+    Best time of `repeat` runs in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def check_round_trip(width: int, height: int) -> None:
+    """
+    unpack(pack(img)) must give img back for every packed format
+    """
+    rng = np.random.default_rng(0)
+    for name in FORMATS:
+        pixel_format = PIXEL_FORMATS[name]
+        if not pixel_format.packed:
+            continue
+        img = rng.integers(0, pixel_format.max_value + 1, size=(height, width), dtype=np.uint16)
+        rows = pack(img, pixel_format)
+        raw = rows.reshape(height, -1, pixel_format.group_bytes)
+        out = np.empty((height, width, 1), dtype=np.uint16)
+        assert np.array_equal(unpack(raw, pixel_format, out)[:, :, 0], img), name
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=2592)
+    parser.add_argument('--height', type=int, default=1944)
+    parser.add_argument('--padding', type=int, default=64, help='bytes of padding of every line')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    check_round_trip(args.width, 64)
+
+    simulated_acquire.install(width=args.width, height=args.height, line_padding=args.padding, exposure=1000,
+                              readout_delay=0, open_delay=0, close_delay=0)
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam:
+        for name in FORMATS:
+            cam.set_pixel_format(name)
+            img = cam.take_photo()
+            assert img.dtype == cam.pixel_format.dtype and img.shape == cam.get_format()
+            assert img.max() <= cam.max_value
+
+            # read the last frame again, straight from the buffer of the request
+            request = cam.device_interface.getRequest(0)
+            out = np.empty(img.shape, dtype=img.dtype)
+            elapsed = best_time(lambda: cam.get_one_channel_image(request, out), args.repeat)
+            print('{:13s} {:5d} max {:8.2f} ms {:8.1f} MP/s'.format(
+                name, cam.max_value, elapsed, args.width * args.height / elapsed / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Per-shot latency of `MatrixCam` with and without the persistent device session, measured on the
+simulated camera:
+
+    python -m src.benchmarks.bench_session --shots 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.components import simulated_acquire
+
+
+def measure_shots(cam, shots: int, exposure: int) -> np.ndarray:
+    """
+    Time set_exposure + take_photo, the same sequence done by `Electrolux.photo`
+    :param cam: camera
+    :param shots: number of shots
+    :param exposure: exposure time
+    :return: latency of every shot in seconds
+    """
+    latencies = np.zeros(shots)
+    for i in range(shots):
+        start = time.perf_counter()
+        cam.set_exposure(exposure + i)
+        cam.take_photo()
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shots', type=int, default=20)
+    parser.add_argument('--exposure', type=int, default=20000)
+    parser.add_argument('--open-delay', type=float, default=0.15)
+    args = parser.parse_args()
+
+    simulated_acquire.install(open_delay=args.open_delay)
+    from src.components.matrix_cam import MatrixCam
+
+    results = {}
+    for session in (False, True):
+        cam = MatrixCam(session=session)
+        try:
+            results[session] = measure_shots(cam, args.shots, args.exposure)
+        finally:
+            cam.close()
+
+    for session, name in ((False, 'reopen per call'), (True, 'session')):
+        latencies = results[session] * 1000
+        print('{:16s} mean {:8.2f} ms  p50 {:8.2f} ms  max {:8.2f} ms'.format(
+            name, latencies.mean(), np.median(latencies), latencies.max()))
+    print('speed-up: {:.1f}x'.format(results[False].mean() / results[True].mean()))
+
+
+if __name__ == '__main__':
+    main()
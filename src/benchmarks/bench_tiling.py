@@ -0,0 +1,83 @@
+"""
+Scaling of the transformation functions with the threads of the row band executor: time, speedup
+over one thread and peak of the scratch memory (outputs excluded) on a frame pair, the results of
+every thread count are checked against one thread:
+
+    python -m src.benchmarks.bench_tiling --megapixels 20 --threads 1 2 4 --band-kb 64 256 1024
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.transformation.conversions import compute_diff_spec, linear_to_srgb, srgb_to_linear
+from src.transformation.tiling import TileExecutor
+from src.transformation.utils import min_max_scaling
+
+
+def measure(fun, repeat: int) -> tuple:
+    """
+    Best time of `repeat` runs and peak of the memory allocated by one run
+    :param fun: function to run
+    :param repeat: number of runs
+    :return: time in seconds, peak in bytes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fun()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', type=float, default=5)
+    parser.add_argument('--threads', type=int, nargs='+', default=None, help='thread counts, default 1 to the cores')
+    parser.add_argument('--band-kb', type=int, nargs='+', default=[256], help='sizes of the bands in KiB')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    threads = args.threads or list(range(1, (os.cpu_count() or 1) + 1))
+
+    width = 5472 if args.megapixels >= 10 else 2592
+    height = int(args.megapixels * 1e6 / width)
+    megapixels = width * height / 1e6
+    rng = np.random.default_rng(0)
+    orthogonal = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+    parallel = rng.integers(0, 256, size=(height, width), dtype=np.uint8)
+    img_float = orthogonal / 255
+    out = np.empty((height, width))
+    out_specular = np.empty((height, width))
+
+    print('{:.1f} MP, {} cores'.format(megapixels, os.cpu_count()))
+    print('{:20s} {:>8s} {:>8s} {:>10s} {:>8s} {:>12s}'.format('function', 'band KiB', 'threads', 'ms', 'speedup',
+                                                            'scratch MB'))
+    for band_kb in args.band_kb:
+        single = {}
+        for workers in threads:
+            with TileExecutor(workers, band_kb * 1024) as executor:
+                cases = (
+                    ('min_max_scaling', lambda: min_max_scaling(orthogonal, 0, 255, out=out, executor=executor)),
+                    ('linear_to_srgb', lambda: linear_to_srgb(img_float, out=out, executor=executor)),
+                    ('srgb_to_linear', lambda: srgb_to_linear(img_float, out=out, executor=executor)),
+                    ('compute_diff_spec', lambda: compute_diff_spec(orthogonal, parallel, 255, out, out_specular,
+                                                                    executor)),
+                )
+                for name, fun in cases:
+                    elapsed, peak = measure(fun, args.repeat)
+                    if name not in single:
+                        single[name] = (elapsed, out.copy())
+                    else:
+                        np.testing.assert_array_equal(out, single[name][1])
+                    print('{:20s} {:8d} {:8d} {:10.1f} {:8.2f} {:12.2f}'.format(
+                        name, band_kb, workers, elapsed * 1000, single[name][0] / elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
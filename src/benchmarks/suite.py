@@ -0,0 +1,190 @@
+"""
+Benchmark suite on the simulated camera: convergence of the exposure search, throughput of the
+acquisition, saturation, sRGB conversions and diffuse/specular separation at several resolutions.
+The results are saved as json and can be compared with a previous run:
+
+    python -m src.benchmarks.suite --output bench/today.json --baseline bench/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.components import simulated_acquire
+
+RESOLUTIONS = {
+    'vga': (480, 640),
+    '5mp': (1944, 2592),
+    '12mp': (3000, 4000),
+}
+
+# scenes of the exposure search: exposure time that saturates ~0.15% of the pixels
+SCENE_EXPOSURES = (30000, 100000, 300000)
+
+# the simulated exposures and readouts last time_scale of the real ones
+TIME_SCALE = 0.1
+
+
+def best_time(fun, repeat: int) -> float:
+    """
+    Best time of `repeat` runs in milliseconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def result(value: float, unit: str, better: str = 'lower') -> dict:
+    return {'value': float(value), 'unit': unit, 'better': better}
+
+
+def bench_exposure_search(results: dict) -> None:
+    """
+    Photos and wall time of the exposure search on scenes of different brightness
+    """
+    from src.Electrolux import search_exposure
+    from src.components.matrix_cam import MatrixCam
+    from src.exposure.controller import ExposureController, SATURATION_MIN, SATURATION_MAX
+
+    attributes = {'min_exposure': 1000, 'max_exposure': 999000}
+    for scene_exposure in SCENE_EXPOSURES:
+        simulated_acquire.configure(scene_exposure=scene_exposure, time_scale=TIME_SCALE, open_delay=0)
+        searches = (
+            ('binary_search', lambda cam: search_exposure(cam, attributes)[2]),
+            ('controller', lambda cam: ExposureController(max_value=cam.max_value).run(cam).saturation),
+            ('controller_decimation_4', lambda cam: ExposureController(max_value=cam.max_value).run(
+                cam, decimation=4).saturation),
+        )
+        for name, search in searches:
+            with MatrixCam() as cam, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                saturation = search(cam)
+                elapsed = time.perf_counter() - start
+            key = 'exposure_search/{}/scene_{}'.format(name, scene_exposure)
+            results[key + '/captures'] = result(cam.captures, 'photos')
+            results[key + '/wall_time'] = result(elapsed * 1000, 'ms')
+            results[key + '/converged'] = result(SATURATION_MIN < saturation <= SATURATION_MAX, 'bool', 'higher')
+
+
+def bench_acquisition(results: dict, resolutions: dict, frames: int) -> None:
+    """
+    Frames per second of acquire_frames
+    """
+    from src.components.matrix_cam import MatrixCam
+
+    for name, (height, width) in resolutions.items():
+        simulated_acquire.configure(width=width, height=height, exposure=1000, readout_delay=0.001, open_delay=0)
+        with MatrixCam() as cam, contextlib.redirect_stdout(io.StringIO()):
+            cam.reset_the_queue(cam.device_interface)
+            start = time.perf_counter()
+            cam.acquire_frames(cam.device, cam.device_interface, -1, frames)
+            elapsed = time.perf_counter() - start
+        results['acquire_frames/{}'.format(name)] = result(frames / elapsed, 'frames/s', 'higher')
+
+
+def bench_processing(results: dict, resolutions: dict, repeat: int) -> None:
+    """
+    Time of saturation, conversions and separation
+    """
+    from src.transformation.conversions import compute_diff_spec, compute_diff_spec_uint8, linear_to_srgb, \
+        srgb_to_linear
+    from src.transformation.utils import eval_saturation
+
+    rng = np.random.default_rng(0)
+    for name, shape in resolutions.items():
+        orthogonal = rng.integers(0, 256, size=shape + (1,), dtype=np.uint8)
+        parallel = rng.integers(0, 256, size=shape + (1,), dtype=np.uint8)
+        linear = rng.random(shape + (1,))
+        cases = (
+            ('eval_saturation', lambda: eval_saturation(orthogonal)),
+            ('linear_to_srgb/float64', lambda: linear_to_srgb(linear)),
+            ('srgb_to_linear/float64', lambda: srgb_to_linear(linear)),
+            ('srgb_to_linear/uint8', lambda: srgb_to_linear(orthogonal)),
+            ('compute_diff_spec', lambda: compute_diff_spec(orthogonal, parallel)),
+            ('compute_diff_spec_uint8', lambda: compute_diff_spec_uint8(orthogonal, parallel)),
+        )
+        for case, fun in cases:
+            results['{}/{}'.format(case, name)] = result(best_time(fun, repeat), 'ms')
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare a run with a baseline
+    :param results: results of this run
+    :param baseline: results of the baseline
+    :param tolerance: accepted relative change in the bad direction
+    :return: names of the regressions
+    """
+    regressions = []
+    print('{:60s} {:>12s} {:>12s} {:>8s}'.format('benchmark', 'baseline', 'now', 'change'))
+    for name, now in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['value']
+        change = (now['value'] - before) / before if before else 0.0
+        worse = change > tolerance if now['better'] == 'lower' else change < -tolerance
+        if worse:
+            regressions.append(name)
+        print('{:60s} {:12.3f} {:12.3f} {:+7.1%} {}'.format(name, before, now['value'], change,
+                                                           'REGRESSION' if worse else ''))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=None, help='json file of the results')
+    parser.add_argument('--baseline', default=None, help='json file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='accepted relative slowdown')
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-search', action='store_true', help='skip the exposure search benchmarks')
+    args = parser.parse_args()
+
+    simulated_acquire.install()
+    resolutions = {name: RESOLUTIONS[name] for name in args.resolutions}
+
+    results = {}
+    if not args.skip_search:
+        bench_exposure_search(results)
+    bench_acquisition(results, resolutions, args.frames)
+    bench_processing(results, resolutions, args.repeat)
+
+    for name, value in results.items():
+        print('{:60s} {:12.3f} {}'.format(name, value['value'], value['unit']))
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+    if args.output is not None:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as filestream:
+            json.dump(report, filestream, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as filestream:
+            baseline = json.load(filestream)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('{} regressions'.format(len(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Command line of the acquisition and of the processing. Only the modules of the chosen subcommand
+are imported, a resident daemon keeps the camera open for the jobs of the line:
+
+    python -m src.cli acquire --material forno1 --filter ortogonale
+    python -m src.cli acquire --batch
+    python -m src.cli separate data/forno1_ortogonale_00_757950.png data/forno1_parallelo_00_101693.png
+    python -m src.cli separate data/acquisizione1 --workers 4
+    python -m src.cli plot data/acquisizione_4/materiale6/
+    python -m src.cli bench suite --skip-search
+    python -m src.cli preview --port 8080 --exposure 50000
+    python -m src.cli daemon --port 8765
+    python -m src.cli submit acquire material=forno1 filtro=parallelo
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# the startup is measured from the import of this module
+STARTED = time.perf_counter()
+
+
+def command_acquire(args: argparse.Namespace) -> None:
+    from src import Electrolux
+
+    acquisition_attributes = Electrolux.read_config(args.config)
+    overrides = {"material": args.material, "filtro": args.filter, "directory": args.directory,
+                 "pixel_format": args.pixel_format}
+    section = "bracketing_acquisition" if args.bracketing else "automatic_acquisition"
+    acquisition_attributes.setdefault(section, {}).update(
+        (key, value) for key, value in overrides.items() if value is not None)
+
+    if args.batch:
+        Electrolux.main_batch_acquisition(acquisition_attributes)
+    elif args.bracketing:
+        Electrolux.main_bracketing_acquisition(acquisition_attributes)
+    else:
+        Electrolux.main_automatic_acquisition(acquisition_attributes)
+
+
+def command_separate(args: argparse.Namespace) -> None:
+    from src import batch_processing
+    from src.utils.filenames import parse_acquisition_name
+
+    if args.parallel is None:
+        # a directory of acquisitions, every pair
+        pairs = batch_processing.discover_pairs(args.orthogonal, args.output)
+        batch_processing.print_report(batch_processing.run_batch(pairs, args.workers, force=args.force))
+        return
+
+    name = parse_acquisition_name(args.orthogonal)
+    pair = batch_processing.ImagePair(name.material if name is not None else args.orthogonal.stem, args.orthogonal,
+                                      args.parallel, args.output or args.orthogonal.parent)
+    timings = batch_processing.process_pair(pair)
+    print('{} {}'.format(pair.diffuse_path, pair.specular_path))
+    print(' '.join('{} {:.1f} ms'.format(stage, seconds * 1000) for stage, seconds in timings.items()))
+
+
+def command_plot(args: argparse.Namespace) -> None:
+    from src.utils.plotting import plot_directory
+
+    plot_directory(args.directory)
+
+
+def command_bench(args: argparse.Namespace) -> None:
+    import importlib
+
+    module = importlib.import_module('src.benchmarks.{}'.format(args.name))
+    sys.argv = ['src.benchmarks.{}'.format(args.name)] + args.arguments
+    module.main()
+
+
+def command_preview(args: argparse.Namespace) -> None:
+    from src.components.live_preview import LivePreview
+    from src.components.matrix_cam import MatrixCam
+
+    with MatrixCam() as cam:
+        if args.exposure is not None:
+            cam.set_exposure(args.exposure)
+        with cam.stream(max_queue=1) as frames, \
+                LivePreview(args.max_fps, args.decimation, cam.pixel_format.max_value, host=args.host,
+                            port=args.port) as preview:
+            preview.attach(frames)
+            print('Preview on http://{}:{}/, Ctrl+C to stop'.format(*preview.address))
+            sys.stdout.flush()
+            try:
+                # the frames are only shown, the consumer throws them away
+                for _ in frames:
+                    pass
+            except KeyboardInterrupt:
+                pass
+            print('{} frames, {} previews, saturation {}'.format(frames.acquired, preview.encoded,
+                                                                preview.saturation))
+
+
+def command_daemon(args: argparse.Namespace) -> None:
+    from src.daemon import AcquisitionDaemon
+
+    # the daemon imports the acquisition modules itself and measures them
+    with args.config.open() as filestream:
+        acquisition_attributes = json.load(filestream)
+    with AcquisitionDaemon(acquisition_attributes, args.host, args.port, not args.lazy_camera) as daemon:
+        print('Daemon ready on {}:{} in {:.0f} ms (imports {:.0f} ms, camera {:.0f} ms)'.format(
+            daemon.address[0], daemon.address[1], (time.perf_counter() - STARTED) * 1000,
+            daemon.import_seconds * 1000, daemon.camera_seconds * 1000))
+        sys.stdout.flush()
+        daemon.serve_forever()
+    print('Daemon stopped after {} jobs'.format(daemon.jobs))
+
+
+def command_submit(args: argparse.Namespace) -> None:
+    from src.daemon import send_job
+
+    job = {"command": args.job}
+    for parameter in args.parameters:
+        key, _, value = parameter.partition('=')
+        try:
+            job[key] = json.loads(value)
+        except ValueError:
+            job[key] = value
+
+    start = time.perf_counter()
+    answer = send_job(job, args.host, args.port, args.timeout)
+    round_trip = time.perf_counter() - start
+    print(json.dumps(answer, indent=2))
+    print('round trip {:.1f} ms'.format(round_trip * 1000))
+    if not answer.get("ok", False):
+        sys.exit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from src.daemon import DEFAULT_HOST, DEFAULT_PORT
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--simulated', action='store_true', help='use the simulated camera instead of mvIMPACT')
+    parser.add_argument('--timing', action='store_true', help='print the time of the command')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    acquire = commands.add_parser('acquire', help='exposure search and photo, see settings/config.json')
+    acquire.add_argument('--config', type=Path, default=Path('settings') / 'config.json')
+    acquire.add_argument('--material', default=None)
+    acquire.add_argument('--filter', default=None)
+    acquire.add_argument('--directory', default=None)
+    acquire.add_argument('--pixel-format', default=None)
+    mode = acquire.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true', help='every job of acquisition_jobs')
+    mode.add_argument('--bracketing', action='store_true', help='bracketing acquisition and radiance map')
+    acquire.set_defaults(run=command_acquire)
+
+    separate = commands.add_parser('separate', help='diffuse and specular images of a pair or of a directory')
+    separate.add_argument('orthogonal', type=Path, help='orthogonal image, or directory of acquisitions')
+    separate.add_argument('parallel', type=Path, nargs='?', default=None, help='parallel image')
+    separate.add_argument('--output', type=Path, default=None, help='output directory, default next to the inputs')
+    separate.add_argument('--workers', type=int, default=None)
+    separate.add_argument('--force', action='store_true', help='process also the pairs with up to date outputs')
+    separate.set_defaults(run=command_separate)
+
+    plot = commands.add_parser('plot', help='exposure plots of an acquisition folder')
+    plot.add_argument('directory')
+    plot.set_defaults(run=command_plot)
+
+    bench = commands.add_parser('bench', help='run a benchmark of src/benchmarks')
+    bench.add_argument('name', nargs='?', default='suite')
+    bench.add_argument('arguments', nargs=argparse.REMAINDER, help='arguments of the benchmark')
+    bench.set_defaults(run=command_bench)
+
+    preview = commands.add_parser('preview', help='live preview of the camera served as MJPEG over HTTP')
+    preview.add_argument('--exposure', type=int, default=None)
+    preview.add_argument('--max-fps', type=float, default=10)
+    preview.add_argument('--decimation', type=int, default=4)
+    preview.add_argument('--host', default='127.0.0.1')
+    preview.add_argument('--port', type=int, default=8080)
+    preview.set_defaults(run=command_preview)
+
+    daemon = commands.add_parser('daemon', help='keep the camera open and run the jobs of a local socket')
+    daemon.add_argument('--config', type=Path, default=Path('settings') / 'config.json')
+    daemon.add_argument('--host', default=DEFAULT_HOST)
+    daemon.add_argument('--port', type=int, default=DEFAULT_PORT)
+    daemon.add_argument('--lazy-camera', action='store_true', help='open the camera at the first acquisition')
+    daemon.set_defaults(run=command_daemon)
+
+    submit = commands.add_parser('submit', help='send a job to the daemon')
+    submit.add_argument('job', help='ping, acquire, batch, separate, stats or shutdown')
+    submit.add_argument('parameters', nargs='*', help='key=value, json values')
+    submit.add_argument('--host', default=DEFAULT_HOST)
+    submit.add_argument('--port', type=int, default=DEFAULT_PORT)
+    submit.add_argument('--timeout', type=float, default=None)
+    submit.set_defaults(run=command_submit)
+
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    if args.simulated:
+        from src.components import simulated_acquire
+        simulated_acquire.install()
+
+    args.run(args)
+    if args.timing:
+        print('{} done in {:.0f} ms'.format(args.command, (time.perf_counter() - STARTED) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from src.components.frame_stream import DROP_OLDEST, StreamClosed
+from src.components.matrix_cam import MatrixCam
+from src.exposure.controller import ExposureController, ExposureResult
+
+
+class AsyncMatrixCam:
+    def __init__(self, cam: MatrixCam):
+        """
+        Asyncio interface of a MatrixCam: the blocking driver calls run in a dedicated thread of the
+        camera, so many cameras and processing tasks can share one event loop.
+
+        A simple use case is:
+
+        >>> cam = await AsyncMatrixCam.open(0)
+        >>> await cam.set_exposure(100000)
+        >>> img = await cam.take_photo(timeout=2.0)
+        >>> await cam.close()
+
+        :param cam: camera opened in session mode
+        """
+        self.cam = cam
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncMatrixCam-{}'.format(cam.cam_id))
+
+    @classmethod
+    async def open(cls, cam_id: int = 0) -> "AsyncMatrixCam":
+        """
+        Open a camera without blocking the event loop
+        :param cam_id: id for use the camera
+        :return: async camera
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AsyncMatrixCam-{}'.format(cam_id))
+        try:
+            cam = await loop.run_in_executor(executor, MatrixCam, cam_id)
+        finally:
+            executor.shutdown(wait=False)
+        return cls(cam)
+
+    async def __aenter__(self) -> "AsyncMatrixCam":
+        return self
+
+    async def __aexit__(self, exit_type, value, traceback) -> None:
+        await self.close()
+
+    async def _call(self, fun, *args, **kwargs):
+        """
+        Run a blocking call in the thread of the camera
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fun, *args, **kwargs))
+
+    async def close(self) -> None:
+        """
+        Close the camera
+        :return: none
+        """
+        await self._call(self.cam.close)
+        self.executor.shutdown(wait=False)
+
+    async def set_exposure(self, exposure: float) -> None:
+        """
+        Set exposure time of the camera
+        :param exposure: exposure time
+        :return: none
+        """
+        await self._call(self.cam.set_exposure, exposure)
+
+    async def take_photo(self, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Take photo, the wait on the driver stops when the task is cancelled
+        :param timeout: max waiting time in seconds, None wait forever
+        :return: output image
+        """
+        cancel_event = threading.Event()
+        try:
+            return await self._call(self.cam.take_photo, timeout, cancel_event)
+        except asyncio.CancelledError:
+            # the thread of the camera leaves the driver wait at the next poll
+            cancel_event.set()
+            raise
+
+    async def photo(self, exposure: float, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Set the exposure and take a photo
+        :param exposure: exposure time
+        :param timeout: max waiting time of the photo in seconds, None wait forever
+        :return: output image
+        """
+        await self.set_exposure(int(exposure))
+        return await self.take_photo(timeout)
+
+    async def auto_expose(self, controller: Optional[ExposureController] = None,
+                          initial_exposure: Optional[float] = None,
+                          timeout: Optional[float] = None) -> ExposureResult:
+        """
+        Exposure search, same steps of ExposureController.run
+        :param controller: exposure controller, None for the default one with the max value of the camera
+        :param initial_exposure: first exposure time, None for the default of the controller
+        :param timeout: max waiting time of every photo in seconds, None wait forever
+        :return: result of the search, check `converged`
+        """
+        controller = controller or ExposureController(max_value=self.cam.max_value)
+        exposure = controller.start(initial_exposure)
+
+        loop = asyncio.get_running_loop()
+        captures = 0
+        while True:
+            captures += 1
+            img = await self.photo(exposure, timeout)
+            # the statistics of a full frame take tens of ms, off the event loop
+            result, exposure = await loop.run_in_executor(None, controller.update, img, exposure, captures)
+            if result is not None:
+                return result
+
+    def frames(self, max_queue: int = 4, policy: str = DROP_OLDEST) -> "AsyncFrameStream":
+        """
+        Continuous acquisition, see MatrixCam.stream
+        :param max_queue: max number of frames waiting for the consumer
+        :param policy: 'drop_oldest' or 'block'
+        :return: async frame stream, use it with `async with`
+        """
+        return AsyncFrameStream(self, max_queue, policy)
+
+
+class AsyncFrameStream:
+    def __init__(self, cam: AsyncMatrixCam, max_queue: int, policy: str):
+        """
+        Async iterator over a FrameStream, the stream runs between __aenter__ and __aexit__.
+
+        A simple use case is:
+
+        >>> async with cam.frames() as frames:
+        >>>     async for img in frames:
+        >>>         # use img
+
+        :param cam: async camera
+        :param max_queue: max number of frames waiting for the consumer
+        :param policy: 'drop_oldest' or 'block'
+        """
+        self.cam = cam
+        self.max_queue = max_queue
+        self.policy = policy
+        self.stream = None
+
+    async def __aenter__(self) -> "AsyncFrameStream":
+        self.stream = await self.cam._call(self.cam.cam.stream, self.max_queue, self.policy)
+        return self
+
+    async def __aexit__(self, exit_type, value, traceback) -> None:
+        if self.stream is not None:
+            await self.cam._call(self.stream.stop)
+            self.stream = None
+
+    def __aiter__(self) -> "AsyncFrameStream":
+        return self
+
+    async def __anext__(self) -> np.ndarray:
+        if self.stream is None:
+            raise StopAsyncIteration
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # short waits so a cancelled consumer does not keep a thread busy for long
+                return await loop.run_in_executor(None, self.stream.get, 0.1)
+            except queue.Empty:
+                continue
+            except StreamClosed:
+                raise StopAsyncIteration
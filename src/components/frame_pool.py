@@ -0,0 +1,89 @@
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class FramePoolExhausted(Exception):
+    def __init__(self):
+        super().__init__('FramePoolExhausted: every frame of the pool is in use')
+
+
+class FrameHandle:
+    def __init__(self, pool: "FramePool", index: int):
+        """
+        Frame borrowed from a FramePool, give it back with release()
+        :param pool: owner pool
+        :param index: index of the slot in the pool
+        """
+        self.pool = pool
+        self.index = index
+        self.image = pool.slots[index]
+        self.released = False
+
+        # exposure time and timestamp (us) of the frame reported by the driver, None if unknown
+        self.exposure = None
+        self.timestamp = None
+
+    def __enter__(self) -> "FrameHandle":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.release()
+
+    def release(self) -> None:
+        """
+        Give the slot back to the pool, the image must not be used anymore
+        :return: none
+        """
+        if not self.released:
+            self.released = True
+            self.pool.release(self)
+
+
+class FramePool:
+    def __init__(self, shape: Tuple[int, ...], dtype=np.uint8, capacity: int = 3):
+        """
+        Fixed ring of preallocated frames reused by the acquisitions
+        :param shape: shape of a frame
+        :param dtype: type of the pixels
+        :param capacity: number of frames
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.slots = np.zeros((capacity,) + self.shape, dtype=self.dtype)
+        self.free_slots = list(range(capacity))
+        self.condition = threading.Condition()
+
+    @property
+    def available(self) -> int:
+        """
+        Number of free frames
+        """
+        with self.condition:
+            return len(self.free_slots)
+
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> FrameHandle:
+        """
+        Borrow a free frame
+        :param block: wait for a frame released by another thread
+        :param timeout: max waiting time in seconds, None wait forever
+        :return: handle of the frame
+        """
+        with self.condition:
+            if block:
+                self.condition.wait_for(lambda: self.free_slots, timeout)
+            if not self.free_slots:
+                raise FramePoolExhausted()
+            return FrameHandle(self, self.free_slots.pop(0))
+
+    def release(self, handle: FrameHandle) -> None:
+        """
+        Put back a frame, use FrameHandle.release()
+        :param handle: handle of the frame
+        :return: none
+        """
+        with self.condition:
+            self.free_slots.append(handle.index)
+            self.condition.notify()
@@ -0,0 +1,244 @@
+import queue
+import threading
+from typing import Optional
+
+import numpy as np
+
+from src.components.frame_pool import FramePool, FrameHandle, FramePoolExhausted
+from src.utils.instrumentation import span
+
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+
+class StreamClosed(Exception):
+    def __init__(self):
+        super().__init__('StreamClosed: the frame stream is not running')
+
+
+class FrameStream:
+    def __init__(self, cam, max_queue: int = 4, policy: str = DROP_OLDEST, pool: FramePool = None,
+                 poll_ms: int = 100):
+        """
+        Continuous acquisition: a background thread keeps the request queue of the camera primed and
+        hands the frames to the consumer through a bounded queue.
+
+        A simple use case is:
+
+        >>> with cam.stream(policy='block') as frames:
+        >>>     for img in frames:
+        >>>         # use img
+
+        :param cam: MatrixCam with an open session
+        :param max_queue: max number of frames waiting for the consumer
+        :param policy: 'drop_oldest' discards the oldest frame when the queue is full,
+                       'block' stops the acquisition until the consumer takes a frame
+        :param pool: frame pool that receives the frames, None for new arrays
+        :param poll_ms: max time of a single wait on the driver, it bounds the stop latency
+        """
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError('unknown policy: {}'.format(policy))
+        if cam.device is None:
+            raise ValueError('the stream needs a MatrixCam opened in session mode')
+
+        self.cam = cam
+        self.policy = policy
+        self.pool = pool
+        self.poll_ms = poll_ms
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.shape = cam.get_format()
+        self.dtype = cam.pixel_format.dtype
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.error = None
+
+        # functions called with every frame on the acquisition thread, see add_tap
+        self.taps = []
+
+        # statistics
+        self.acquired = 0
+        self.dropped = 0
+
+    def __enter__(self) -> "FrameStream":
+        return self.start()
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.stop()
+
+    def __iter__(self) -> "FrameStream":
+        return self
+
+    def __next__(self):
+        try:
+            return self.get()
+        except StreamClosed:
+            raise StopIteration
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> "FrameStream":
+        """
+        Prime the request queue and start the acquisition thread
+        :return: the stream
+        """
+        if self.running:
+            return self
+        self.stop_event.clear()
+        self.cam.reset_the_queue(self.cam.device_interface)
+        self.thread = threading.Thread(target=self._run, name='FrameStream-{}'.format(self.cam.cam_id),
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the acquisition thread and release the frames not consumed
+        :return: none
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        while True:
+            try:
+                self._discard(self.frames.get_nowait())
+            except queue.Empty:
+                break
+        if self.cam.active_stream is self:
+            self.cam.active_stream = None
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Take the next frame
+        :param timeout: max waiting time in seconds, None wait until a frame arrives
+        :return: image, or FrameHandle to release when the stream has a pool
+        """
+        while True:
+            try:
+                return self.frames.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if self.error is not None:
+                    raise self.error
+                if not self.running:
+                    raise StreamClosed()
+                if timeout is not None:
+                    raise
+
+    def add_tap(self, tap) -> None:
+        """
+        Show every frame to `tap(image, exposure)` before it is queued for the consumer. The tap runs
+        on the acquisition thread and must return quickly, the image is valid only during the call.
+        :param tap: function of the image and of its exposure time (None if unknown)
+        :return: none
+        """
+        self.taps.append(tap)
+
+    def remove_tap(self, tap) -> None:
+        """
+        Stop showing the frames to a tap
+        :param tap: function given to add_tap
+        :return: none
+        """
+        if tap in self.taps:
+            self.taps.remove(tap)
+
+    def _offer(self, frame, exposure: Optional[int]) -> None:
+        """
+        Show a frame to the taps, an error of a tap does not stop the acquisition
+        :param frame: image or FrameHandle
+        :param exposure: exposure time of the frame, None if unknown
+        :return: none
+        """
+        image = frame.image if isinstance(frame, FrameHandle) else frame
+        for tap in list(self.taps):
+            try:
+                tap(image, exposure)
+            except Exception as e:
+                print('Removed a tap of the stream: {}'.format(e))
+                self.remove_tap(tap)
+
+    @staticmethod
+    def _discard(frame) -> None:
+        if isinstance(frame, FrameHandle):
+            frame.release()
+
+    def _put(self, frame) -> None:
+        """
+        Hand a frame to the consumer following the policy of the stream
+        :param frame: image or FrameHandle
+        :return: none
+        """
+        if self.policy == BLOCK:
+            while not self.stop_event.is_set():
+                try:
+                    self.frames.put(frame, timeout=self.poll_ms / 1000)
+                    return
+                except queue.Full:
+                    pass
+            self._discard(frame)
+            return
+
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._discard(self.frames.get_nowait())
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _copy_frame(self, request):
+        """
+        Copy the image of a request out of the driver buffer
+        :param request: request of shot
+        :return: image or FrameHandle
+        """
+        if self.pool is None:
+            with span('copy'):
+                return self.cam.get_one_channel_image(request, np.empty(self.shape, dtype=self.dtype))
+        while not self.stop_event.is_set():
+            try:
+                frame = self.pool.acquire(timeout=self.poll_ms / 1000)
+            except FramePoolExhausted:
+                # every frame of the pool is waiting in the queue
+                if self.policy == DROP_OLDEST:
+                    try:
+                        self._discard(self.frames.get_nowait())
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+                continue
+            with span('copy'):
+                self.cam.get_one_channel_image(request, frame.image)
+            frame.exposure, frame.timestamp = self.cam.read_frame_tag(request)
+            return frame
+        return None
+
+    def _run(self) -> None:
+        """
+        Acquisition loop: wait for a request, copy it, give it back and queue it again
+        :return: none
+        """
+        device_interface = self.cam.device_interface
+        try:
+            while not self.stop_event.is_set():
+                with span('wait'):
+                    request_number = device_interface.imageRequestWaitFor(self.poll_ms)
+                if not device_interface.isRequestNrValid(request_number):
+                    continue
+                request = device_interface.getRequest(request_number)
+                frame = self._copy_frame(request) if request.isOK else None
+                exposure = self.cam.read_frame_tag(request)[0] if self.taps and frame is not None else None
+                request.unlock()
+                device_interface.imageRequestSingle()
+                if frame is not None:
+                    self.acquired += 1
+                    if self.taps:
+                        self._offer(frame, exposure)
+                    self._put(frame)
+        except Exception as e:
+            self.error = e
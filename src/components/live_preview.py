@@ -0,0 +1,249 @@
+import http.server
+import socketserver
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from src.transformation.utils import eval_saturation
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+BOUNDARY = 'frame'
+
+# color of the saturated pixels and of the text in the preview (BGR)
+SATURATED_COLOR = (0, 0, 255)
+TEXT_COLOR = (0, 255, 0)
+
+
+class _PreviewServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _PreviewHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        preview = self.server.preview
+        if self.path in ('/', '/stream.mjpg'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary={}'.format(BOUNDARY))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            sequence = 0
+            try:
+                while not preview.stopped:
+                    jpeg, sequence = preview.wait_jpeg(sequence, timeout=1.0)
+                    if jpeg is None:
+                        continue
+                    self.wfile.write('--{}\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n'.format(
+                        BOUNDARY, len(jpeg)).encode())
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b'\r\n')
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # the client closed the page
+                pass
+        elif self.path == '/frame.jpg':
+            jpeg, _ = preview.wait_jpeg(0, timeout=1.0)
+            if jpeg is None:
+                self.send_error(503, 'no frame yet')
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args) -> None:
+        # one line per frame request would flood the acquisition log
+        pass
+
+
+class LivePreview:
+    def __init__(self, max_fps: float = 10.0, decimation: int = 4, max_value: int = 255, jpeg_quality: int = 70,
+                 host: str = DEFAULT_HOST, port: Optional[int] = DEFAULT_PORT):
+        """
+        Live preview of a FrameStream that never stalls the acquisition: the acquisition thread only
+        keeps a decimated copy of a frame when a preview frame is due (max_fps), the overlay of the
+        saturation and the JPEG encoding run on a thread of the preview, which drops the frames it
+        cannot keep up with. The frames are served as MJPEG on http://host:port/ (one image on
+        /frame.jpg).
+
+        A simple use case is:
+
+        >>> with cam.stream() as frames, LivePreview(max_value=cam.pixel_format.max_value) as preview:
+        >>>     preview.attach(frames)
+        >>>     for img in frames:
+        >>>         # use img
+
+        :param max_fps: max number of preview frames per second
+        :param decimation: keep a pixel every `decimation` rows and columns
+        :param max_value: value of a saturated pixel, the max value of the sensor
+        :param jpeg_quality: quality of the JPEG images, 0 to 100
+        :param host: address of the HTTP server, keep it local
+        :param port: port of the HTTP server, 0 for a free port, None for no server (see `jpeg`)
+        """
+        if decimation < 1:
+            raise ValueError('the decimation must be at least 1')
+        self.interval = 1 / max_fps
+        self.decimation = decimation
+        self.max_value = max_value
+        self.jpeg_quality = jpeg_quality
+
+        self.condition = threading.Condition()
+        self.pending = None
+        self.jpeg = None
+        self.sequence = 0
+        self.saturation = None
+        self.next_frame = 0.0
+        self.stopped = False
+        self.stream = None
+
+        # statistics
+        self.offered = 0
+        self.taken = 0
+        self.encoded = 0
+        self.tap_seconds = 0.0
+
+        self.thread = threading.Thread(target=self._run, name='LivePreview', daemon=True)
+        self.thread.start()
+
+        self.server = None
+        self.address = None
+        if port is not None:
+            self.server = _PreviewServer((host, port), _PreviewHandler)
+            self.server.preview = self
+            self.address = self.server.server_address
+            threading.Thread(target=self.server.serve_forever, name='LivePreviewServer', daemon=True).start()
+
+    def __enter__(self) -> "LivePreview":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def attach(self, stream) -> "LivePreview":
+        """
+        Show the frames of a stream in the preview
+        :param stream: running FrameStream
+        :return: the preview
+        """
+        self.detach()
+        stream.add_tap(self.offer)
+        self.stream = stream
+        return self
+
+    def detach(self) -> None:
+        """
+        Stop showing the frames of the attached stream
+        :return: none
+        """
+        if self.stream is not None:
+            self.stream.remove_tap(self.offer)
+            self.stream = None
+
+    def offer(self, image: np.ndarray, exposure: Optional[int] = None) -> None:
+        """
+        Give a frame to the preview, called on the acquisition thread. Between two preview frames it
+        returns at once, else it copies the decimated frame and wakes the preview thread.
+        :param image: frame, valid only during the call
+        :param exposure: exposure time of the frame, None if unknown
+        :return: none
+        """
+        start = time.perf_counter()
+        self.offered += 1
+        if start < self.next_frame:
+            return
+        self.next_frame = start + self.interval
+        small = image[::self.decimation, ::self.decimation].copy()
+        with self.condition:
+            # a frame not encoded yet is replaced by the newer one
+            self.pending = (small, exposure)
+            self.condition.notify_all()
+        self.taken += 1
+        self.tap_seconds += time.perf_counter() - start
+
+    def render(self, small: np.ndarray, exposure: Optional[int]) -> np.ndarray:
+        """
+        Preview image of a decimated frame: 8 bit, saturated pixels in red, saturation and exposure
+        written on top
+        :param small: decimated frame
+        :param exposure: exposure time of the frame, None if unknown
+        :return: BGR image
+        """
+        if small.ndim == 3:
+            small = small[:, :, 0]
+        # the saturation of the decimated frame, a sample of the full frame
+        self.saturation = eval_saturation(small, self.max_value)
+        # >= like eval_saturation, values above max_value are saturated too
+        saturated = small >= self.max_value
+        if small.dtype != np.uint8:
+            small = (small * (255 / self.max_value)).astype(np.uint8)
+        preview = cv2.cvtColor(small, cv2.COLOR_GRAY2BGR)
+        preview[saturated] = SATURATED_COLOR
+
+        text = 'sat {:.2f}%'.format(self.saturation)
+        if exposure is not None:
+            text += '  exp {} us'.format(exposure)
+        scale = max(preview.shape[1] / 800, 0.4)
+        cv2.putText(preview, text, (8, int(24 * scale) + 4), cv2.FONT_HERSHEY_SIMPLEX, scale, TEXT_COLOR,
+                    max(int(scale * 2), 1), cv2.LINE_AA)
+        return preview
+
+    def _run(self) -> None:
+        """
+        Preview loop: render and encode the last decimated frame
+        :return: none
+        """
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                small, exposure = self.pending
+                self.pending = None
+            try:
+                preview = self.render(small, exposure)
+                ok, encoded = cv2.imencode('.jpg', preview, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            except Exception as e:
+                print('Preview of a frame failed: {}'.format(e))
+                continue
+            if ok:
+                with self.condition:
+                    self.jpeg = encoded.tobytes()
+                    self.sequence += 1
+                    self.encoded += 1
+                    self.condition.notify_all()
+
+    def wait_jpeg(self, sequence: int, timeout: Optional[float] = None) -> tuple:
+        """
+        Wait for a preview image newer than `sequence`
+        :param sequence: number of the last image seen, 0 for none
+        :param timeout: max waiting time in seconds, None wait forever
+        :return: JPEG bytes (None on timeout or stop) and their number
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > sequence or self.stopped, timeout)
+            if self.sequence > sequence:
+                return self.jpeg, self.sequence
+            return None, sequence
+
+    def close(self) -> None:
+        """
+        Detach the stream, stop the preview thread and the HTTP server
+        :return: none
+        """
+        self.detach()
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -1,30 +1,204 @@
+import contextlib
 import ctypes
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
 import numpy as np
 from mvIMPACT import acquire
 
+from src.components.frame_pool import FramePool, FramePoolExhausted
+from src.components.frame_stream import FrameStream, DROP_OLDEST
+from src.components.pixel_formats import PixelFormat, get_pixel_format, unpack
+from src.transformation.accumulators import FrameStackSummary, RunningFrameStatistics
+from src.transformation.utils import eval_saturation
+from src.utils.capture_container import CaptureContainer
+from src.utils.instrumentation import metrics, span
+
+
+# max time of a single wait on the driver when the capture has a timeout or can be cancelled
+POLL_MS = 100
+
+# photos closer than this keep the request queue running and discard the stale frames by their
+# exposure and timestamp tags, after a longer pause the queue is reset
+TAGGED_MAX_IDLE = 1.0
+
+# the sensor rounds the exposure to its line time: a tag within this distance is the same exposure
+EXPOSURE_TOLERANCE_US = 50
+EXPOSURE_TOLERANCE = 0.01
+
+# a frame just taken has a timestamp this close to the device clock, else they are different clocks
+MAX_TAG_AGE_US = 10 * 1000000
+
+# consecutive stale frames, beyond the ones buffered in the request queue, after which the tags are
+# considered wrong
+MAX_STALE_FRAMES = 16
+
+
+class CaptureCancelled(Exception):
+    def __init__(self):
+        super().__init__('CaptureCancelled: the capture has been cancelled')
+
 
 class MatrixCam:
-    def __init__(self, cam_id: int = 0):
+    def __init__(self, cam_id: int = 0, session: bool = True):
         """
         MatrixCam
         :param cam_id: id for use the camera
+        :param session: keep the device open between the calls, release it with close()
         """
 
         # cam id for use the camera
         self.cam_id = cam_id
+        self.session = session
+        self.device = None
+        self.device_interface = None
+        self.format_control = None
+        self.device_control = None
 
         # initialize the device and open it
         devMgr = acquire.DeviceManager()
+        if not 0 <= cam_id < devMgr.deviceCount():
+            raise ValueError('camera {} not found, {} cameras connected'.format(cam_id, devMgr.deviceCount()))
         cam = devMgr.getDevice(cam_id)
-        cam.open()
+        with span('device_open'):
+            cam.open()
+        self.serial = cam.serial.read()
 
         # initialize ac setting
         self.ac = acquire.AcquisitionControl(cam)
         self.exposure = self.ac.exposureTime.read()
         self.gain = 0
+        self.captures = 0
         self.pPreviousRequest = None
+        self.active_stream = None
+        self.pixel_format = self.read_pixel_format(acquire.ImageFormatControl(cam))
 
-        cam.close()
+        # exposure and timestamp (us) of the last frame as reported by the driver, None if unknown
+        self.frame_exposure = None
+        self.frame_timestamp = None
+        self.exposure_tags = False
+        self.tags_checked = False
+        self.stale_frames = 0
+        self.last_tagged_photo = None
+
+        if session:
+            # keep the interfaces alive until close()
+            self.device = cam
+            self.device_interface = acquire.FunctionInterface(cam)
+            self.format_control = acquire.ImageFormatControl(cam)
+            self.device_control = acquire.DeviceControl(cam) if hasattr(acquire, 'DeviceControl') else None
+            print('Camera {:s} opened'.format(self.serial))
+        else:
+            cam.close()
+
+    @staticmethod
+    def read_pixel_format(format_control) -> PixelFormat:
+        """
+        Read the pixel format of the frames
+        :param format_control: ImageFormatControl of the camera
+        :return: pixel format, Mono8 if the camera does not tell it
+        """
+        if not hasattr(format_control, 'pixelFormat'):
+            return get_pixel_format('Mono8')
+        return get_pixel_format(format_control.pixelFormat.readS())
+
+    @property
+    def max_value(self) -> int:
+        """
+        Value of a saturated pixel for the pixel format of the camera
+        """
+        return self.pixel_format.max_value
+
+    def set_pixel_format(self, name: str) -> None:
+        """
+        Set the pixel format of the camera, e.g. Mono8, Mono12 or Mono12p
+        :param name: name of the pixel format
+        :return: none
+        """
+        if self.device is None:
+            raise RuntimeError('the pixel format can be changed only in session mode')
+        if self.active_stream is not None:
+            raise RuntimeError('the pixel format cannot be changed while the camera is streaming')
+        # the queued requests have the old format
+        self.reset_the_queue(self.device_interface, prime=False)
+        self.format_control.pixelFormat.write(name)
+        self.pixel_format = self.read_pixel_format(self.format_control)
+
+    @contextlib.contextmanager
+    def reduced_readout(self, roi: Optional[Tuple[int, int, int, int]] = None, decimation: int = 1):
+        """
+        Read a smaller frame while the block runs, e.g. during the exposure search, and restore the
+        full format at the end. The sensor does the AOI and the decimation when it can; what it
+        cannot do is given back to be done in software on the frames.
+
+        A simple use case is:
+
+        >>> with cam.reduced_readout(decimation=4) as (step, roi):
+        >>>     stats = compute_frame_statistics(cam.take_photo(), step=step, roi=roi)
+
+        :param roi: x, y, width and height of the area of interest in sensor pixels, None for the whole sensor
+        :param decimation: keep one pixel every `decimation` on both axes
+        :return: context manager that gives the step and the roi still to apply to the frames
+        """
+        if self.device is None:
+            raise RuntimeError('the readout can be changed only in session mode')
+        if self.active_stream is not None:
+            raise RuntimeError('the readout cannot be changed while the camera is streaming')
+
+        format_control = self.format_control
+        # the sensor can read a smaller frame only if the frame size can be written
+        resizable = all(getattr(getattr(format_control, name), 'isWriteable', True) for name in ('width', 'height'))
+        hardware_roi = resizable and roi is not None and hasattr(format_control, 'offsetX')
+        hardware_decimation = resizable and decimation > 1 and hasattr(format_control, 'decimationHorizontal')
+        if not hardware_roi and not hardware_decimation:
+            yield decimation, roi
+            return
+
+        names = ['width', 'height']
+        if hasattr(format_control, 'offsetX'):
+            names += ['offsetX', 'offsetY']
+        if hasattr(format_control, 'decimationHorizontal'):
+            names += ['decimationHorizontal', 'decimationVertical']
+        saved = {name: int(getattr(format_control, name).readS()) for name in names}
+
+        x, y, width, height = roi if hardware_roi else (0, 0, saved['width'], saved['height'])
+        hardware_step = decimation if hardware_decimation else 1
+        # sensors take widths in steps of 8 pixels, the packed formats need groups of 4
+        width = max(width // hardware_step // 8 * 8, 8)
+        height = max(height // hardware_step, 1)
+
+        # the queued requests have the old format
+        self.reset_the_queue(self.device_interface, prime=False)
+        try:
+            format_control.width.write(width)
+            format_control.height.write(height)
+            if hardware_decimation:
+                format_control.decimationHorizontal.write(decimation)
+                format_control.decimationVertical.write(decimation)
+            if hardware_roi:
+                format_control.offsetX.write(x)
+                format_control.offsetY.write(y)
+
+            if hardware_roi:
+                yield (1 if hardware_decimation else decimation), None
+            else:
+                # the software roi is in pixels of the decimated frame
+                yield 1, tuple(value // hardware_step for value in roi) if roi is not None else None
+        finally:
+            self.reset_the_queue(self.device_interface, prime=False)
+            for name in ('offsetX', 'offsetY'):
+                if name in saved:
+                    getattr(format_control, name).write(0)
+            for name in ('decimationHorizontal', 'decimationVertical', 'width', 'height', 'offsetX', 'offsetY'):
+                if name in saved:
+                    getattr(format_control, name).write(saved[name])
+
+    def __enter__(self) -> "MatrixCam":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
 
     def close(self) -> None:
         """
@@ -32,7 +206,18 @@ class MatrixCam:
         :return: none
         """
         self.pPreviousRequest = None
+        if self.active_stream is not None:
+            self.active_stream.stop()
+
+        if self.device is not None:
+            self.device.close()
+            self.device = None
+            self.device_interface = None
+            self.format_control = None
+            self.device_control = None
+            print('The camera {:s} is closed'.format(self.serial))
 
+    @metrics.timed('set_exposure')
     def set_exposure(self, exposure: float) -> None:
         """
         Set exposure time of the camera
@@ -40,20 +225,28 @@ class MatrixCam:
         :return: none
         """
 
+        if self.device is not None:
+            self.ac.exposureTime.write(exposure)
+            self.exposure = exposure
+            return
+
         # initialize ac setting and write new exposure
         devMgr = acquire.DeviceManager()
         cam = devMgr.getDevice(self.cam_id)
-        cam.open()
+        with span('device_open'):
+            cam.open()
         ac = acquire.AcquisitionControl(cam)
         ac.exposureTime.write(exposure)
         self.exposure = exposure
         cam.close()
 
     @staticmethod
-    def reset_the_queue(device_interface) -> None:
+    @metrics.timed('reset_the_queue')
+    def reset_the_queue(device_interface, prime: bool = True) -> None:
         """
         Reset buffer queue
         :param device_interface: FunctionInterface of the camera
+        :param prime: fill the queue again with every free request
         return: none
         """
         # reset the queue
@@ -63,104 +256,469 @@ class MatrixCam:
             request.unlock()
             request_number = device_interface.imageRequestWaitFor(0)
         device_interface.imageRequestReset(0, 0)
+        if prime:
+            MatrixCam.prime_the_queue(device_interface)
 
+    @staticmethod
+    def prime_the_queue(device_interface) -> None:
+        """
+        Queue every free request
+        :param device_interface: FunctionInterface of the camera
+        :return: none
+        """
         # pre-fill the buffer and start the infinite loop
         image_request_result = device_interface.imageRequestSingle()
         while image_request_result == acquire.DMR_NO_ERROR:
             image_request_result = device_interface.imageRequestSingle()
 
     @staticmethod
-    def get_one_channel_image(request) -> np.ndarray:
+    def read_frame_tag(request) -> Tuple[Optional[int], Optional[int]]:
         """
-        Get one channel image
+        Exposure and timestamp of the frame in a request, from the info properties of the driver
         :param request: request of shot
+        :return: exposure time and timestamp (device clock) in us, None when the device does not fill them
+        """
+        def read(name: str) -> Optional[int]:
+            # the properties exist on every driver build, the device may leave them empty
+            prop = getattr(request, name, None)
+            if prop is None or not getattr(prop, 'isValid', True):
+                return None
+            value = prop.read()
+            return value if value > 0 else None
+
+        return read('infoExposeTime_us'), read('infoTimeStamp_us')
+
+    @staticmethod
+    def exposure_matches(frame_exposure: int, exposure: int) -> bool:
+        """
+        Tell if the exposure tag of a frame is the exposure set, up to the rounding of the sensor
+        :param frame_exposure: exposure tag of the frame
+        :param exposure: exposure time set
+        :return: True for the same exposure
+        """
+        return abs(frame_exposure - exposure) <= max(EXPOSURE_TOLERANCE_US, exposure * EXPOSURE_TOLERANCE)
+
+    def read_device_clock(self) -> Optional[int]:
+        """
+        Latch and read the clock of the device, the clock of the frame timestamps
+        :return: time in us, None if the device cannot latch its clock
+        """
+        device_control = self.device_control
+        if device_control is None or not hasattr(device_control, 'timestampLatch') \
+                or not hasattr(device_control, 'timestampLatchValue'):
+            return None
+        device_control.timestampLatch.call()
+        ticks = device_control.timestampLatchValue.read()
+        if hasattr(device_control, 'gevTimestampTickFrequency'):
+            return int(ticks * 1e6 / device_control.gevTimestampTickFrequency.read())
+        # SFNC timestamps are in ns
+        return ticks // 1000
+
+    def check_exposure_tags(self, exposure: int) -> bool:
+        """
+        Enable the tagged photos if the last frame, taken after a reset of the queue, has an exposure
+        tag equal to `exposure` and a timestamp in the clock that the device can latch
+        :param exposure: exposure time of the last frame
+        :return: True if the tags can be used
+        """
+        self.tags_checked = True
+        clock = self.read_device_clock()
+        self.exposure_tags = self.frame_exposure is not None and self.frame_timestamp is not None \
+            and clock is not None and self.exposure_matches(self.frame_exposure, exposure) \
+            and 0 <= clock - self.frame_timestamp < MAX_TAG_AGE_US
+        if not self.exposure_tags:
+            print('The camera {:s} does not tag its frames, the queue is reset for every photo'.format(self.serial))
+        return self.exposure_tags
+
+    @staticmethod
+    def get_one_channel_image(request, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Get one channel image, 8 bit formats in uint8 and the others (Mono10/12/14/16 and the packed
+        ones) in uint16, honoring the line pitch of the buffer. The image has the shape of get_format,
+        only the first channel of a multi-channel format is kept.
+        :param request: request of shot
+        :param out: array that receives the image, None for a view of the driver buffer (a new array
+                    for the packed formats)
         :return: image
         """
 
-        # set number of channel and dimension
-        channel_count = 1
+        # set number of channel and dimension, the packed formats are mono
         height = request.imageHeight.read()
         width = request.imageWidth.read()
+        bit_depth = request.imageChannelBitDepth.read()
+        pixel_format = get_pixel_format(request.imagePixelFormat.readS(), bit_depth) \
+            if hasattr(request, 'imagePixelFormat') else get_pixel_format(None, bit_depth)
+        channel_count = 1 if pixel_format.packed else request.imageChannelCount.read()
+        row_bytes = pixel_format.row_bytes(width, channel_count)
+        line_pitch = request.imageLinePitch.read() if hasattr(request, 'imageLinePitch') else row_bytes
+        line_pitch = line_pitch or row_bytes
 
         # generate image
         img_data = request.imageData.read()
-        c_buf = (ctypes.c_char * height * width).from_address(int(img_data))
-        img = np.frombuffer(c_buf, dtype=np.uint8)
-        img.shape = (height, width, channel_count)
+        c_buf = (ctypes.c_char * (line_pitch * (height - 1) + row_bytes)).from_address(int(img_data))
+
+        if pixel_format.packed:
+            raw = np.ndarray((height, row_bytes // pixel_format.group_bytes, pixel_format.group_bytes), np.uint8,
+                             c_buf, strides=(line_pitch, pixel_format.group_bytes, 1))
+            if out is None:
+                out = np.empty((height, width, 1), dtype=pixel_format.dtype)
+            elif not out.flags.c_contiguous:
+                raise ValueError('out must be a contiguous array')
+            return unpack(raw, pixel_format, out)
 
-        return img
+        # first channel of the interleaved pixels
+        itemsize = pixel_format.dtype.itemsize
+        img = np.ndarray((height, width, 1), pixel_format.dtype.newbyteorder('<'), c_buf,
+                         strides=(line_pitch, channel_count * itemsize, itemsize))
+        if out is None:
+            return img
+        np.copyto(out, img)
+        return out
 
-    def acquire_frames(self, device, device_interface, time_out, total_frames) -> np.ndarray:
+    def get_format(self, device=None) -> tuple:
         """
-        Acquire frames
+        Get the shape of the frames delivered by the camera
+        :param device: camera, None for the device of the session
+        :return: height, width and number of channels
+        """
+        if device is None or device is self.device:
+            format_control = self.format_control
+        else:
+            format_control = acquire.ImageFormatControl(device)
+        img_height = int(format_control.height.readS())
+        img_width = int(format_control.width.readS())
+
+        return img_height, img_width, 1
+
+    def frame_pool(self, capacity: int = 3) -> FramePool:
+        """
+        Create a pool of frames with the format of the camera
+        :param capacity: number of frames
+        :return: frame pool
+        """
+        return FramePool(self.get_format(), self.pixel_format.dtype, capacity)
+
+    def iter_frames(self, device, device_interface, time_out, total_frames, pool: FramePool = None,
+                    stop_check: Callable[[], None] = None, exposure: Optional[int] = None,
+                    not_before: Optional[int] = None):
+        """
+        Acquire frames one at a time, every frame is copied once out of the driver buffer
         :param device: camera
         :param device_interface: FunctionInterface of the camera
         :param time_out: parameter for loop
         :param total_frames: number of frames that I want to acquire
-        :return: output image
+        :param pool: frame pool that receives the frames, None for new arrays; FramePoolExhausted (or the
+                     error of stop_check) if the consumer keeps every frame
+        :param stop_check: called after every wait without a frame, it raises to stop the acquisition
+        :param exposure: discard the frames tagged with another exposure time, None to keep every frame
+        :param not_before: discard the frames that started before this time of the device clock (us), None to
+                           keep every frame
+        :return: generator of images, or of FrameHandle when a pool is given
         """
 
         img_saved = 0
-        previous_request = None
-
-        # create a circular buffer
-        format_control = acquire.ImageFormatControl(device)
-        img_height = int(format_control.height.readS())
-        img_width = int(format_control.width.readS())
-
-        # set variables
-        img_counter = 0
-        buffer_capacity = 3
-        batch_size = 1
-        buffer_total_length = buffer_capacity * batch_size
-        img_buffer = np.zeros((img_height, img_width, buffer_capacity * batch_size), dtype=np.uint8)
-        out_images = []
+        stale = 0
+        # every frame buffered by the driver may have started before the call
+        max_stale = MAX_STALE_FRAMES + (device_interface.requestCount() if hasattr(device_interface, 'requestCount')
+                                        else 0)
+        if pool is None:
+            img_shape = self.get_format(device)
 
         # acquisition loop
         while img_saved < total_frames:
-            request_number = device_interface.imageRequestWaitFor(time_out)
+            with span('wait'):
+                request_number = device_interface.imageRequestWaitFor(time_out)
             if device_interface.isRequestNrValid(request_number):
                 request = device_interface.getRequest(request_number)
-                if request.isOK:
-                    img = self.get_one_channel_image(request)
-
-                    # Save a copy on circular buffer
-                    np.copyto(img_buffer[:, :, img_counter % buffer_total_length], img[:, :, 0])
-                    current_image = np.copy(img)
-                    out_images.append(current_image)
+                frame = None
+                frame_exposure, frame_timestamp = self.read_frame_tag(request) if request.isOK else (None, None)
+                if (exposure is not None and frame_exposure is not None
+                        and not self.exposure_matches(frame_exposure, exposure)) \
+                        or (not_before is not None and frame_timestamp is not None and frame_timestamp < not_before):
+                    # taken before the call or before the exposure change, give the buffer back without copying it
+                    self.stale_frames += 1
+                    stale += 1
+                    if stale > max_stale:
+                        request.unlock()
+                        raise RuntimeError('the frames are tagged with exposure {} at {} us, not {} after {} us'.format(
+                            frame_exposure, frame_timestamp, exposure, not_before))
+                elif request.isOK:
+                    # the only copy: driver buffer -> frame
+                    if pool is None:
+                        frame = np.empty(img_shape, dtype=self.pixel_format.dtype)
+                        with span('copy'):
+                            self.get_one_channel_image(request, frame)
+                    else:
+                        try:
+                            frame = self._borrow_frame(pool, time_out, stop_check)
+                        except Exception:
+                            # the driver buffer goes back before the error reaches the caller
+                            request.unlock()
+                            raise
+                        with span('copy'):
+                            self.get_one_channel_image(request, frame.image)
+                        frame.exposure, frame.timestamp = frame_exposure, frame_timestamp
+                    self.frame_exposure, self.frame_timestamp = frame_exposure, frame_timestamp
                     img_saved += 1
+                    stale = 0
 
-                if previous_request is not None:
-                    previous_request.unlock()
-                previous_request = request
+                # the driver buffer is not referenced anymore
+                request.unlock()
+                if frame is not None:
+                    yield frame
+            elif stop_check is not None:
+                stop_check()
 
             # the buffer must be filled again with another request
             device_interface.imageRequestSingle()
 
-        return out_images
+    @staticmethod
+    def _borrow_frame(pool: FramePool, time_out, stop_check: Callable[[], None] = None):
+        """
+        Take a frame of the pool, the frames come back only when the consumer releases them
+        :param pool: frame pool
+        :param time_out: max time of a single wait in ms, -1 for POLL_MS
+        :param stop_check: called after every wait without a frame, it raises to stop the acquisition
+        :return: FrameHandle
+        """
+        wait = (POLL_MS if time_out < 0 else time_out) / 1000
+        while True:
+            try:
+                return pool.acquire(timeout=wait)
+            except FramePoolExhausted:
+                # without a stop check the consumer gets the error instead of a hang
+                if stop_check is None:
+                    raise
+                stop_check()
+
+    def acquire_frames(self, device, device_interface, time_out, total_frames, pool: FramePool = None,
+                       stop_check: Callable[[], None] = None, exposure: Optional[int] = None,
+                       not_before: Optional[int] = None) -> list:
+        """
+        Acquire frames
+        :param device: camera
+        :param device_interface: FunctionInterface of the camera
+        :param time_out: parameter for loop
+        :param total_frames: number of frames that I want to acquire
+        :param pool: frame pool that receives the frames, None for new arrays
+        :param stop_check: called after every wait without a frame, it raises to stop the acquisition
+        :param exposure: discard the frames tagged with another exposure time, None to keep every frame
+        :param not_before: discard the frames that started before this time of the device clock (us), None to
+                           keep every frame
+        :return: output images, or FrameHandle to release when a pool is given
+        """
+        if pool is not None and total_frames > pool.available:
+            raise FramePoolExhausted()
+
+        return list(self.iter_frames(device, device_interface, time_out, total_frames, pool, stop_check, exposure,
+                                     not_before))
+
+    def stream(self, max_queue: int = 4, policy: str = DROP_OLDEST, pool: FramePool = None) -> FrameStream:
+        """
+        Start a continuous acquisition, see FrameStream
+        :param max_queue: max number of frames waiting for the consumer
+        :param policy: 'drop_oldest' or 'block', what to do when the consumer is slower than the camera
+        :param pool: frame pool that receives the frames, None for new arrays
+        :return: running frame stream, stop it to use take_photo again
+        """
+        if self.active_stream is not None:
+            raise RuntimeError('the camera is already streaming')
+        self.active_stream = FrameStream(self, max_queue, policy, pool)
+        return self.active_stream.start()
+
+    def capture_bracket(self, exposures, timeout: Optional[float] = None) -> list:
+        """
+        Take one photo for every exposure time in a single pass: the request of photo k+1 is queued with
+        its exposure as soon as photo k is delivered, so the exposure change and the next photo overlap
+        the copy of photo k.
+        :param exposures: exposure times
+        :param timeout: max waiting time of every photo in seconds, None wait forever
+        :return: images in the order of the exposure times
+        """
+        if self.device is None:
+            raise RuntimeError('the bracketing needs a MatrixCam opened in session mode')
+        if self.active_stream is not None:
+            raise RuntimeError('capture_bracket is not available while the camera is streaming')
+        exposures = [int(exposure) for exposure in exposures]
+        if not exposures:
+            return []
+
+        device_interface = self.device_interface
+        img_shape = self.get_format()
+        timeout_ms = -1 if timeout is None else POLL_MS
+        stop_check = self._stop_check(timeout, None)
+
+        # one request in flight at a time, each with its own exposure
+        self.reset_the_queue(device_interface, prime=False)
+        self.set_exposure(exposures[0])
+        device_interface.imageRequestSingle()
+
+        images = []
+        while len(images) < len(exposures):
+            with span('wait'):
+                request_number = device_interface.imageRequestWaitFor(timeout_ms)
+            if not device_interface.isRequestNrValid(request_number):
+                stop_check()
+                continue
+            request = device_interface.getRequest(request_number)
+            if not request.isOK:
+                # shoot the same exposure again
+                request.unlock()
+                device_interface.imageRequestSingle()
+                continue
+
+            # start the next photo before copying this one
+            next_index = len(images) + 1
+            if next_index < len(exposures):
+                self.set_exposure(exposures[next_index])
+                device_interface.imageRequestSingle()
 
-    def take_photo(self) -> np.ndarray:
+            img = np.empty(img_shape, dtype=self.pixel_format.dtype)
+            with span('copy'):
+                self.get_one_channel_image(request, img)
+            request.unlock()
+            images.append(img)
+            self.captures += 1
+            stop_check = self._stop_check(timeout, None)
+
+        return images
+
+    def acquire_summary(self, total_frames: int, timeout: Optional[float] = None) -> FrameStackSummary:
+        """
+        Acquire frames and reduce them as they arrive to mean, variance, max and saturation counts.
+        The memory does not grow with the number of frames but it is far more than two frames: the
+        float64 mean, variance and their two scratch buffers take 32 bytes per pixel, the saturation
+        counts 5, max and the two pooled frames 3 (6 with the 16 bit formats), about 40 bytes per pixel
+        during the acquisition; the copies of the summary add 21, the peak is about 64 bytes per pixel
+        with Mono8 (320 MB at 5 MP)
+        :param total_frames: number of frames
+        :param timeout: max waiting time of every frame in seconds, None wait forever
+        :return: summary of the frames
+        """
+        if self.device is None:
+            raise RuntimeError('the frame summary needs a MatrixCam opened in session mode')
+        if self.active_stream is not None:
+            raise RuntimeError('acquire_summary is not available while the camera is streaming')
+
+        pool = self.frame_pool(capacity=2)
+        statistics = RunningFrameStatistics(pool.shape, self.max_value)
+        timeout_ms = -1 if timeout is None else POLL_MS
+
+        self.reset_the_queue(self.device_interface)
+        for handle in self.iter_frames(self.device, self.device_interface, timeout_ms, total_frames, pool,
+                                       self._stop_check(timeout, None)):
+            statistics.add(handle.image)
+            handle.release()
+            self.captures += 1
+
+        return statistics.summary()
+
+    def record(self, container: CaptureContainer, total_frames: int, material: str = '', filter_name: str = '',
+               timeout: Optional[float] = None) -> list:
+        """
+        Acquire frames straight into a capture container, with their exposure and saturation
+        :param container: container with the format of the camera
+        :param total_frames: number of frames
+        :param material: material
+        :param filter_name: filter
+        :param timeout: max waiting time of every frame in seconds, None wait forever
+        :return: indexes of the frames in the container
+        """
+        if self.device is None:
+            raise RuntimeError('the recording needs a MatrixCam opened in session mode')
+        if self.active_stream is not None:
+            raise RuntimeError('record is not available while the camera is streaming')
+
+        pool = self.frame_pool(capacity=2)
+        if container.shape != pool.shape or container.dtype != pool.dtype:
+            raise ValueError('the container must have shape {} and type {}'.format(pool.shape, pool.dtype))
+        timeout_ms = -1 if timeout is None else POLL_MS
+
+        indexes = []
+        self.reset_the_queue(self.device_interface)
+        for handle in self.iter_frames(self.device, self.device_interface, timeout_ms, total_frames, pool,
+                                       self._stop_check(timeout, None)):
+            with handle:
+                exposure = self.exposure if handle.exposure is None else handle.exposure
+                # the saturation of the sensor, the max value of the container may be the one of its type
+                saturation = eval_saturation(handle.image, self.max_value)
+                indexes.append(container.append(handle.image, exposure, saturation, serial=self.serial,
+                                                material=material, filter_name=filter_name, gain=self.gain))
+            self.captures += 1
+
+        return indexes
+
+    @staticmethod
+    def _stop_check(timeout: Optional[float], cancel_event: Optional[threading.Event]) -> Callable[[], None]:
+        """
+        Build the check that interrupts a capture
+        :param timeout: max time of the capture in seconds, None wait forever
+        :param cancel_event: event that cancels the capture, None to not cancel
+        :return: function that raises TimeoutError or CaptureCancelled
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        def stop_check() -> None:
+            if cancel_event is not None and cancel_event.is_set():
+                raise CaptureCancelled()
+            if deadline is not None and time.perf_counter() > deadline:
+                raise TimeoutError('no frame in {:.3f} s'.format(timeout))
+
+        return stop_check
+
+    def take_photo(self, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) \
+            -> np.ndarray:
         """
         Take photo
+        :param timeout: max waiting time in seconds, None wait forever
+        :param cancel_event: event that interrupts the wait with CaptureCancelled
         :return: output image
         """
 
-        timeout = -1
+        timeout_ms = -1
+        stop_check = None
+        if timeout is not None or cancel_event is not None:
+            # wait in slices to check the timeout and the cancellation
+            timeout_ms = POLL_MS
+            stop_check = self._stop_check(timeout, cancel_event)
+        if self.active_stream is not None:
+            raise RuntimeError('take_photo is not available while the camera is streaming')
+
+        if self.device is not None:
+            # the session keeps the device and its function interface alive
+            self.captures += 1
+            now = time.perf_counter()
+            exposure = self.ac.exposureTime.read()
+            if self.exposure_tags and self.last_tagged_photo is not None \
+                    and now - self.last_tagged_photo < TAGGED_MAX_IDLE:
+                # the queue keeps running, the frames started before this call (so also before the last
+                # set_exposure) or with another exposure are discarded
+                not_before = self.read_device_clock()
+                self.prime_the_queue(self.device_interface)
+                img = self.acquire_frames(self.device, self.device_interface, timeout_ms, 1, stop_check=stop_check,
+                                          exposure=exposure, not_before=not_before)[0]
+            else:
+                self.reset_the_queue(self.device_interface)
+                img = self.acquire_frames(self.device, self.device_interface, timeout_ms, 1, stop_check=stop_check)[0]
+                if not self.tags_checked:
+                    self.check_exposure_tags(exposure)
+            if self.exposure_tags:
+                self.last_tagged_photo = time.perf_counter()
+            return img
 
         # set the device and open it
         devMgr = acquire.DeviceManager()
         device = devMgr.getDevice(self.cam_id)
-        device.open()
+        with span('device_open'):
+            device.open()
         device_interface = acquire.FunctionInterface(device)
         print('Camera {:s} started acquisition...'.format(device.serial.read()))
         self.reset_the_queue(device_interface)
 
         try:
-            result_image = self.acquire_frames(device, device_interface, timeout, 1)[0]
-        except Exception as e:
-            print(str(e))
+            self.captures += 1
+            # TimeoutError and CaptureCancelled reach the caller, the device is closed anyway
+            return self.acquire_frames(device, device_interface, timeout_ms, 1, stop_check=stop_check)[0]
         finally:
             device.close()
             print('The camera {:s} is closed'.format(device.serial.read()))
-
-        return result_image
@@ -0,0 +1,150 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.components.matrix_cam import MatrixCam
+from src.exposure.controller import ExposureController, ExposureResult
+
+
+class MultiCamCapture:
+    def __init__(self, index: int):
+        """
+        Frames of the cameras triggered together
+        :param index: number of the capture
+        """
+        self.index = index
+        self.frames = {}
+        self.trigger_times = {}
+
+    @property
+    def trigger_spread(self) -> float:
+        """
+        Max distance between the triggers of the cameras in seconds
+        """
+        if not self.trigger_times:
+            return 0.0
+        return max(self.trigger_times.values()) - min(self.trigger_times.values())
+
+
+class MultiCamCoordinator:
+    def __init__(self, cam_ids: Sequence[int],
+                 controller_factory: Callable[[MatrixCam], ExposureController] =
+                 lambda cam: ExposureController(max_value=cam.max_value)):
+        """
+        Drive several MatrixCam together, every camera has its own worker thread.
+
+        A simple use case is:
+
+        >>> with MultiCamCoordinator([0, 1]) as cams:
+        >>>     cams.auto_expose()
+        >>>     captures = cams.capture(3)
+
+        :param cam_ids: ids of the cameras
+        :param controller_factory: function that gives the exposure controller of a camera, the default one
+                                   uses the max value of the pixel format of the camera
+        """
+        self.cam_ids = list(cam_ids)
+        self.controller_factory = controller_factory
+        self.executor = ThreadPoolExecutor(max_workers=len(self.cam_ids), thread_name_prefix='MultiCam')
+
+        # open the devices in parallel, opening is slow
+        self.cams = {}
+        futures = {cam_id: self.executor.submit(MatrixCam, cam_id) for cam_id in self.cam_ids}
+        # every open ends before a failure is raised, the cameras opened by the other workers are closed
+        wait(futures.values())
+        for cam_id, future in futures.items():
+            if future.exception() is None:
+                self.cams[cam_id] = future.result()
+        errors = [future.exception() for future in futures.values() if future.exception() is not None]
+        if errors:
+            self.close()
+            raise errors[0]
+
+    def __enter__(self) -> "MultiCamCoordinator":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close every camera
+        :return: none
+        """
+        for cam in self.cams.values():
+            cam.close()
+        self.cams = {}
+        self.executor.shutdown()
+
+    def _run_all(self, fun: Callable[[int, MatrixCam], object]) -> Dict[int, object]:
+        """
+        Run a function on every camera in its worker thread
+        :param fun: function of cam id and camera
+        :return: result of every camera
+        """
+        futures = {cam_id: self.executor.submit(fun, cam_id, cam) for cam_id, cam in self.cams.items()}
+        return {cam_id: future.result() for cam_id, future in futures.items()}
+
+    def set_exposures(self, exposures: Dict[int, float]) -> None:
+        """
+        Set the exposure time of the cameras
+        :param exposures: exposure time of every cam id
+        :return: none
+        """
+        for cam_id, exposure in exposures.items():
+            self.cams[cam_id].set_exposure(exposure)
+
+    def auto_expose(self, initial_exposures: Optional[Dict[int, float]] = None) -> Dict[int, ExposureResult]:
+        """
+        Run the exposure control of every camera concurrently
+        :param initial_exposures: first exposure time of every cam id, None for the default of the controller
+        :return: result of every camera
+        """
+        initial_exposures = initial_exposures or {}
+
+        def expose(cam_id: int, cam: MatrixCam) -> ExposureResult:
+            return self.controller_factory(cam).run(cam, initial_exposures.get(cam_id))
+
+        return self._run_all(expose)
+
+    def capture(self, total_captures: int = 1) -> List[MultiCamCapture]:
+        """
+        Take photos with every camera, the cameras are released together for each capture
+        :param total_captures: number of captures
+        :return: captures with the frame of every camera
+        """
+        captures = [MultiCamCapture(i) for i in range(total_captures)]
+        barrier = threading.Barrier(len(self.cams))
+        lock = threading.Lock()
+
+        def shoot(cam_id: int, cam: MatrixCam) -> None:
+            try:
+                for capture in captures:
+                    barrier.wait()
+                    trigger_time = time.perf_counter()
+                    img = cam.take_photo()
+                    with lock:
+                        capture.trigger_times[cam_id] = trigger_time
+                        capture.frames[cam_id] = img
+            except threading.BrokenBarrierError:
+                # another camera failed, its error is raised by _run_all
+                return
+            except Exception:
+                barrier.abort()
+                raise
+
+        self._run_all(shoot)
+
+        return captures
+
+    def frames_by_device(self, captures: List[MultiCamCapture]) -> Dict[int, List[np.ndarray]]:
+        """
+        Group the frames of the captures per camera
+        :param captures: captures
+        :return: frames of every cam id in capture order
+        """
+        return {cam_id: [capture.frames[cam_id] for capture in captures if cam_id in capture.frames]
+                for cam_id in self.cam_ids}
@@ -0,0 +1,159 @@
+from typing import Optional
+
+import numpy as np
+
+# layouts of the packed formats
+UNPACKED = 'unpacked'
+PACKED_LSB = 'lsb'    # GenICam PFNC (Mono10p, Mono12p): a little endian bit stream
+PACKED_GIGE = 'gige'  # GigE Vision (Mono10Packed, Mono12Packed): high bits of two pixels + a shared byte of low bits
+
+
+class PixelFormat:
+    def __init__(self, name: str, bit_depth: int, layout: str = UNPACKED):
+        """
+        Layout of the pixels of a mono frame in the driver buffer
+        :param name: name of the format
+        :param bit_depth: significant bits of a pixel
+        :param layout: 'unpacked', 'lsb' or 'gige'
+        """
+        self.name = name
+        self.bit_depth = bit_depth
+        self.layout = layout
+
+        # frames are delivered in uint8 up to 8 bit, in uint16 above
+        self.dtype = np.dtype(np.uint8) if bit_depth <= 8 else np.dtype(np.uint16)
+        self.max_value = (1 << bit_depth) - 1
+
+        # pixels packed in a group of bytes
+        if layout == UNPACKED:
+            self.group_pixels, self.group_bytes = 1, self.dtype.itemsize
+        elif layout == PACKED_LSB and bit_depth == 10:
+            self.group_pixels, self.group_bytes = 4, 5
+        else:
+            self.group_pixels, self.group_bytes = 2, 3
+
+    @property
+    def packed(self) -> bool:
+        return self.layout != UNPACKED
+
+    def row_bytes(self, width: int, channel_count: int = 1) -> int:
+        """
+        Bytes of the pixels of a row, without the padding of the line pitch
+        :param width: pixels of a row
+        :param channel_count: number of channels
+        :return: number of bytes
+        """
+        if width % self.group_pixels:
+            raise ValueError('{} needs a width multiple of {}'.format(self.name, self.group_pixels))
+        return width * channel_count // self.group_pixels * self.group_bytes
+
+    def __repr__(self) -> str:
+        return 'PixelFormat({})'.format(self.name)
+
+
+PIXEL_FORMATS = {
+    'Mono8': PixelFormat('Mono8', 8),
+    'Mono10': PixelFormat('Mono10', 10),
+    'Mono12': PixelFormat('Mono12', 12),
+    'Mono14': PixelFormat('Mono14', 14),
+    'Mono16': PixelFormat('Mono16', 16),
+    'Mono10p': PixelFormat('Mono10p', 10, PACKED_LSB),
+    'Mono12p': PixelFormat('Mono12p', 12, PACKED_LSB),
+    'Mono10Packed': PixelFormat('Mono10Packed', 10, PACKED_GIGE),
+    'Mono12Packed': PixelFormat('Mono12Packed', 12, PACKED_GIGE),
+}
+
+# names of the same layouts in the request buffers of the driver
+PIXEL_FORMATS['Mono12Packed_V1'] = PIXEL_FORMATS['Mono12Packed']
+PIXEL_FORMATS['Mono12Packed_V2'] = PIXEL_FORMATS['Mono12p']
+
+
+def get_pixel_format(name: Optional[str], bit_depth: int = 8) -> PixelFormat:
+    """
+    Find a pixel format
+    :param name: name of the format, None if the driver does not tell it
+    :param bit_depth: bits of a pixel, used for the unknown formats
+    :return: pixel format, unknown formats are read as unpacked with the given bit depth
+    """
+    if name in PIXEL_FORMATS:
+        return PIXEL_FORMATS[name]
+    if bit_depth <= 8:
+        return PIXEL_FORMATS['Mono8']
+    return PixelFormat(name or 'Mono{}'.format(bit_depth), bit_depth)
+
+
+def unpack(raw: np.ndarray, pixel_format: PixelFormat, out: np.ndarray) -> np.ndarray:
+    """
+    Unpack a packed frame, vectorized over the whole frame and without temporary arrays
+    (Mono10Packed needs one of half the frame)
+    :param raw: uint8 view of the buffer with shape (height, groups of a row, bytes of a group), it
+                can have the stride of the line pitch
+    :param pixel_format: packed format
+    :param out: uint16 output with shape (height, width) or (height, width, 1)
+    :return: out
+    """
+    height, groups, _ = raw.shape
+    pixels = out.reshape(height, groups, pixel_format.group_pixels)
+    b = [raw[:, :, i] for i in range(pixel_format.group_bytes)]
+    p = [pixels[:, :, i] for i in range(pixel_format.group_pixels)]
+
+    if pixel_format.layout == PACKED_LSB:
+        # pixel k is made of the bits of two consecutive bytes: ((high << 8 | low) >> shift) & mask
+        mask = pixel_format.max_value
+        for k, pixel in enumerate(p):
+            first_bit = k * pixel_format.bit_depth
+            low = first_bit // 8
+            np.copyto(pixel, b[low + 1])
+            pixel <<= 8
+            pixel |= b[low]
+            pixel >>= first_bit % 8
+            pixel &= mask
+        return out
+
+    low_bits = pixel_format.bit_depth - 8
+    low_mask = (1 << low_bits) - 1
+    # pixel 0: b0 are the high bits, the low bits are at the bottom of b1
+    np.copyto(p[1], b[1])
+    p[1] &= low_mask
+    np.copyto(p[0], b[0])
+    p[0] <<= low_bits
+    p[0] |= p[1]
+    # pixel 1: b2 are the high bits, the low bits start at bit 4 of b1
+    if low_bits == 4:
+        np.copyto(p[1], b[2])
+        p[1] <<= 8
+        p[1] |= b[1]
+        p[1] >>= 4
+    else:
+        np.copyto(p[1], b[1])
+        p[1] >>= 4
+        p[1] &= low_mask
+        p[1] |= np.left_shift(b[2], low_bits, dtype=np.uint16)
+    return out
+
+
+def pack(img: np.ndarray, pixel_format: PixelFormat) -> np.ndarray:
+    """
+    Pack a frame, inverse of unpack
+    :param img: uint16 image with shape (height, width)
+    :param pixel_format: packed format
+    :return: uint8 array with shape (height, bytes of a row)
+    """
+    height, width = img.shape[:2]
+    pixels = img.reshape(height, width // pixel_format.group_pixels, pixel_format.group_pixels).astype(np.uint64)
+    groups = np.zeros(pixels.shape[:2] + (pixel_format.group_bytes,), dtype=np.uint8)
+
+    if pixel_format.layout == PACKED_LSB:
+        stream = np.zeros(pixels.shape[:2], dtype=np.uint64)
+        for k in range(pixel_format.group_pixels):
+            stream |= pixels[:, :, k] << np.uint64(k * pixel_format.bit_depth)
+        for i in range(pixel_format.group_bytes):
+            groups[:, :, i] = (stream >> np.uint64(8 * i)) & np.uint64(0xFF)
+    else:
+        low_bits = pixel_format.bit_depth - 8
+        low_mask = np.uint64((1 << low_bits) - 1)
+        groups[:, :, 0] = pixels[:, :, 0] >> np.uint64(low_bits)
+        groups[:, :, 1] = (pixels[:, :, 0] & low_mask) | ((pixels[:, :, 1] & low_mask) << np.uint64(4))
+        groups[:, :, 2] = pixels[:, :, 1] >> np.uint64(low_bits)
+
+    return groups.reshape(height, -1)
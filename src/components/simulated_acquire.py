@@ -0,0 +1,483 @@
+"""
+Simulated stand-in for the `mvIMPACT.acquire` module.
+
+It implements the subset of the driver API used by `MatrixCam` so the acquisition code can be
+exercised and benchmarked without the physical camera. A typical use case is:
+
+>>> from src.components import simulated_acquire
+>>> simulated_acquire.install(open_delay=0.2)
+>>> from src.components.matrix_cam import MatrixCam
+"""
+import sys
+import threading
+import time
+import types
+from typing import List
+
+import numpy as np
+
+from src.components.pixel_formats import PIXEL_FORMATS, get_pixel_format, pack
+
+# error codes, same names used by the driver
+DMR_NO_ERROR = 0
+DEV_NO_FREE_REQUEST_AVAILABLE = -2112
+DEV_WAIT_FOR_REQUEST_FAILED = -2119
+
+# default parameters of the simulated devices, see configure()
+DEFAULT_SETTINGS = {
+    "device_count": 1,
+    "width": 640,
+    "height": 480,
+    "request_count": 4,
+    "exposure": 100000,
+    "open_delay": 0.15,
+    "close_delay": 0.05,
+    "readout_delay": 0.01,
+    "reset_delay": 0.0,
+    "time_scale": 1.0,
+    "scene_exposure": 100000,
+    "noise_sigma": 1.5,
+    "seed": 0,
+    "pixel_format": "Mono8",
+    "line_padding": 0,
+    "supports_roi": True,
+    "supports_decimation": True,
+    "exposure_tags": True,
+    "tags_populated": True,
+    "device_clock": True,
+    "line_time_us": 0.0,
+}
+
+_settings = dict(DEFAULT_SETTINGS)
+_devices = []
+_devices_lock = threading.Lock()
+
+
+class ImpactAcquireException(Exception):
+    @staticmethod
+    def getErrorCodeAsString(error_code: int) -> str:
+        """
+        Translate an error code to a readable string
+        :param error_code: error code
+        :return: description
+        """
+        names = {
+            DMR_NO_ERROR: "DMR_NO_ERROR",
+            DEV_NO_FREE_REQUEST_AVAILABLE: "DEV_NO_FREE_REQUEST_AVAILABLE",
+            DEV_WAIT_FOR_REQUEST_FAILED: "DEV_WAIT_FOR_REQUEST_FAILED",
+        }
+        return names.get(error_code, "UNKNOWN_ERROR")
+
+
+class _Property:
+    def __init__(self, value=None, getter=None, setter=None, valid: bool = True):
+        """
+        Driver property
+        :param value: constant value of the property
+        :param getter: function that returns the value
+        :param setter: function that writes the value
+        :param valid: False for a property that the device does not fill
+        """
+        self._value = value
+        self._getter = getter
+        self._setter = setter
+        self.isValid = valid
+
+    def read(self):
+        if self._getter is not None:
+            return self._getter()
+        return self._value
+
+    def readS(self) -> str:
+        return str(self.read())
+
+    @property
+    def isWriteable(self) -> bool:
+        return self._setter is not None
+
+    def write(self, value) -> None:
+        if self._setter is None:
+            raise ImpactAcquireException("property is read only")
+        self._setter(value)
+
+
+class _Method:
+    def __init__(self, function):
+        """
+        Driver method
+        :param function: function run by call()
+        """
+        self._function = function
+
+    def call(self) -> int:
+        return self._function()
+
+
+class _Request:
+    def __init__(self, device: "_SimulatedDevice", request_nr: int):
+        """
+        Buffer of the simulated driver
+        :param device: owner device
+        :param request_nr: number of the request
+        """
+        self.device = device
+        self.requestNr = request_nr
+        self.isOK = False
+        self.state = "free"
+        self.exposure = 0
+        self.start_at = 0.0
+        self.done_at = 0.0
+        self.frame_nr = 0
+        self.buffer = np.zeros(0, dtype=np.uint8)
+        self.pixel_format = PIXEL_FORMATS["Mono8"]
+        self.line_pitch = 0
+
+        self.imageHeight = _Property(getter=lambda: self.height)
+        self.imageWidth = _Property(getter=lambda: self.width)
+        self.imageData = _Property(getter=lambda: self.buffer.ctypes.data)
+        self.imageSize = _Property(getter=lambda: self.buffer.nbytes)
+        self.imageChannelCount = _Property(1)
+        self.imageChannelBitDepth = _Property(getter=lambda: self.pixel_format.bit_depth)
+        self.imagePixelFormat = _Property(getter=lambda: self.pixel_format.name)
+        self.imageLinePitch = _Property(getter=lambda: self.line_pitch)
+        if device.settings["exposure_tags"]:
+            # exposure and start of the exposure (device clock) of the frame in the buffer
+            self.infoExposeTime_us = _Property(getter=lambda: self.exposure)
+            self.infoTimeStamp_us = _Property(getter=lambda: int(self.start_at * 1e6))
+            self.infoFrameNr = _Property(getter=lambda: self.frame_nr)
+        if not device.settings["tags_populated"]:
+            # the properties exist on every driver build, some devices leave them empty
+            self.infoExposeTime_us = _Property(0, valid=False)
+            self.infoTimeStamp_us = _Property(0, valid=False)
+            self.infoFrameNr = _Property(0, valid=False)
+        self.height = 0
+        self.width = 0
+
+    def unlock(self) -> int:
+        """
+        Give the buffer back to the driver
+        :return: error code
+        """
+        with self.device.lock:
+            self.state = "free"
+            self.isOK = False
+        return DMR_NO_ERROR
+
+
+class _SimulatedDevice:
+    def __init__(self, index: int, settings: dict):
+        """
+        Simulated camera: the intensity of a pixel is proportional to the scene radiance and the
+        exposure time, plus noise, and is clipped at the max value of the sensor
+        :param index: index of the device
+        :param settings: parameters of the simulation
+        """
+        self.index = index
+        self.settings = dict(settings)
+        self.serial = _Property("SIM{:05d}".format(index))
+        self.is_open = False
+        self.open_count = 0
+        self.lock = threading.RLock()
+
+        self.exposure = self.settings["exposure"]
+        self.width = self.settings["width"]
+        self.height = self.settings["height"]
+        self.pixel_format = get_pixel_format(self.settings["pixel_format"])
+
+        # area of interest and decimation of the readout
+        self.offset_x = 0
+        self.offset_y = 0
+        self.decimation_horizontal = 1
+        self.decimation_vertical = 1
+        self.busy_until = 0.0
+        self.requests = [_Request(self, i) for i in range(self.settings["request_count"])]
+        self.queued = []
+
+        # scene radiance normalized so that ~0.15% of the pixels saturate at scene_exposure
+        rng = np.random.default_rng(self.settings["seed"] + index)
+        y, x = np.mgrid[0:self.height, 0:self.width]
+        gradient = 0.4 + 0.3 * x / self.width + 0.2 * y / self.height
+        texture = rng.lognormal(0.0, 0.25, size=(self.height, self.width))
+        radiance = (gradient * texture).astype(np.float32)
+        radiance /= np.percentile(radiance, 99.85)
+        self.radiance = radiance
+        self.noise = [rng.normal(0, self.settings["noise_sigma"], size=radiance.shape).astype(np.float32)
+                      for _ in range(4)]
+        self.frame_counter = 0
+
+    @property
+    def isOpen(self) -> bool:
+        return self.is_open
+
+    def open(self) -> None:
+        time.sleep(self.settings["open_delay"])
+        with self.lock:
+            self.is_open = True
+            self.open_count += 1
+
+    def close(self) -> None:
+        time.sleep(self.settings["close_delay"])
+        with self.lock:
+            self.is_open = False
+            self.queued = []
+            for request in self.requests:
+                request.state = "free"
+                request.isOK = False
+
+    def render(self, request: _Request) -> None:
+        """
+        Fill the buffer of the request with a frame taken with the exposure of the request
+        :param request: request to fill
+        :return: none
+        """
+        pixel_format = self.pixel_format
+        max_value = pixel_format.max_value
+        scale = max_value * request.exposure / self.settings["scene_exposure"]
+        readout = (slice(self.offset_y, self.offset_y + self.height * self.decimation_vertical, self.decimation_vertical),
+                   slice(self.offset_x, self.offset_x + self.width * self.decimation_horizontal,
+                         self.decimation_horizontal))
+        frame = self.radiance[readout] * scale
+        frame += self.noise[self.frame_counter % len(self.noise)][readout] * (max_value / 255)
+        self.frame_counter += 1
+        np.clip(frame, 0, max_value, out=frame)
+        np.rint(frame, out=frame)
+
+        # bytes of the rows in the layout of the pixel format
+        if pixel_format.packed:
+            rows = pack(frame.astype(np.uint16), pixel_format)
+        else:
+            rows = frame.astype(pixel_format.dtype.newbyteorder('<')).view(np.uint8).reshape(self.height, -1)
+
+        request.height = self.height
+        request.width = self.width
+        request.pixel_format = pixel_format
+        request.line_pitch = rows.shape[1] + self.settings["line_padding"]
+        if request.buffer.size != self.height * request.line_pitch:
+            request.buffer = np.zeros(self.height * request.line_pitch, dtype=np.uint8)
+        request.buffer.reshape(self.height, request.line_pitch)[:, :rows.shape[1]] = rows
+
+    def write_exposure(self, value) -> None:
+        """
+        Change the exposure, the sensor reads it at the start of every frame: the queued frames not
+        started yet are exposed with the new value, the frame being exposed keeps the old one
+        :param value: exposure time in us
+        :return: none
+        """
+        line_time = self.settings["line_time_us"]
+        with self.lock:
+            # the sensor exposes a whole number of lines
+            self.exposure = int(round(value / line_time) * line_time) if line_time else int(value)
+            now = time.perf_counter()
+            busy_until = None
+            for request in self.queued:
+                if request.start_at <= now:
+                    # exposed or being exposed
+                    busy_until = request.done_at
+                    continue
+                if busy_until is not None:
+                    request.start_at = busy_until
+                request.exposure = self.exposure
+                request.done_at = request.start_at + self.exposure * 1e-6 * self.settings["time_scale"] \
+                    + self.settings["readout_delay"]
+                busy_until = request.done_at
+            if busy_until is not None:
+                self.busy_until = busy_until
+
+    def write_format(self, name: str, value) -> None:
+        """
+        Change the readout, the area must stay inside the sensor
+        :param name: width, height, offset_x, offset_y, decimation_horizontal or decimation_vertical
+        :param value: new value
+        :return: none
+        """
+        with self.lock:
+            old_value = getattr(self, name)
+            setattr(self, name, int(value))
+            sensor_height, sensor_width = self.radiance.shape
+            if (min(self.width, self.height, self.decimation_horizontal, self.decimation_vertical) < 1
+                    or min(self.offset_x, self.offset_y) < 0
+                    or self.offset_x + self.width * self.decimation_horizontal > sensor_width
+                    or self.offset_y + self.height * self.decimation_vertical > sensor_height):
+                setattr(self, name, old_value)
+                raise ImpactAcquireException("{} = {} is outside the sensor".format(name, value))
+
+    def write_pixel_format(self, value) -> None:
+        if value not in PIXEL_FORMATS:
+            raise ImpactAcquireException("unsupported pixel format: {}".format(value))
+        with self.lock:
+            self.pixel_format = PIXEL_FORMATS[value]
+
+
+class DeviceManager:
+    def __init__(self):
+        """
+        Give access to the simulated devices, shared by every instance like the real driver
+        """
+        with _devices_lock:
+            while len(_devices) < _settings["device_count"]:
+                _devices.append(_SimulatedDevice(len(_devices), _settings))
+        self.devices = _devices
+
+    def deviceCount(self) -> int:
+        return len(self.devices)
+
+    def getDevice(self, index: int) -> _SimulatedDevice:
+        return self.devices[index]
+
+
+class AcquisitionControl:
+    def __init__(self, device: _SimulatedDevice):
+        self.exposureTime = _Property(getter=lambda: device.exposure, setter=device.write_exposure)
+
+
+class DeviceControl:
+    def __init__(self, device: _SimulatedDevice):
+        self.latched = 0
+        if device.settings["device_clock"]:
+            # the device clock is the clock of the frame timestamps, in ns
+            self.timestampLatch = _Method(self.latch)
+            self.timestampLatchValue = _Property(getter=lambda: self.latched)
+
+    def latch(self) -> int:
+        self.latched = int(time.perf_counter() * 1e9)
+        return DMR_NO_ERROR
+
+
+class ImageFormatControl:
+    def __init__(self, device: _SimulatedDevice):
+        settings = device.settings
+
+        def writer(name):
+            return lambda value: device.write_format(name, value)
+
+        roi = settings["supports_roi"]
+        self.height = _Property(getter=lambda: device.height, setter=writer("height") if roi else None)
+        self.width = _Property(getter=lambda: device.width, setter=writer("width") if roi else None)
+        if roi:
+            self.offsetX = _Property(getter=lambda: device.offset_x, setter=writer("offset_x"))
+            self.offsetY = _Property(getter=lambda: device.offset_y, setter=writer("offset_y"))
+        if settings["supports_decimation"]:
+            self.decimationHorizontal = _Property(getter=lambda: device.decimation_horizontal,
+                                                  setter=writer("decimation_horizontal"))
+            self.decimationVertical = _Property(getter=lambda: device.decimation_vertical,
+                                                setter=writer("decimation_vertical"))
+        self.pixelFormat = _Property(getter=lambda: device.pixel_format.name, setter=device.write_pixel_format)
+
+
+class FunctionInterface:
+    def __init__(self, device: _SimulatedDevice):
+        """
+        Request queue of the simulated device
+        :param device: simulated device
+        """
+        self.device = device
+
+    def imageRequestSingle(self) -> int:
+        """
+        Queue a free request, it will be exposed after the requests already in the queue
+        :return: error code
+        """
+        device = self.device
+        with device.lock:
+            for request in device.requests:
+                if request.state == "free":
+                    start = max(time.perf_counter(), device.busy_until)
+                    exposure_time = device.exposure * 1e-6 * device.settings["time_scale"]
+                    request.state = "queued"
+                    request.exposure = device.exposure
+                    request.start_at = start
+                    request.done_at = start + exposure_time + device.settings["readout_delay"]
+                    device.busy_until = request.done_at
+                    device.queued.append(request)
+                    return DMR_NO_ERROR
+        return DEV_NO_FREE_REQUEST_AVAILABLE
+
+    def imageRequestWaitFor(self, timeout_ms: int) -> int:
+        """
+        Wait for the oldest queued request
+        :param timeout_ms: max waiting time, -1 wait forever
+        :return: request number or error code
+        """
+        device = self.device
+        with device.lock:
+            if not device.queued:
+                return DEV_WAIT_FOR_REQUEST_FAILED
+            request = device.queued[0]
+        wait = request.done_at - time.perf_counter()
+        if 0 <= timeout_ms < wait * 1000:
+            time.sleep(timeout_ms / 1000)
+            return DEV_WAIT_FOR_REQUEST_FAILED
+        if wait > 0:
+            time.sleep(wait)
+        with device.lock:
+            device.queued.remove(request)
+            device.render(request)
+            request.frame_nr = device.frame_counter
+            request.state = "ready"
+            request.isOK = True
+        return request.requestNr
+
+    def imageRequestReset(self, request_ctrl_nr: int, mode: int) -> int:
+        """
+        Remove all the requests that wait in the queue, the frame being exposed is finished anyway
+        :return: error code
+        """
+        device = self.device
+        time.sleep(device.settings["reset_delay"])
+        with device.lock:
+            now = time.perf_counter()
+            device.busy_until = 0.0
+            for request in device.queued:
+                if request.start_at <= now < request.done_at:
+                    device.busy_until = request.done_at
+                request.state = "free"
+            device.queued = []
+        return DMR_NO_ERROR
+
+    def requestCount(self) -> int:
+        return len(self.device.requests)
+
+    def isRequestNrValid(self, request_nr: int) -> bool:
+        return 0 <= request_nr < len(self.device.requests)
+
+    def getRequest(self, request_nr: int) -> _Request:
+        return self.device.requests[request_nr]
+
+
+def configure(**settings) -> None:
+    """
+    Change the parameters of the simulation, the devices are created again
+    :param settings: parameters, see DEFAULT_SETTINGS
+    :return: none
+    """
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError("unknown settings: {}".format(", ".join(sorted(unknown))))
+    with _devices_lock:
+        _settings.clear()
+        _settings.update(DEFAULT_SETTINGS)
+        _settings.update(settings)
+        _devices.clear()
+
+
+def devices() -> List[_SimulatedDevice]:
+    """
+    Simulated devices created so far
+    :return: list of devices
+    """
+    return list(_devices)
+
+
+def install(**settings) -> types.ModuleType:
+    """
+    Register this module as `mvIMPACT.acquire`, must be called before importing `MatrixCam`
+    :param settings: parameters of the simulation, see DEFAULT_SETTINGS
+    :return: the module
+    """
+    configure(**settings)
+    module = sys.modules[__name__]
+    package = types.ModuleType("mvIMPACT")
+    package.acquire = module
+    sys.modules["mvIMPACT"] = package
+    sys.modules["mvIMPACT.acquire"] = module
+    return module
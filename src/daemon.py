@@ -0,0 +1,228 @@
+import json
+import socket
+import socketserver
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.utils.filenames import parse_acquisition_name
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# max wait of the server loop, the shutdown is seen within this time
+POLL_SECONDS = 0.5
+
+
+def send_job(job: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: Optional[float] = None) -> dict:
+    """
+    Send a job to a running daemon and wait for the answer
+    :param job: job, {"command": ..., parameters of the command}
+    :param host: host of the daemon
+    :param port: port of the daemon
+    :param timeout: max time of the job in seconds, None wait forever
+    :return: answer of the daemon, "ok" is False when the job failed
+    """
+    with socket.create_connection((host, port), timeout) as connection:
+        connection.sendall(json.dumps(job).encode() + b'\n')
+        with connection.makefile('rb') as stream:
+            line = stream.readline()
+    if not line:
+        raise ConnectionError('the daemon closed the connection without an answer')
+    return json.loads(line)
+
+
+class _JobServer(socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        # one json job per line, a client can keep the connection for more jobs
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                answer = {"ok": False, "error": 'invalid job: {}'.format(e)}
+            else:
+                answer = self.server.daemon.handle(job)
+            self.wfile.write(json.dumps(answer).encode() + b'\n')
+            self.wfile.flush()
+            if self.server.daemon.stopped:
+                return
+
+
+class AcquisitionDaemon:
+    def __init__(self, acquisition_attributes: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 open_camera: bool = True):
+        """
+        Resident process that keeps the modules imported and the camera open, the jobs come as json
+        lines over a local TCP socket and run one at a time. The startup and the latency of every job
+        are measured.
+
+        A simple use case is:
+
+        >>> with AcquisitionDaemon(read_config()) as daemon:
+        >>>     daemon.serve_forever()
+
+        and from another process:
+
+        >>> send_job({"command": "acquire", "material": "forno1", "filtro": "ortogonale"})
+
+        Commands: ping, acquire (keys of `automatic_acquisition`), batch ("jobs" as `acquisition_jobs`),
+        separate ("orthogonal", "parallel", "output"), stats, shutdown.
+
+        :param acquisition_attributes: config of the acquisitions
+        :param host: address of the socket, keep it local
+        :param port: port of the socket
+        :param open_camera: open the camera at startup, else at the first acquisition
+        """
+        start = time.perf_counter()
+        # the modules of every job are imported once, here
+        from src import Electrolux
+        from src import batch_acquisition
+        from src import batch_processing
+        from src.components.matrix_cam import MatrixCam
+        from src.utils.instrumentation import Instrumentation
+        self.electrolux = Electrolux
+        self.batch_acquisition = batch_acquisition
+        self.batch_processing = batch_processing
+        self.matrix_cam_class = MatrixCam
+        self.import_seconds = time.perf_counter() - start
+
+        self.server = _JobServer((host, port), _JobHandler)
+        self.server.daemon = self
+        self.server.timeout = POLL_SECONDS
+        self.address = self.server.server_address
+        self.stopped = False
+        self.jobs = 0
+
+        self.acquisition_attributes = acquisition_attributes
+        self.cache, self.writer = Electrolux.open_outputs(acquisition_attributes)
+        self.latency = Instrumentation(True)
+        self.cam = None
+        self.camera_seconds = 0.0
+        if open_camera:
+            self.open_camera()
+
+    def __enter__(self) -> "AcquisitionDaemon":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def open_camera(self):
+        """
+        Open the camera if it is not open
+        :return: camera
+        """
+        if self.cam is None:
+            start = time.perf_counter()
+            cam = self.matrix_cam_class()
+            cam.__enter__()
+            self.cam = cam
+            self.camera_seconds = time.perf_counter() - start
+        return self.cam
+
+    def close_camera(self) -> None:
+        """
+        Close the camera, the next acquisition opens it again
+        :return: none
+        """
+        cam, self.cam = self.cam, None
+        if cam is not None:
+            try:
+                cam.__exit__(None, None, None)
+            except Exception as e:
+                print('Closing the camera failed: {}'.format(e))
+
+    def serve_forever(self) -> None:
+        """
+        Run the jobs until a shutdown job
+        :return: none
+        """
+        while not self.stopped:
+            self.server.handle_request()
+
+    def close(self) -> None:
+        """
+        Stop the server, close the camera and write the pending images
+        :return: none
+        """
+        self.stopped = True
+        self.server.server_close()
+        self.close_camera()
+        self.electrolux.close_outputs(self.acquisition_attributes, self.writer)
+
+    def handle(self, job: dict) -> dict:
+        """
+        Run a job
+        :param job: job with its command
+        :return: answer with "ok", the result of the command or the error and "seconds"
+        """
+        command = job.get("command")
+        handler = getattr(self, '_job_{}'.format(command), None) if isinstance(command, str) else None
+        if handler is None:
+            return {"ok": False, "error": 'unknown command: {}'.format(command)}
+
+        start = time.perf_counter_ns()
+        try:
+            answer = handler(job)
+            answer["ok"] = True
+        except Exception as e:
+            answer = {"ok": False, "error": '{}: {}'.format(type(e).__name__, e)}
+        elapsed = time.perf_counter_ns() - start
+        self.latency.record(command, elapsed)
+        self.jobs += 1
+        answer["seconds"] = elapsed / 1e9
+        return answer
+
+    def _job_ping(self, job: dict) -> dict:
+        return {}
+
+    def _job_shutdown(self, job: dict) -> dict:
+        self.stopped = True
+        return {}
+
+    def _job_stats(self, job: dict) -> dict:
+        return {"jobs": self.jobs, "import_seconds": self.import_seconds, "camera_seconds": self.camera_seconds,
+                "latency": self.latency.summary()}
+
+    def _job_acquire(self, job: dict) -> dict:
+        automatic_acquisition = dict(self.acquisition_attributes.get("automatic_acquisition", {}))
+        automatic_acquisition.update((key, value) for key, value in job.items() if key != "command")
+        cam = self.open_camera()
+        captures = cam.captures
+        try:
+            exposure, _, saturation, path = self.electrolux.acquire(cam, automatic_acquisition,
+                                                                    self.acquisition_attributes, self.cache, self.writer)
+        except Exception:
+            # the next job starts from a new session
+            self.close_camera()
+            raise
+        # the answer means the file is on disk
+        self.writer.flush()
+        return {"exposure": exposure, "saturation": saturation, "captures": cam.captures - captures,
+                "path": str(path)}
+
+    def _job_batch(self, job: dict) -> dict:
+        acquisition_attributes = dict(self.acquisition_attributes, acquisition_jobs=job.get("jobs", []))
+        scheduler = self.batch_acquisition.AcquisitionScheduler(acquisition_attributes, self.cache, self.writer)
+        jobs = scheduler.run(self.open_camera())
+        self.writer.flush()
+        return {"session_seconds": scheduler.session_seconds,
+                "jobs": [{"index": j.index, "material": j.material, "filtro": j.filter_name, "status": j.status,
+                          "exposure": j.exposure, "saturation": j.saturation, "captures": j.captures,
+                          "path": str(j.path) if j.path is not None else None,
+                          "seconds": j.seconds, "error": j.error} for j in jobs]}
+
+    def _job_separate(self, job: dict) -> dict:
+        orthogonal_path = Path(job["orthogonal"])
+        name = parse_acquisition_name(orthogonal_path)
+        pair = self.batch_processing.ImagePair(name.material if name is not None else orthogonal_path.stem,
+                                               orthogonal_path, Path(job["parallel"]),
+                                               Path(job.get("output", orthogonal_path.parent)))
+        timings = self.batch_processing.process_pair(pair)
+        return {"diffuse": str(pair.diffuse_path), "specular": str(pair.specular_path), "timings": timings}
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+class ExposureCache:
+    def __init__(self, path: Path = Path("settings") / "exposure_cache.json", max_age: float = 8 * 3600,
+                 max_entries: int = 256):
+        """
+        On-disk cache of the last converged exposure of every camera, material and filter.
+
+        A simple use case is:
+
+        >>> cache = ExposureCache()
+        >>> entry = cache.get(cam.serial, 'forno1', 'ortogonale')
+        >>> cache.put(cam.serial, 'forno1', 'ortogonale', exposure, saturation)
+        >>> cache.save()
+
+        :param path: json file of the cache
+        :param max_age: entries older than this are discarded, seconds
+        :param max_entries: max number of entries, the least recently used are evicted
+        """
+        self.path = Path(path)
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.entries = {}
+
+        if self.path.exists():
+            self.entries = self.read_entries(self.path)
+
+    @staticmethod
+    def read_entries(path: Path) -> dict:
+        """
+        Read the entries of a cache file, a damaged file or entry is skipped: it is only a cache
+        :param path: json file of the cache
+        :return: valid entries
+        """
+        try:
+            with path.open() as filestream:
+                entries = json.load(filestream)
+            if not isinstance(entries, dict):
+                raise ValueError('the cache is not a json object')
+        except ValueError as e:
+            print('Exposure cache {} ignored: {}'.format(path, e))
+            return {}
+
+        valid = {}
+        for key, entry in entries.items():
+            try:
+                valid[key] = {"exposure": int(entry["exposure"]), "saturation": float(entry["saturation"]),
+                              "timestamp": float(entry["timestamp"]),
+                              "last_used": float(entry.get("last_used", entry["timestamp"]))}
+            except (KeyError, TypeError, ValueError, AttributeError):
+                print('Exposure cache entry {} ignored: {}'.format(key, entry))
+        return valid
+
+    @staticmethod
+    def key(serial: str, material: str, filter_name: str) -> str:
+        return '{}/{}/{}'.format(serial, material, filter_name)
+
+    def get(self, serial: str, material: str, filter_name: str) -> Optional[dict]:
+        """
+        Get the last converged exposure
+        :param serial: serial of the camera
+        :param material: material
+        :param filter_name: filter
+        :return: entry with exposure, saturation and timestamp, None if missing or expired
+        """
+        key = self.key(serial, material, filter_name)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["timestamp"] > self.max_age:
+            del self.entries[key]
+            return None
+        entry["last_used"] = time.time()
+        return entry
+
+    def put(self, serial: str, material: str, filter_name: str, exposure: int, saturation: float) -> None:
+        """
+        Store a converged exposure
+        :param serial: serial of the camera
+        :param material: material
+        :param filter_name: filter
+        :param exposure: exposure time
+        :param saturation: saturation reached with the exposure
+        :return: none
+        """
+        now = time.time()
+        self.entries[self.key(serial, material, filter_name)] = {
+            "exposure": int(exposure),
+            "saturation": float(saturation),
+            "timestamp": now,
+            "last_used": now,
+        }
+
+        # evict the least recently used entries
+        if len(self.entries) > self.max_entries:
+            by_use = sorted(self.entries, key=lambda k: self.entries[k]["last_used"])
+            for key in by_use[:len(self.entries) - self.max_entries]:
+                del self.entries[key]
+
+    def save(self) -> None:
+        """
+        Write the cache, the file is replaced atomically
+        :return: none
+        """
+        now = time.time()
+        self.entries = {key: entry for key, entry in self.entries.items() if now - entry["timestamp"] <= self.max_age}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with tmp_path.open('w') as filestream:
+            json.dump(self.entries, filestream, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def bounds(entry: dict, min_exposure: float, max_exposure: float, margin: float = 4.0) -> Tuple[int, int]:
+        """
+        Narrow the search range around a cached exposure
+        :param entry: cache entry
+        :param min_exposure: min exposure time
+        :param max_exposure: max exposure time
+        :param margin: max ratio between the cached exposure and the bounds
+        :return: min and max exposure time
+        """
+        exposure = entry["exposure"]
+        return int(max(min_exposure, exposure / margin)), int(min(max_exposure, exposure * margin))
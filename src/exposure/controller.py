@@ -0,0 +1,195 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.transformation.frame_stats import compute_frame_statistics
+from src.utils.instrumentation import metrics
+
+# acceptance window of the saturation, % of white pixels
+SATURATION_MIN = 0.1
+SATURATION_MAX = 0.2
+
+
+class ExposureResult:
+    def __init__(self, exposure: int, saturation: float, image: Optional[np.ndarray], captures: int,
+                 converged: bool):
+        """
+        Outcome of an exposure search
+        :param exposure: last exposure time
+        :param saturation: saturation of the last image
+        :param image: last image
+        :param captures: number of photos taken
+        :param converged: True if the saturation is inside the acceptance window
+        """
+        self.exposure = exposure
+        self.saturation = saturation
+        self.image = image
+        self.captures = captures
+        self.converged = converged
+
+    def __repr__(self) -> str:
+        return 'ExposureResult(exposure={}, saturation={:.3f}, captures={}, converged={})'.format(
+            self.exposure, self.saturation, self.captures, self.converged)
+
+
+class ExposureController:
+    def __init__(self, min_exposure: float = 1000, max_exposure: float = 999000, target_saturation: float = 0.15,
+                 saturation_min: float = SATURATION_MIN, saturation_max: float = SATURATION_MAX,
+                 max_captures: int = 4, max_value: int = 255, max_step: float = 16.0):
+        """
+        Predictive exposure control: the pixel values grow linearly with the exposure time, so the
+        histogram of one frame tells which exposure puts the target fraction of pixels at max_value.
+        :param min_exposure: min exposure time
+        :param max_exposure: max exposure time
+        :param target_saturation: % of white pixels to reach
+        :param saturation_min: lower bound of the acceptance window, %
+        :param saturation_max: upper bound of the acceptance window, %
+        :param max_captures: max number of photos before giving up
+        :param max_value: value of a saturated pixel
+        :param max_step: max change factor of the exposure between two photos
+        """
+        self.min_exposure = min_exposure
+        self.max_exposure = max_exposure
+        self.target_saturation = target_saturation
+        self.saturation_min = saturation_min
+        self.saturation_max = saturation_max
+        self.max_captures = max_captures
+        self.max_value = max_value
+        self.max_step = max_step
+
+    def accepts(self, saturation: float) -> bool:
+        """
+        Check the acceptance window, same criterion of `Electrolux.binary_search`
+        :param saturation: % of white pixels
+        :return: True if the saturation is good
+        """
+        return self.saturation_min < saturation <= self.saturation_max
+
+    def predict(self, histogram: np.ndarray, exposure: float) -> float:
+        """
+        Predict the exposure that reaches the target saturation
+        :param histogram: histogram of the image, one bin for every value from 0 to max_value
+        :param exposure: exposure time of the image
+        :return: next exposure time
+        """
+        target = self.target_saturation / 100
+        max_value = self.max_value
+
+        # tail[v] = fraction of pixels >= v
+        tail = np.cumsum(histogram[::-1])[::-1] / max(histogram.sum(), 1)
+        saturated = tail[max_value]
+
+        if saturated < target:
+            # the target is visible in the histogram: scale the value that leaves `target` pixels above it
+            above = np.nonzero(tail[1:max_value] >= target)[0]
+            if above.size == 0:
+                return self._clip(exposure, exposure * self.max_step)
+            v = above[-1] + 1
+            threshold = v + (tail[v] - target) / max(tail[v] - tail[v + 1], 1e-12)
+        else:
+            # the target is hidden in the saturated pixels: extrapolate the unsaturated tail with a
+            # power law, log(tail) = slope * log(v) + offset
+            values = np.arange(max_value // 2, max_value)
+            fractions = tail[values]
+            valid = (fractions > saturated) & (fractions < min(1.0, 50 * saturated))
+            if np.count_nonzero(valid) < 3:
+                # almost every pixel is white, nothing to fit
+                return self._clip(exposure, exposure / self.max_step)
+            slope, offset = np.polyfit(np.log(values[valid]), np.log(fractions[valid]), 1)
+            if slope >= 0:
+                return self._clip(exposure, exposure / self.max_step)
+            log_threshold = (np.log(target) - offset) / slope
+            threshold = np.exp(min(log_threshold, np.log(max_value * self.max_step)))
+
+        # a pixel of value `threshold` reaches max_value (rounded) at the new exposure
+        return self._clip(exposure, exposure * (max_value - 0.5) / threshold)
+
+    def _clip(self, exposure: float, new_exposure: float) -> float:
+        """
+        Limit the step and the range of the exposure
+        :param exposure: current exposure time
+        :param new_exposure: proposed exposure time
+        :return: allowed exposure time
+        """
+        new_exposure = min(max(new_exposure, exposure / self.max_step), exposure * self.max_step)
+        return float(min(max(new_exposure, self.min_exposure), self.max_exposure))
+
+    def start(self, initial_exposure: Optional[float] = None) -> int:
+        """
+        First exposure time of a search
+        :param initial_exposure: proposed exposure time, None for the middle of the range
+        :return: exposure time
+        """
+        if initial_exposure is None:
+            initial_exposure = (self.min_exposure + self.max_exposure) / 2
+        return int(self._clip(initial_exposure, initial_exposure))
+
+    @metrics.timed('optimizer_step')
+    def update(self, img: np.ndarray, exposure: int, captures: int, step: int = 1,
+               roi: Optional[Tuple[int, int, int, int]] = None) -> Tuple[Optional[ExposureResult], int]:
+        """
+        Analyse a photo of the search
+        :param img: photo
+        :param exposure: exposure time of the photo
+        :param captures: number of photos taken so far
+        :param step: analyse one pixel every `step` on both axes
+        :param roi: x, y, width and height of the analysed area, None for the whole photo
+        :return: the result when the search is over (None otherwise) and the next exposure time
+        """
+        stats = compute_frame_statistics(img, self.max_value, step=step, roi=roi)
+        saturation_value = stats.saturation
+        print("exposure:" + str(exposure))
+        print("saturation:" + str(saturation_value))
+        if self.accepts(saturation_value):
+            return ExposureResult(exposure, saturation_value, img, captures, True), exposure
+
+        next_exposure = int(self.predict(stats.histogram, exposure))
+        if next_exposure == exposure or captures >= self.max_captures:
+            # stuck at the limits of the range or out of captures
+            return ExposureResult(exposure, saturation_value, img, captures, False), exposure
+
+        return None, next_exposure
+
+    def run(self, cam, initial_exposure: Optional[float] = None, roi: Optional[Tuple[int, int, int, int]] = None,
+            decimation: int = 1) -> ExposureResult:
+        """
+        Take photos until the saturation is inside the acceptance window. With a roi or a decimation
+        the search runs on reduced frames and the result is checked (and refined if needed) on full
+        frames, the returned image and saturation are always the ones of a full frame.
+        :param cam: camera
+        :param initial_exposure: first exposure time, None for the middle of the range
+        :param roi: x, y, width and height of the area used by the search, None for the whole sensor
+        :param decimation: the search uses one pixel every `decimation` on both axes
+        :return: result of the search, check `converged`
+        """
+        exposure = self.start(initial_exposure)
+        if roi is None and decimation == 1:
+            return self._search(cam, exposure, 0)
+
+        with cam.reduced_readout(roi, decimation) as (step, software_roi):
+            reduced = self._search(cam, exposure, 0, step, software_roi)
+        print("reduced search: {}".format(reduced))
+
+        # the full frame photo of the reduced result is the first photo of the full frame search
+        return self._search(cam, reduced.exposure, reduced.captures)
+
+    def _search(self, cam, exposure: int, captures: int, step: int = 1,
+                roi: Optional[Tuple[int, int, int, int]] = None) -> ExposureResult:
+        """
+        Search loop, at most max_captures photos
+        :param cam: camera
+        :param exposure: first exposure time
+        :param captures: photos taken before this loop
+        :param step: analyse one pixel every `step` on both axes
+        :param roi: x, y, width and height of the analysed area, None for the whole photo
+        :return: result of the loop
+        """
+        first_capture = captures
+        while True:
+            captures += 1
+            cam.set_exposure(exposure)
+            img = cam.take_photo()
+            result, exposure = self.update(img, exposure, captures - first_capture, step, roi)
+            if result is not None:
+                result.captures = captures
+                return result
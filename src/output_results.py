@@ -2,7 +2,8 @@ from pathlib import Path
 
 import cv2
 
-from src.transformation.conversions import compute_diff_spec
+from src.transformation.conversions import compute_diff_spec_uint8
+from src.utils.image_writer import ImageWriter
 
 if __name__ == '__main__':
     common_img_path = Path('data') / 'acquisizione1'
@@ -12,8 +13,10 @@ if __name__ == '__main__':
 
     albedo = cv2.imread(str(orthogonal_img_path))
     specular = cv2.imread(str(parallel_img_path))
-    output_diffuse, output_pure_specular = compute_diff_spec(albedo, specular)
+    output_diffuse, output_pure_specular = compute_diff_spec_uint8(albedo, specular)
 
-    cv2.imwrite(str(output_img_path / 'forno1_speculare_00_0000000.png'), 255 * output_pure_specular)
-    cv2.imwrite(str(output_img_path / 'forno1_diffuse_00_0000000.png'), 255 * output_diffuse)
+    # the two images are encoded in parallel
+    with ImageWriter() as writer:
+        writer.write(output_img_path / 'forno1_speculare_00_0000000.png', output_pure_specular)
+        writer.write(output_img_path / 'forno1_diffuse_00_0000000.png', output_diffuse)
     cv2.waitKey(0)
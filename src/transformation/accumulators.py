@@ -0,0 +1,93 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class FrameStackSummary:
+    def __init__(self, count: int, mean: np.ndarray, variance: np.ndarray, maximum: np.ndarray,
+                 saturation_count: np.ndarray, max_value: int):
+        """
+        Per pixel statistics of a stack of frames
+        :param count: number of frames
+        :param mean: mean of every pixel
+        :param variance: sample variance of every pixel
+        :param maximum: max of every pixel
+        :param saturation_count: number of frames in which every pixel is saturated
+        :param max_value: value of a saturated pixel
+        """
+        self.count = count
+        self.mean = mean
+        self.variance = variance
+        self.maximum = maximum
+        self.saturation_count = saturation_count
+        self.max_value = max_value
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    @property
+    def saturation(self) -> float:
+        """
+        % of white pixels over all the frames, same value of `eval_saturation` on the whole stack
+        """
+        return self.saturation_count.sum() * 100 / max(self.count * self.saturation_count.size, 1)
+
+
+class RunningFrameStatistics:
+    def __init__(self, shape: Tuple[int, ...], max_value: int = 255, dtype=np.float64):
+        """
+        Reduce frames as they arrive: mean and variance (Welford), max and saturation counts. The memory
+        does not depend on the number of frames.
+        :param shape: shape of a frame
+        :param max_value: value of a saturated pixel
+        :param dtype: float type of mean and variance
+        """
+        self.shape = tuple(shape)
+        self.max_value = max_value
+        self.count = 0
+        self.mean = np.zeros(self.shape, dtype=dtype)
+        self.m2 = np.zeros(self.shape, dtype=dtype)
+        self.maximum = None
+        self.saturation_count = np.zeros(self.shape, dtype=np.uint32)
+
+        # scratch buffers reused by every frame
+        self._delta = np.empty(self.shape, dtype=dtype)
+        self._delta2 = np.empty(self.shape, dtype=dtype)
+        self._saturated = np.empty(self.shape, dtype=bool)
+
+    def add(self, frame: np.ndarray) -> None:
+        """
+        Add a frame
+        :param frame: frame with the shape of the accumulator
+        :return: none
+        """
+        if frame.shape != self.shape:
+            raise ValueError('the frame must have shape {}'.format(self.shape))
+        self.count += 1
+
+        # Welford: mean += (x - mean) / n, m2 += (x - old mean) * (x - new mean)
+        np.subtract(frame, self.mean, out=self._delta)
+        np.divide(self._delta, self.count, out=self._delta2)
+        self.mean += self._delta2
+        np.subtract(frame, self.mean, out=self._delta2)
+        np.multiply(self._delta, self._delta2, out=self._delta)
+        self.m2 += self._delta
+
+        if self.maximum is None:
+            self.maximum = np.array(frame, copy=True)
+        else:
+            np.maximum(self.maximum, frame, out=self.maximum)
+
+        np.greater_equal(frame, self.max_value, out=self._saturated)
+        self.saturation_count += self._saturated
+
+    def summary(self) -> FrameStackSummary:
+        """
+        Statistics of the frames added so far
+        :return: summary, the arrays are copies
+        """
+        variance = self.m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self.m2)
+        maximum = np.zeros(self.shape, dtype=np.uint8) if self.maximum is None else self.maximum.copy()
+        return FrameStackSummary(self.count, self.mean.copy(), variance, maximum, self.saturation_count.copy(),
+                                 self.max_value)
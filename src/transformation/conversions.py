@@ -1,13 +1,19 @@
-from typing import Tuple
+from functools import lru_cache
+from typing import Optional, Tuple
 
 import numpy as np
 
+from src.transformation.tiling import TileExecutor, default_executor
 from src.transformation.utils import min_max_scaling
+from src.utils.instrumentation import metrics
 
+# number of pixels of compute_diff_spec_uint8 processed at once, the working set stays in cache
+BLOCK_SIZE = 1 << 14
 
-def linear_to_srgb(input_img: np.ndarray) -> np.ndarray:
+
+def linear_to_srgb_reference(input_img: np.ndarray) -> np.ndarray:
     """
-    Convert a linear image to a srgb image
+    Convert a linear image to a srgb image, reference implementation with masks
     :param input_img: linear image
     :return: srgb image
     """
@@ -28,9 +34,9 @@ def linear_to_srgb(input_img: np.ndarray) -> np.ndarray:
     return output_img
 
 
-def srgb_to_linear(input_img: np.ndarray) -> np.ndarray:
+def srgb_to_linear_reference(input_img: np.ndarray) -> np.ndarray:
     """
-    Convert a srgb image to a linear image
+    Convert a srgb image to a linear image, reference implementation with masks
     :param input_img: srgb image
     :return: linear image
     """
@@ -51,25 +57,233 @@ def srgb_to_linear(input_img: np.ndarray) -> np.ndarray:
     return output_img
 
 
-def compute_diff_spec(orthogonal_filter_img: np.ndarray, parallel_filter_img: np.ndarray) \
-        -> Tuple[np.ndarray, np.ndarray]:
+def _linear_to_srgb_block(src: np.ndarray, dst: np.ndarray, mask: np.ndarray, tmp: np.ndarray) -> None:
+    """
+    linear -> srgb on a block, writes in dst
+    """
+    np.clip(src, 0, 1, out=dst)
+    np.less_equal(dst, 0.0031308, out=mask)
+    np.multiply(dst, 12.92, out=tmp)
+    np.power(dst, 0.41666, out=dst)
+    np.multiply(dst, 1.055, out=dst)
+    np.subtract(dst, 0.055, out=dst)
+    np.copyto(dst, tmp, where=mask)
+
+
+def _srgb_to_linear_block(src: np.ndarray, dst: np.ndarray, mask: np.ndarray, tmp: np.ndarray) -> None:
+    """
+    srgb -> linear on a block, writes in dst
+    """
+    np.clip(src, 0, 1, out=dst)
+    np.less_equal(dst, 0.04045, out=mask)
+    np.divide(dst, 12.92, out=tmp)
+    np.add(dst, 0.055, out=dst)
+    np.divide(dst, 1.055, out=dst)
+    np.power(dst, 2.4, out=dst)
+    np.copyto(dst, tmp, where=mask)
+
+
+@lru_cache(maxsize=None)
+def conversion_lut(conversion: str, input_dtype: np.dtype, output_dtype: np.dtype,
+                   max_value: Optional[int] = None) -> np.ndarray:
+    """
+    Lookup table of a conversion for every value of an integer type, the values are scaled to [0, 1]
+    :param conversion: 'linear_to_srgb' or 'srgb_to_linear'
+    :param input_dtype: integer type of the image
+    :param output_dtype: float type of the result
+    :param max_value: value scaled to 1, None for the max of the type; values above it are white
+    :return: lookup table
+    """
+    type_max = np.iinfo(input_dtype).max
+    max_value = type_max if max_value is None else max_value
+    codes = min_max_scaling(np.arange(type_max + 1, dtype=float), 0, max_value)
+    reference = linear_to_srgb_reference if conversion == 'linear_to_srgb' else srgb_to_linear_reference
+    lut = reference(codes).astype(output_dtype)
+    lut.flags.writeable = False
+    return lut
+
+
+@metrics.timed('conversion')
+def _convert(input_img: np.ndarray, out: Optional[np.ndarray], conversion: str, block_kernel,
+             max_value: Optional[int] = None, executor: Optional[TileExecutor] = None) -> np.ndarray:
+    """
+    Apply a conversion band by band: integer images go through a lookup table, float images
+    through the vectorized kernel. The bands run on the threads of the executor, the working set is
+    a few bands whatever the image size.
+    :param input_img: input image
+    :param out: output image, None to allocate it
+    :param conversion: 'linear_to_srgb' or 'srgb_to_linear'
+    :param block_kernel: float kernel
+    :param max_value: white of the integer images, None for the max of the type
+    :param executor: executor of the row bands, None for the shared one
+    :return: output image
+    """
+    integer_input = np.issubdtype(input_img.dtype, np.integer)
+    if out is None:
+        out = np.empty(input_img.shape, dtype=float if integer_input else input_img.dtype)
+    if out.shape != input_img.shape or not out.flags.c_contiguous:
+        raise ValueError('out must be a contiguous array with the shape of the input image')
+    if not np.issubdtype(out.dtype, np.floating):
+        raise ValueError('out must be a float array')
+
+    # bands of the first axis, the kernels are elementwise
+    src = np.atleast_1d(np.ascontiguousarray(input_img))
+    dst = np.atleast_1d(out)
+
+    if integer_input:
+        lut = conversion_lut(conversion, input_img.dtype, out.dtype, max_value)
+
+        def kernel(start: int, stop: int) -> None:
+            np.take(lut, src[start:stop], out=dst[start:stop])
+    else:
+        def kernel(start: int, stop: int) -> None:
+            band = dst[start:stop]
+            block_kernel(src[start:stop], band, np.empty(band.shape, dtype=bool), np.empty_like(band))
+
+    (executor or default_executor()).run(kernel, dst.shape[0], dst[:1].nbytes)
+    return out
+
+
+def linear_to_srgb(input_img: np.ndarray, out: Optional[np.ndarray] = None,
+                   max_value: Optional[int] = None, executor: Optional[TileExecutor] = None) -> np.ndarray:
+    """
+    Convert a linear image to a srgb image
+    :param input_img: linear image, float in [0, 1] or integer scaled by max_value
+    :param out: float output image, None to allocate it
+    :param max_value: white of an integer image (e.g. 4095 for a 12 bit sensor), None for the max of its type
+    :param executor: executor of the row bands, None for the shared one
+    :return: srgb image
+    """
+    return _convert(input_img, out, 'linear_to_srgb', _linear_to_srgb_block, max_value, executor)
+
+
+def srgb_to_linear(input_img: np.ndarray, out: Optional[np.ndarray] = None,
+                   max_value: Optional[int] = None, executor: Optional[TileExecutor] = None) -> np.ndarray:
+    """
+    Convert a srgb image to a linear image
+    :param input_img: srgb image, float in [0, 1] or integer scaled by max_value
+    :param out: float output image, None to allocate it
+    :param max_value: white of an integer image (e.g. 4095 for a 12 bit sensor), None for the max of its type
+    :param executor: executor of the row bands, None for the shared one
+    :return: linear image
+    """
+    return _convert(input_img, out, 'srgb_to_linear', _srgb_to_linear_block, max_value, executor)
+
+
+def compute_diff_spec(orthogonal_filter_img: np.ndarray, parallel_filter_img: np.ndarray, max_value: int = 255,
+                      out_diffuse: Optional[np.ndarray] = None, out_pure_specular: Optional[np.ndarray] = None,
+                      executor: Optional[TileExecutor] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
     Compute the diffuse and the pure specular images.
 
     :param orthogonal_filter_img: the orthogonal filter image.
     :param parallel_filter_img: the parallel filter image.
+    :param max_value: white of the input images, the max value of the sensor (e.g. 4095 for 12 bit).
+    :param out_diffuse: float64 output for the diffuse image, None to allocate it.
+    :param out_pure_specular: float64 output for the pure specular image, None to allocate it.
+    :param executor: executor of the row bands, None for the shared one.
     :return: the diffuse image and the pure specular image.
     """
-    # convert input images to linear space
-    linear_orthogonal_filter_img = srgb_to_linear(min_max_scaling(orthogonal_filter_img.astype(float), 0, 255))
-    linear_parallel_filter_img = srgb_to_linear(min_max_scaling(parallel_filter_img.astype(float), 0, 255))
+    if orthogonal_filter_img.shape != parallel_filter_img.shape:
+        raise ValueError('the images must have the same shape')
+    shape = orthogonal_filter_img.shape
+    if out_diffuse is None:
+        out_diffuse = np.empty(shape)
+    if out_pure_specular is None:
+        out_pure_specular = np.empty(shape)
+    for out in (out_diffuse, out_pure_specular):
+        if out.shape != shape or out.dtype != np.float64:
+            raise ValueError('the outputs must be float64 arrays with the shape of the images')
+
+    # bands of the first axis, the kernel is elementwise
+    orthogonal = np.atleast_1d(orthogonal_filter_img)
+    parallel = np.atleast_1d(parallel_filter_img)
+    diffuse = np.atleast_1d(out_diffuse)
+    pure_specular = np.atleast_1d(out_pure_specular)
+
+    def kernel(start: int, stop: int) -> None:
+        # convert input images to linear space, min_max_scaling(img, 0, max_value) on the band
+        linear_orthogonal = orthogonal[start:stop].astype(float)
+        linear_orthogonal /= max_value
+        linear_parallel = parallel[start:stop].astype(float)
+        linear_parallel /= max_value
+        mask = np.empty(linear_orthogonal.shape, dtype=bool)
+        tmp = np.empty_like(linear_orthogonal)
+        _srgb_to_linear_block(linear_orthogonal, linear_orthogonal, mask, tmp)
+        _srgb_to_linear_block(linear_parallel, linear_parallel, mask, tmp)
+
+        # compute diffuse and pure specular
+        linear_parallel -= linear_orthogonal
+        linear_orthogonal *= 2
+
+        # convert images to srbg
+        _linear_to_srgb_block(linear_orthogonal, diffuse[start:stop], mask, tmp)
+        _linear_to_srgb_block(linear_parallel, pure_specular[start:stop], mask, tmp)
+
+    (executor or default_executor()).run(kernel, diffuse.shape[0], diffuse[:1].nbytes)
+    return out_diffuse, out_pure_specular
+
+
+@lru_cache(maxsize=None)
+def diff_spec_luts() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lookup tables of compute_diff_spec for 8 bit images, rounded to 8 bit like the saved images.
+    The diffuse depends only on the orthogonal value, the specular on the pair (parallel, orthogonal).
+    :return: diffuse table with 256 entries, specular table with 65536 entries indexed by parallel * 256 + orthogonal
+    """
+    linear = srgb_to_linear_reference(min_max_scaling(np.arange(256, dtype=float), 0, 255))
+
+    diffuse_lut = np.rint(255 * linear_to_srgb_reference(linear * 2)).astype(np.uint8)
+    specular_lut = np.rint(255 * linear_to_srgb_reference(linear[:, None] - linear[None, :])).astype(np.uint8)
+
+    diffuse_lut.flags.writeable = False
+    specular_lut = specular_lut.reshape(-1)
+    specular_lut.flags.writeable = False
+    return diffuse_lut, specular_lut
+
+
+@metrics.timed('diff_spec')
+def compute_diff_spec_uint8(orthogonal_filter_img: np.ndarray, parallel_filter_img: np.ndarray,
+                            out_diffuse: Optional[np.ndarray] = None, out_pure_specular: Optional[np.ndarray] = None) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the diffuse and the pure specular images of two 8 bit images, the result is the one of
+    compute_diff_spec scaled to [0, 255] and rounded, without float intermediates.
+
+    :param orthogonal_filter_img: the orthogonal filter image, uint8.
+    :param parallel_filter_img: the parallel filter image, uint8.
+    :param out_diffuse: uint8 output for the diffuse image, None to allocate it.
+    :param out_pure_specular: uint8 output for the pure specular image, None to allocate it.
+    :return: the diffuse image and the pure specular image.
+    """
+    if orthogonal_filter_img.dtype != np.uint8 or parallel_filter_img.dtype != np.uint8:
+        raise ValueError('the images must be uint8, use compute_diff_spec')
+    if orthogonal_filter_img.shape != parallel_filter_img.shape:
+        raise ValueError('the images must have the same shape')
+    if out_diffuse is None:
+        out_diffuse = np.empty(orthogonal_filter_img.shape, dtype=np.uint8)
+    if out_pure_specular is None:
+        out_pure_specular = np.empty(orthogonal_filter_img.shape, dtype=np.uint8)
+    for out in (out_diffuse, out_pure_specular):
+        if out.shape != orthogonal_filter_img.shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+            raise ValueError('the outputs must be contiguous uint8 arrays with the shape of the images')
+
+    diffuse_lut, specular_lut = diff_spec_luts()
+    orthogonal = np.ascontiguousarray(orthogonal_filter_img).reshape(-1)
+    parallel = np.ascontiguousarray(parallel_filter_img).reshape(-1)
+    diffuse = out_diffuse.reshape(-1)
+    pure_specular = out_pure_specular.reshape(-1)
 
-    # compute diffuse and pure specular
-    linear_diffuse = linear_orthogonal_filter_img * 2
-    linear_pure_specular = linear_parallel_filter_img - linear_orthogonal_filter_img
+    # fixed working set: one block of 16 bit indexes
+    index = np.empty(min(BLOCK_SIZE, orthogonal.size), dtype=np.uint16)
+    for start in range(0, orthogonal.size, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, orthogonal.size)
+        block_index = index[:stop - start]
+        np.take(diffuse_lut, orthogonal[start:stop], out=diffuse[start:stop])
 
-    # convert images to srbg
-    output_diffuse = linear_to_srgb(linear_diffuse)
-    output_pure_specular = linear_to_srgb(linear_pure_specular)
+        np.copyto(block_index, parallel[start:stop])
+        np.left_shift(block_index, 8, out=block_index)
+        np.bitwise_or(block_index, orthogonal[start:stop], out=block_index)
+        np.take(specular_lut, block_index, out=pure_specular[start:stop])
 
-    return output_diffuse, output_pure_specular
+    return out_diffuse, out_pure_specular
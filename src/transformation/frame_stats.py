@@ -0,0 +1,152 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.utils.instrumentation import metrics
+
+# number of pixels processed at once, the working set stays in cache
+BAND_PIXELS = 1 << 18
+
+# pixels of a band of cv2.calcHist, its float32 counts are exact up to 2 ** 24
+HISTOGRAM_BAND_PIXELS = 1 << 24
+
+
+class FrameStatistics:
+    def __init__(self, histogram: np.ndarray, max_value: int, near_threshold: int):
+        """
+        Statistics of a frame, all derived from its histogram
+        :param histogram: one bin for every value from 0 to max_value
+        :param max_value: value of a saturated pixel
+        :param near_threshold: first value counted as near saturated
+        """
+        self.histogram = histogram
+        self.max_value = max_value
+        self.near_threshold = near_threshold
+        self.total_pixels = int(histogram.sum())
+
+    @property
+    def saturation(self) -> float:
+        """
+        % of white pixels, same value of `eval_saturation`
+        """
+        return self.histogram[self.max_value] * 100 / max(self.total_pixels, 1)
+
+    @property
+    def near_saturation(self) -> float:
+        """
+        % of pixels >= near_threshold
+        """
+        return self.histogram[self.near_threshold:].sum() * 100 / max(self.total_pixels, 1)
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean luminance
+        """
+        return float(np.dot(self.histogram, np.arange(self.histogram.size))) / max(self.total_pixels, 1)
+
+
+def _select(input_img: np.ndarray, step: int, roi: Optional[Tuple[int, int, int, int]]) -> np.ndarray:
+    """
+    View of the pixels to analyse, no copy
+    :param input_img: input image
+    :param step: take one pixel every `step` on both axes
+    :param roi: x, y, width and height of the region of interest, None for the whole image
+    :return: view of the image
+    """
+    if roi is not None:
+        x, y, width, height = roi
+        input_img = input_img[y:y + height, x:x + width]
+    if step > 1:
+        input_img = input_img[::step, ::step]
+    return input_img
+
+
+def _bands(input_img: np.ndarray, band_pixels: int = BAND_PIXELS):
+    """
+    Split the image in bands of rows of about `band_pixels` pixels
+    :param input_img: input image
+    :param band_pixels: pixels of a band
+    :return: generator of views
+    """
+    row_pixels = max(int(np.prod(input_img.shape[1:])), 1)
+    rows = max(band_pixels // row_pixels, 1)
+    for start in range(0, input_img.shape[0], rows):
+        yield input_img[start:start + rows]
+
+
+def default_max_value(input_img: np.ndarray) -> int:
+    """
+    Value of a saturated pixel for the type of the image
+    :param input_img: input image
+    :return: max value
+    """
+    return 255 if input_img.dtype == np.uint8 else int(np.iinfo(input_img.dtype).max)
+
+
+def count_saturated(input_img: np.ndarray, max_value: int = None, step: int = 1,
+                    roi: Optional[Tuple[int, int, int, int]] = None) -> Tuple[int, int]:
+    """
+    Count the pixels >= max_value band by band, without full size temporary arrays
+    :param input_img: integer image
+    :param max_value: value of a saturated pixel, None for the max of the type
+    :param step: take one pixel every `step` on both axes
+    :param roi: x, y, width and height of the region of interest, None for the whole image
+    :return: number of saturated pixels and number of analysed pixels
+    """
+    if max_value is None:
+        max_value = default_max_value(input_img)
+    view = _select(input_img, step, roi)
+
+    saturated = 0
+    mask = None
+    for band in _bands(view):
+        if mask is None:
+            mask = np.empty(band.shape, dtype=bool)
+        band_mask = mask[:band.shape[0]]
+        np.greater_equal(band, max_value, out=band_mask)
+        saturated += np.count_nonzero(band_mask)
+
+    return saturated, view.size
+
+
+@metrics.timed('frame_statistics')
+def compute_frame_statistics(input_img: np.ndarray, max_value: int = None, near_threshold: float = 0.95,
+                             step: int = 1, roi: Optional[Tuple[int, int, int, int]] = None) -> FrameStatistics:
+    """
+    Compute histogram, saturation, near saturation and mean luminance in one pass over the image
+    :param input_img: uint8 or uint16 image
+    :param max_value: value of a saturated pixel, None for the max of the type
+    :param near_threshold: fraction of max_value from which a pixel is near saturated
+    :param step: take one pixel every `step` on both axes
+    :param roi: x, y, width and height of the region of interest, None for the whole image
+    :return: statistics of the frame
+    """
+    if max_value is None:
+        max_value = default_max_value(input_img)
+    view = _select(input_img, step, roi)
+
+    if view.dtype in (np.uint8, np.uint16):
+        # cv2.calcHist counts on the pixels in place, one bin for every value of the type
+        bins = int(np.iinfo(view.dtype).max) + 1
+        rows = view.reshape(view.shape[0], -1) if view.ndim != 2 else view
+        # rows of a subsampled view are copied by OpenCV, small bands keep the copies small
+        contiguous = rows.ndim == 2 and rows.strides[1] == rows.itemsize
+        type_histogram = np.zeros(bins, dtype=np.int64)
+        for band in _bands(rows, HISTOGRAM_BAND_PIXELS if contiguous else BAND_PIXELS):
+            if band.size:
+                type_histogram += cv2.calcHist([band], [0], None, [bins], [0, bins]).reshape(-1).astype(np.int64)
+    else:
+        # other integer types, bincount on small temporary copies
+        type_histogram = np.zeros(max_value + 1, dtype=np.int64)
+        for band in _bands(view):
+            band_histogram = np.bincount(band.reshape(-1), minlength=max_value + 1)
+            type_histogram[:band_histogram.size] += band_histogram[:type_histogram.size]
+            type_histogram[max_value] += band_histogram[max_value + 1:].sum()
+
+    # values above max_value (e.g. 12 bit data in a 16 bit buffer) are saturated
+    histogram = type_histogram[:max_value + 1].copy()
+    histogram[max_value] += type_histogram[max_value + 1:].sum()
+
+    return FrameStatistics(histogram, max_value, int(np.ceil(near_threshold * max_value)))
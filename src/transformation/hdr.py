@@ -0,0 +1,55 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def merge_exposures(images: Sequence[np.ndarray], exposures: Sequence[float], max_value: int = 255,
+                    reference_exposure: Optional[float] = None) -> np.ndarray:
+    """
+    Merge photos taken with different exposure times into a float radiance map. Every pixel is the
+    weighted mean of value / exposure over the photos; a pixel at max_value is saturated (same criterion
+    of `eval_saturation`) and has weight 0, the others are weighted with a hat function that trusts the
+    mid tones more than the dark values.
+
+    :param images: photos of the same scene, integer images with the same shape
+    :param exposures: exposure time of every photo
+    :param max_value: value of a saturated pixel
+    :param reference_exposure: exposure time of the output scale, None for the shortest exposure. With the
+                               shortest exposure the result is in [0, max_value] like the photos and can be
+                               given to `compute_diff_spec` without 8 bit quantization.
+    :return: float32 radiance map, in pixel values at the reference exposure
+    """
+    if len(images) != len(exposures) or not images:
+        raise ValueError('one exposure time is needed for every image')
+    if reference_exposure is None:
+        reference_exposure = min(exposures)
+
+    shape = images[0].shape
+    numerator = np.zeros(shape, dtype=np.float32)
+    denominator = np.zeros(shape, dtype=np.float32)
+    weight = np.empty(shape, dtype=np.float32)
+    value = np.empty(shape, dtype=np.float32)
+
+    half = max_value / 2
+    for img, exposure in zip(images, exposures):
+        if img.shape != shape:
+            raise ValueError('the images must have the same shape')
+        np.copyto(value, img)
+
+        # hat weight, 0 for the saturated pixels
+        np.subtract(value, half, out=weight)
+        np.abs(weight, out=weight)
+        np.subtract(half + 1, weight, out=weight)
+        weight[img >= max_value] = 0
+
+        np.multiply(value, weight, out=value)
+        np.multiply(value, reference_exposure / exposure, out=value)
+        numerator += value
+        denominator += weight
+
+    # pixels saturated in every photo: at least max_value in the shortest exposure
+    saturated_everywhere = denominator == 0
+    np.divide(numerator, denominator, out=numerator, where=~saturated_everywhere)
+    numerator[saturated_everywhere] = max_value * reference_exposure / min(exposures)
+
+    return numerator
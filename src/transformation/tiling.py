@@ -0,0 +1,143 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# bytes of the output of a band: inputs, output and scratch of a band stay in the L2 cache
+BAND_BYTES = 1 << 18
+
+# max number of threads of the default executor, the kernels are memory bound above it
+MAX_DEFAULT_WORKERS = 4
+
+
+def default_workers() -> int:
+    """
+    Threads of the default executor: ELECTROLUX_THREADS if set, else the cores up to MAX_DEFAULT_WORKERS
+    :return: number of threads
+    """
+    if os.environ.get('ELECTROLUX_THREADS'):
+        return max(1, int(os.environ['ELECTROLUX_THREADS']))
+    return max(1, min(MAX_DEFAULT_WORKERS, os.cpu_count() or 1))
+
+
+class TileExecutor:
+    def __init__(self, workers: Optional[int] = None, band_bytes: int = BAND_BYTES):
+        """
+        Run a kernel over the row bands of an image on a thread pool. The numpy ufuncs release the GIL,
+        so the bands of a frame are converted in parallel; every kernel writes its band of shared
+        output arrays and allocates only the scratch of one band, the peak memory of a call is
+        workers * band whatever the frame size.
+
+        A simple use case is:
+
+        >>> executor = TileExecutor(workers=4)
+        >>> def kernel(start, stop):
+        >>>     np.sqrt(img[start:stop], out=out[start:stop])
+        >>> executor.run(kernel, img.shape[0], out[0].nbytes)
+
+        :param workers: number of threads, the calling thread included; None for default_workers()
+        :param band_bytes: target size of the output of a band in bytes
+        """
+        self.workers = default_workers() if workers is None else max(1, workers)
+        self.band_bytes = band_bytes
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "TileExecutor":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the threads
+        :return: none
+        """
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def bands(self, rows: int, row_bytes: int) -> List[Tuple[int, int]]:
+        """
+        Split the rows in bands of about band_bytes, at least one row each
+        :param rows: number of rows
+        :param row_bytes: bytes of a row of the output
+        :return: start and stop row of every band
+        """
+        band_rows = max(1, self.band_bytes // max(row_bytes, 1))
+        return [(start, min(start + band_rows, rows)) for start in range(0, rows, band_rows)]
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers - 1, thread_name_prefix='TileExecutor')
+            return self.pool
+
+    def run(self, kernel: Callable[[int, int], None], rows: int, row_bytes: int) -> None:
+        """
+        Call kernel(start, stop) on every band and wait for all of them. The kernels must not call the
+        executor again.
+        :param kernel: function of a band, it writes its rows of the outputs
+        :param rows: number of rows, the size of the first axis of the image
+        :param row_bytes: bytes of a row of the output
+        :return: none
+        """
+        bands = self.bands(rows, row_bytes)
+        workers = min(self.workers, len(bands))
+        if workers <= 1:
+            for start, stop in bands:
+                kernel(start, stop)
+            return
+
+        # every thread takes the next band, a slow band does not leave the others idle
+        remaining = iter(bands)
+        lock = threading.Lock()
+
+        def work() -> None:
+            while True:
+                with lock:
+                    band = next(remaining, None)
+                if band is None:
+                    return
+                kernel(*band)
+
+        pool = self._pool()
+        futures = [pool.submit(work) for _ in range(workers - 1)]
+        try:
+            work()
+        finally:
+            for future in futures:
+                future.result()
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def default_executor() -> TileExecutor:
+    """
+    Executor shared by the transformation functions
+    :return: executor
+    """
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = TileExecutor()
+        return _default_executor
+
+
+def configure(workers: Optional[int] = None, band_bytes: int = BAND_BYTES) -> TileExecutor:
+    """
+    Replace the shared executor, e.g. from the config
+    :param workers: number of threads, None for default_workers()
+    :param band_bytes: target size of the output of a band in bytes
+    :return: new shared executor
+    """
+    global _default_executor
+    with _default_lock:
+        old, _default_executor = _default_executor, TileExecutor(workers, band_bytes)
+    if old is not None:
+        old.close()
+    return _default_executor
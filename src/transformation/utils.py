@@ -1,13 +1,22 @@
+from typing import Optional
+
 import numpy as np
 
+from src.transformation.frame_stats import count_saturated
+from src.transformation.tiling import TileExecutor, default_executor
+from src.utils.instrumentation import metrics
+
 
-def min_max_scaling(img: np.ndarray, min_x: float = None, max_x: float = None) -> np.ndarray:
+def min_max_scaling(img: np.ndarray, min_x: float = None, max_x: float = None, out: Optional[np.ndarray] = None,
+                    executor: Optional[TileExecutor] = None) -> np.ndarray:
     """
     (img-min_X)/(max_X-min_X)
 
     :param img: image to scale
     :param min_x: min value
     :param max_x: max value
+    :param out: output image, None to allocate it
+    :param executor: executor of the row bands, None for the shared one
     :return: rescaled image
     """
 
@@ -15,20 +24,38 @@ def min_max_scaling(img: np.ndarray, min_x: float = None, max_x: float = None) -
         min_x = np.min(img)
     if max_x is None:
         max_x = np.max(img)
-    output_img = (img - min_x) / (max_x - min_x)
+    if img.ndim == 0:
+        return (img - min_x) / (max_x - min_x)
+
+    if out is None:
+        # type of the result of the formula, computed on an empty slice
+        out = np.empty(img.shape, dtype=((img[:0] - min_x) / (max_x - min_x)).dtype)
+    if out.shape != img.shape:
+        raise ValueError('out must have the shape of the image')
 
-    return output_img
+    def kernel(start: int, stop: int) -> None:
+        np.divide(img[start:stop] - min_x, max_x - min_x, out=out[start:stop])
 
+    (executor or default_executor()).run(kernel, img.shape[0], out[:1].nbytes)
+    return out
 
-def eval_saturation(input_img: np.ndarray) -> float:
+
+@metrics.timed('eval_saturation')
+def eval_saturation(input_img: np.ndarray, max_value: int = None) -> float:
     """
     Contain % of white pixel in the image
     :param input_img: input image
+    :param max_value: value of a white pixel, the max value of the sensor (e.g. 4095 for 12 bit), None for 255
     :return: float number that represents the % of white pixel
     """
 
+    if input_img.dtype == np.uint8 or (max_value is not None and np.issubdtype(input_img.dtype, np.integer)):
+        # count band by band, no full size mask
+        total_white, total_pixel = count_saturated(input_img, 255 if max_value is None else max_value)
+        return (total_white * 100) / total_pixel
+
     # create mask and calculate result
-    white_mask = input_img == 255
+    white_mask = input_img == (255 if max_value is None else max_value)
     total_pixel = white_mask.size
     total_white = np.sum(white_mask)
     result_value = (total_white * 100) / total_pixel
@@ -0,0 +1,220 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.transformation.frame_stats import count_saturated
+from src.utils.filenames import ORTHOGONAL_FILTERS, PARALLEL_FILTERS, acquisition_filename
+from src.utils.image_writer import write_image
+
+FRAMES_FILE = 'frames.raw'
+INDEX_FILE = 'index.raw'
+HEADER_FILE = 'header.json'
+
+# one record of the metadata index for every frame
+INDEX_DTYPE = np.dtype([
+    ('exposure', '<i8'),
+    ('gain', '<i4'),
+    ('saturation', '<f4'),
+    ('timestamp', '<f8'),
+    ('serial', 'S16'),
+    ('material', 'S32'),
+    ('filter', 'S32'),
+])
+
+
+class CaptureContainer:
+    def __init__(self, path, shape: Optional[Tuple[int, ...]] = None, dtype=np.uint8,
+                 max_value: Optional[int] = None):
+        """
+        Append-only container of frames with the same shape: a raw file with the frames one after the
+        other, a raw index with a fixed size record of every frame and a json header. The frames are
+        read without copies through np.memmap.
+
+        A simple use case is:
+
+        >>> with CaptureContainer('data/run1.capture', cam.get_format(), cam.pixel_format.dtype,
+        >>>                       cam.max_value) as container:
+        >>>     cam.record(container, 10, material='forno1', filter_name='ortogonale')
+        >>>     diffuse, specular = compute_diff_spec_uint8(*container.latest_pair('forno1'))
+
+        :param path: directory of the container
+        :param shape: shape of a frame, needed only to create the container
+        :param dtype: type of the frames, used only to create the container
+        :param max_value: value of a saturated pixel, None for the max of the type
+        """
+        self.path = Path(path)
+        header_path = self.path / HEADER_FILE
+        if header_path.exists():
+            with header_path.open() as filestream:
+                header = json.load(filestream)
+            if shape is not None and tuple(shape) != tuple(header["shape"]):
+                raise ValueError('the container has frames of shape {}'.format(tuple(header["shape"])))
+        else:
+            if shape is None:
+                raise FileNotFoundError('{} is not a capture container, give the shape to create it'.format(path))
+            dtype = np.dtype(dtype)
+            header = {
+                "shape": [int(size) for size in shape],
+                "dtype": dtype.str,
+                "max_value": int(np.iinfo(dtype).max if max_value is None else max_value),
+            }
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_path = header_path.with_suffix('.tmp')
+            with tmp_path.open('w') as filestream:
+                json.dump(header, filestream, indent=2)
+            os.replace(tmp_path, header_path)
+
+        self.shape = tuple(header["shape"])
+        self.dtype = np.dtype(header["dtype"])
+        self.max_value = header["max_value"]
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # frames of an interrupted append without their index record are ignored and overwritten
+        self.count = (self.path / INDEX_FILE).stat().st_size // INDEX_DTYPE.itemsize \
+            if (self.path / INDEX_FILE).exists() else 0
+        self.frames_file = None
+        self.index_file = None
+        self._frames = None
+        self._index = None
+
+    def __enter__(self) -> "CaptureContainer":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        """
+        Flush and close the files, the arrays already returned stay valid
+        :return: none
+        """
+        for filestream in (self.frames_file, self.index_file):
+            if filestream is not None:
+                filestream.close()
+        self.frames_file = None
+        self.index_file = None
+
+    def _open_for_append(self) -> None:
+        """
+        Open the files after the last complete frame, the tail of an interrupted append is cut away
+        """
+        files = []
+        for name, size in ((FRAMES_FILE, self.count * self.frame_bytes), (INDEX_FILE, self.count * INDEX_DTYPE.itemsize)):
+            filestream = (self.path / name).open('r+b' if (self.path / name).exists() else 'w+b')
+            filestream.truncate(size)
+            filestream.seek(0, os.SEEK_END)
+            files.append(filestream)
+        self.frames_file, self.index_file = files
+
+    def append(self, img: np.ndarray, exposure: int, saturation: Optional[float] = None, serial: str = '',
+               material: str = '', filter_name: str = '', gain: int = 0,
+               timestamp: Optional[float] = None) -> int:
+        """
+        Append a frame, the frame is written before its index record so a crash never leaves a record
+        without its frame
+        :param img: frame with the shape and the type of the container
+        :param exposure: exposure time
+        :param saturation: % of saturated pixels, None to compute it
+        :param serial: serial of the camera
+        :param material: material
+        :param filter_name: filter
+        :param gain: gain
+        :param timestamp: time of the capture, None for now
+        :return: index of the frame
+        """
+        if img.shape != self.shape or img.dtype != self.dtype:
+            raise ValueError('the frame must have shape {} and type {}'.format(self.shape, self.dtype))
+        if saturation is None:
+            saturated, total = count_saturated(img, self.max_value)
+            saturation = saturated * 100 / total
+        if self.frames_file is None:
+            self._open_for_append()
+
+        self.frames_file.write(memoryview(np.ascontiguousarray(img)).cast('B'))
+        self.frames_file.flush()
+        record = np.array([(exposure, gain, saturation, time.time() if timestamp is None else timestamp,
+                            serial.encode(), material.encode(), filter_name.encode())], dtype=INDEX_DTYPE)
+        self.index_file.write(record.tobytes())
+        self.index_file.flush()
+
+        self.count += 1
+        return self.count - 1
+
+    @property
+    def frames(self) -> np.ndarray:
+        """
+        Read only memory map of the frames, shape (count, *shape)
+        """
+        if self._frames is None or len(self._frames) != self.count:
+            if self.count == 0:
+                return np.empty((0,) + self.shape, dtype=self.dtype)
+            self._frames = np.memmap(self.path / FRAMES_FILE, dtype=self.dtype, mode='r',
+                                     shape=(self.count,) + self.shape)
+        return self._frames
+
+    @property
+    def index(self) -> np.ndarray:
+        """
+        Read only memory map of the metadata records, see INDEX_DTYPE
+        """
+        if self._index is None or len(self._index) != self.count:
+            if self.count == 0:
+                return np.empty(0, dtype=INDEX_DTYPE)
+            self._index = np.memmap(self.path / INDEX_FILE, dtype=INDEX_DTYPE, mode='r', shape=(self.count,))
+        return self._index
+
+    def select(self, material: Optional[str] = None, filter_names: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Find frames
+        :param material: material, None for every material
+        :param filter_names: accepted filters, None for every filter
+        :return: indexes of the frames in capture order
+        """
+        index = self.index
+        mask = np.ones(len(index), dtype=bool)
+        if material is not None:
+            mask &= index['material'] == material.encode()
+        if filter_names is not None:
+            mask &= np.isin(index['filter'], [name.encode() for name in filter_names])
+        return np.nonzero(mask)[0]
+
+    def latest_pair(self, material: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Newest orthogonal and parallel frames of a material, ready for compute_diff_spec
+        :param material: material
+        :return: orthogonal frame and parallel frame, views of the memory map
+        """
+        orthogonal = self.select(material, ORTHOGONAL_FILTERS)
+        parallel = self.select(material, PARALLEL_FILTERS)
+        if len(orthogonal) == 0 or len(parallel) == 0:
+            raise KeyError('no orthogonal and parallel frames of {}'.format(material))
+        return self.frames[orthogonal[-1]], self.frames[parallel[-1]]
+
+    def export_png(self, directory, indexes: Optional[Sequence[int]] = None, writer=None) -> List[Path]:
+        """
+        Write frames as loose acquisition files <material>_<filter>_<gain>_<exposure>.png
+        :param directory: output directory
+        :param indexes: frames to export, None for all
+        :param writer: ImageWriter that encodes the files in background, None to write them here
+        :return: paths of the files
+        """
+        directory = Path(directory)
+        indexes = range(self.count) if indexes is None else indexes
+        paths = []
+        for i in indexes:
+            record = self.index[i]
+            name = acquisition_filename(record['material'].decode(), record['filter'].decode(),
+                                        int(record['exposure']), int(record['gain']))
+            img = self.frames[i]
+            if writer is None:
+                paths.append(write_image(directory / name, img))
+            else:
+                paths.append(writer.write(directory / name, img))
+        return paths
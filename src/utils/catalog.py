@@ -0,0 +1,218 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from src.utils.filenames import parse_acquisition_name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    name TEXT,
+    material TEXT,
+    filter TEXT,
+    gain INTEGER,
+    exposure INTEGER,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS files_material_filter ON files (material, filter, mtime);
+CREATE INDEX IF NOT EXISTS files_filter_gain ON files (filter, gain);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+"""
+
+
+class CatalogEntry:
+    def __init__(self, path: str, name: str, material: str, filter_name: str, gain: int, exposure: int, size: int,
+                 mtime: float):
+        """
+        Acquisition file of the catalog
+        :param path: path of the file
+        :param name: name of the file
+        :param material: material
+        :param filter_name: filter
+        :param gain: gain
+        :param exposure: exposure time
+        :param size: size in bytes
+        :param mtime: modification time
+        """
+        self.path = path
+        self.name = name
+        self.material = material
+        self.filter_name = filter_name
+        self.gain = gain
+        self.exposure = exposure
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self) -> str:
+        return 'CatalogEntry({})'.format(self.path)
+
+
+class AcquisitionCatalog:
+    def __init__(self, path: Path = Path("data") / "catalog.sqlite"):
+        """
+        Index of the acquisition files (<material>_<filter>_<gain>_<exposure>.png) in a SQLite database.
+
+        A simple use case is:
+
+        >>> catalog = AcquisitionCatalog()
+        >>> catalog.update('data/acquisizione_4')
+        >>> files = catalog.query(material='forno1', filter_name='ortogonale')
+
+        :param path: database file, ':memory:' for a temporary catalog
+        """
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "AcquisitionCatalog":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @staticmethod
+    def _prefix_range(directory) -> Tuple[str, str]:
+        """
+        Range of the paths inside a directory, it uses the index of the primary key
+        """
+        prefix = os.path.join(os.path.abspath(directory), '')
+        return prefix, prefix + '\uffff'
+
+    def update(self, directory, full: bool = False) -> int:
+        """
+        Bring the catalog up to date with a directory tree. Only the directories with a new mtime are
+        listed again, which covers created, deleted and renamed files; use full to check also the
+        files rewritten in place.
+        :param directory: root of the acquisitions
+        :param full: list every directory and stat every file
+        :return: number of directories listed again
+        """
+        rescanned = 0
+        with self.connection:
+            stack = [os.path.abspath(directory)]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    self._forget_directory(path)
+                    continue
+
+                row = self.connection.execute('SELECT mtime_ns FROM directories WHERE path = ?', (path,)).fetchone()
+                if row is not None and row[0] == mtime_ns and not full:
+                    # nothing was added or removed here, go on with the known sub directories
+                    stack.extend(child for child, in self.connection.execute(
+                        'SELECT path FROM directories WHERE parent = ?', (path,)))
+                    continue
+
+                stack.extend(self._scan_directory(path, mtime_ns))
+                rescanned += 1
+
+        return rescanned
+
+    def _scan_directory(self, path: str, mtime_ns: int) -> List[str]:
+        """
+        List a directory and update its files
+        :param path: directory
+        :param mtime_ns: modification time of the directory
+        :return: sub directories
+        """
+        sub_directories = []
+        rows = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                    continue
+                if not entry.name.endswith('.png'):
+                    continue
+                name = parse_acquisition_name(entry.name)
+                if name is None:
+                    continue
+                stat = entry.stat()
+                rows.append((entry.path, path, entry.name, name.material, name.filter_name, name.gain, name.exposure,
+                             stat.st_size, stat.st_mtime))
+
+        self.connection.execute('DELETE FROM files WHERE directory = ?', (path,))
+        self.connection.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+        # forget the sub directories that do not exist anymore
+        known = {child for child, in self.connection.execute('SELECT path FROM directories WHERE parent = ?', (path,))}
+        for child in known - set(sub_directories):
+            self._forget_directory(child)
+
+        self.connection.execute('INSERT OR REPLACE INTO directories VALUES (?, ?, ?)',
+                                (path, os.path.dirname(path), mtime_ns))
+        return sub_directories
+
+    def _forget_directory(self, path: str) -> None:
+        low, high = self._prefix_range(path)
+        self.connection.execute('DELETE FROM files WHERE path >= ? AND path < ?', (low, high))
+        self.connection.execute('DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)', (path, low, high))
+
+    def query(self, material: Optional[str] = None, filter_name: Optional[str] = None, directory=None) \
+            -> List[CatalogEntry]:
+        """
+        Find acquisition files
+        :param material: material, None for every material
+        :param filter_name: filter, None for every filter
+        :param directory: directory tree, None for the whole catalog
+        :return: files sorted by path
+        """
+        conditions, params = self._conditions(material, filter_name, directory)
+        rows = self.connection.execute(
+            'SELECT path, name, material, filter, gain, exposure, size, mtime FROM files {} ORDER BY path'.format(
+                conditions), params)
+        return [CatalogEntry(*row) for row in rows]
+
+    def gain_range(self, filter_name: Optional[str] = None, directory=None, material: Optional[str] = None) \
+            -> Tuple[Optional[int], Optional[int]]:
+        """
+        Min and max gain of the acquisition files
+        :param filter_name: filter, None for every filter
+        :param directory: directory tree, None for the whole catalog
+        :param material: material, None for every material
+        :return: min and max gain, None if there are no files
+        """
+        conditions, params = self._conditions(material, filter_name, directory)
+        return self.connection.execute('SELECT MIN(gain), MAX(gain) FROM files {}'.format(conditions),
+                                       params).fetchone()
+
+    def latest_exposure(self, material: str, filter_name: str) -> Optional[int]:
+        """
+        Exposure of the newest acquisition of a material and filter
+        :param material: material
+        :param filter_name: filter
+        :return: exposure time, None if there are no files
+        """
+        row = self.connection.execute(
+            'SELECT exposure FROM files WHERE material = ? AND filter = ? ORDER BY mtime DESC LIMIT 1',
+            (material, filter_name)).fetchone()
+        return None if row is None else row[0]
+
+    def _conditions(self, material: Optional[str], filter_name: Optional[str], directory) -> Tuple[str, list]:
+        conditions = []
+        params = []
+        if material is not None:
+            conditions.append('material = ?')
+            params.append(material)
+        if filter_name is not None:
+            conditions.append('filter = ?')
+            params.append(filter_name)
+        if directory is not None:
+            conditions.append('path >= ? AND path < ?')
+            params.extend(self._prefix_range(directory))
+        return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
@@ -0,0 +1,53 @@
+from pathlib import Path
+from typing import Optional
+
+# filters with the polarizer orthogonal and parallel to the light
+ORTHOGONAL_FILTERS = ('ortogonale', 'filtroortogonale')
+PARALLEL_FILTERS = ('parallelo', 'filtroparallelo')
+
+
+class AcquisitionName:
+    def __init__(self, material: str, filter_name: str, gain: int, exposure: int):
+        """
+        Fields of an acquisition file name, <material>_<filter>_<gain>_<exposure>.png
+        :param material: material
+        :param filter_name: filter
+        :param gain: gain
+        :param exposure: exposure time
+        """
+        self.material = material
+        self.filter_name = filter_name
+        self.gain = gain
+        self.exposure = exposure
+
+    def __repr__(self) -> str:
+        return acquisition_filename(self.material, self.filter_name, self.exposure, self.gain)
+
+
+def parse_acquisition_name(path) -> Optional[AcquisitionName]:
+    """
+    Parse the name of an acquisition file
+    :param path: path or name of the file
+    :return: fields of the name, None if the name does not follow the convention
+    """
+    parts = Path(path).stem.rsplit('_', 3)
+    if len(parts) != 4:
+        return None
+    material, filter_name, gain, exposure = parts
+    if not material or not gain.isdigit() or not exposure.isdigit():
+        return None
+    return AcquisitionName(material, filter_name, int(gain), int(exposure))
+
+
+def acquisition_filename(material: str, filter_name: str, exposure: int, gain: int = 0, extension: str = '.png') \
+        -> str:
+    """
+    Name of an acquisition file, same convention of `main_automatic_acquisition`
+    :param material: material
+    :param filter_name: filter
+    :param exposure: exposure time
+    :param gain: gain
+    :param extension: extension of the file
+    :return: file name
+    """
+    return '{}_{}_{:02d}_{:06d}{}'.format(material, filter_name, gain, exposure, extension)
@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.utils.instrumentation import metrics
+
+PNG = 'png'
+TIFF = 'tiff'
+NPY = 'npy'
+
+EXTENSIONS = {PNG: '.png', TIFF: '.tiff', NPY: '.npy'}
+
+# TIFF compression tag of an uncompressed file
+TIFF_COMPRESSION_NONE = 1
+
+
+class ImageWriterError(Exception):
+    def __init__(self, failed: List[Tuple[str, Exception]]):
+        self.failed = failed
+        super().__init__('ImageWriterError: {} images not written, first: {} ({})'.format(
+            len(failed), failed[0][0], failed[0][1]))
+
+
+def output_path(path, image_format: str) -> Path:
+    """
+    Path of the file written for a format, the extension is the one of the format
+    :param path: requested path
+    :param image_format: 'png', 'tiff' or 'npy'
+    :return: path
+    """
+    if image_format not in EXTENSIONS:
+        raise ValueError('unknown image format: {}'.format(image_format))
+    return Path(path).with_suffix(EXTENSIONS[image_format])
+
+
+@metrics.timed('imwrite')
+def write_image(path, img: np.ndarray, image_format: str = PNG, png_level: Optional[int] = None) -> Path:
+    """
+    Encode and write an image atomically: the data goes to a temporary file of the same directory
+    that is renamed on the final path, a reader never sees a partial file
+    :param path: path of the image, the extension is replaced by the one of the format
+    :param img: image
+    :param image_format: 'png', 'tiff' (uncompressed) or 'npy' (raw array, no encoding)
+    :param png_level: compression level of the png, 0 (fast, big) to 9 (slow, small), None for the default of cv2
+    :return: path of the written file
+    """
+    path = output_path(path, image_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name('.{}.{}.tmp'.format(path.name, threading.get_ident()))
+
+    try:
+        with tmp_path.open('wb') as filestream:
+            if image_format == NPY:
+                np.save(filestream, img)
+            else:
+                if image_format == PNG:
+                    params = [] if png_level is None else [cv2.IMWRITE_PNG_COMPRESSION, png_level]
+                else:
+                    params = [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION_NONE]
+                ok, data = cv2.imencode(EXTENSIONS[image_format], img, params)
+                if not ok:
+                    raise IOError('cannot encode {}'.format(path))
+                filestream.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+    return path
+
+
+class ImageWriter:
+    def __init__(self, image_format: str = PNG, png_level: Optional[int] = None, workers: int = 2,
+                 max_queue: int = 8):
+        """
+        Write images in background threads, the encoders of cv2 and numpy release the GIL so the
+        capture thread keeps running while the images are compressed. When the disk falls behind the
+        queue fills up and `write` blocks (backpressure) instead of keeping every frame in memory.
+
+        A simple use case is:
+
+        >>> with ImageWriter('png', png_level=1) as writer:
+        >>>     writer.write('data/forno1_ortogonale_00_100000.png', img)
+
+        :param image_format: 'png', 'tiff' or 'npy'
+        :param png_level: compression level of the png, 0 to 9, None for the default of cv2
+        :param workers: number of writer threads
+        :param max_queue: max number of images waiting to be written
+        """
+        output_path('image', image_format)
+        self.image_format = image_format
+        self.png_level = png_level
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # statistics
+        self.written = 0
+        self.bytes_written = 0
+        self.encode_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.failed = []
+
+        self.threads = [threading.Thread(target=self._run, name='ImageWriter-{}'.format(i), daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self) -> "ImageWriter":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.close()
+
+    def write(self, path, img: np.ndarray, image_format: Optional[str] = None,
+              timeout: Optional[float] = None) -> Path:
+        """
+        Queue an image, the image must not be changed until it is written
+        :param path: path of the image, the extension is replaced by the one of the format
+        :param img: image
+        :param image_format: format of this image, None for the format of the writer
+        :param timeout: max waiting time for a place in the queue in seconds, None wait forever
+        :return: path of the file that will be written
+        """
+        if self.closed:
+            raise RuntimeError('the image writer is closed')
+        image_format = image_format or self.image_format
+        path = output_path(path, image_format)
+
+        start = time.perf_counter()
+        self.jobs.put((path, img, image_format), timeout=timeout)
+        waited = time.perf_counter() - start
+        with self.lock:
+            self.blocked_seconds += waited
+
+        return path
+
+    def flush(self) -> None:
+        """
+        Wait until every queued image is written
+        :return: none
+        """
+        self.jobs.join()
+        with self.lock:
+            failed, self.failed = self.failed, []
+        if failed:
+            raise ImageWriterError(failed)
+
+    def close(self) -> None:
+        """
+        Write the queued images and stop the threads
+        :return: none
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            for _ in self.threads:
+                self.jobs.put(None)
+            for thread in self.threads:
+                thread.join()
+
+    def _run(self) -> None:
+        """
+        Writer loop
+        :return: none
+        """
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                path, img, image_format = job
+                start = time.perf_counter()
+                try:
+                    write_image(path, img, image_format, self.png_level)
+                    size = path.stat().st_size
+                except Exception as e:
+                    with self.lock:
+                        self.failed.append((str(path), e))
+                    continue
+                with self.lock:
+                    self.written += 1
+                    self.bytes_written += size
+                    self.encode_seconds += time.perf_counter() - start
+            finally:
+                self.jobs.task_done()
@@ -0,0 +1,200 @@
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class _NullSpan:
+    """
+    Span of a disabled instrumentation, it does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('samples', 'start')
+
+    def __init__(self, samples: array):
+        self.samples = samples
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exit_type, value, traceback) -> None:
+        self.samples.append(time.perf_counter_ns() - self.start)
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = False):
+        """
+        Latency of the named stages of acquisition and processing, every span adds a sample in
+        nanoseconds to its stage. When disabled a span is a shared object that does nothing.
+
+        A simple use case is:
+
+        >>> metrics.enable()
+        >>> with span('eval_saturation'):
+        >>>     # do some stuff
+        >>> metrics.report()
+
+        :param enabled: record the spans
+        """
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """
+        Forget every sample
+        :return: none
+        """
+        with self.lock:
+            self.stages = {}
+
+    def _samples(self, name: str) -> array:
+        samples = self.stages.get(name)
+        if samples is None:
+            with self.lock:
+                samples = self.stages.setdefault(name, array('q'))
+        return samples
+
+    def span(self, name: str):
+        """
+        Measure the time of a block
+        :param name: name of the stage
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._samples(name))
+
+    def record(self, name: str, elapsed_ns: int) -> None:
+        """
+        Add a sample measured elsewhere
+        :param name: name of the stage
+        :param elapsed_ns: time in nanoseconds
+        :return: none
+        """
+        if self.enabled:
+            self._samples(name).append(elapsed_ns)
+
+    def timed(self, name: str) -> Callable:
+        """
+        Decorator that measures every call of a function
+        :param name: name of the stage
+        :return: decorator
+        """
+        def decorator(fun: Callable) -> Callable:
+            @functools.wraps(fun)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fun(*args, **kwargs)
+                with _Span(self._samples(name)):
+                    return fun(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Statistics of every stage in milliseconds
+        :return: count, total, mean, percentiles and max of every stage
+        """
+        result = {}
+        for name, samples in sorted(self.stages.items()):
+            if not samples:
+                continue
+            values = np.frombuffer(samples.tobytes(), dtype=np.int64) / 1e6
+            stats = {'count': int(values.size), 'total_ms': float(values.sum()), 'mean_ms': float(values.mean())}
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                stats['p{}_ms'.format(percentile)] = float(value)
+            stats['max_ms'] = float(values.max())
+            result[name] = stats
+        return result
+
+    def histograms(self) -> Dict[str, dict]:
+        """
+        Latency histogram of every stage with power of 2 buckets in microseconds
+        :return: upper bound of every bucket and number of samples in it
+        """
+        result = {}
+        for name, samples in sorted(self.stages.items()):
+            if not samples:
+                continue
+            micros = np.maximum(np.frombuffer(samples.tobytes(), dtype=np.int64) // 1000, 1)
+            exponents = np.ceil(np.log2(micros)).astype(int)
+            counts = np.bincount(exponents)
+            result[name] = {'upper_us': [1 << int(i) for i in np.nonzero(counts)[0]],
+                            'count': [int(c) for c in counts[counts > 0]]}
+        return result
+
+    def report(self) -> None:
+        """
+        Print p50, p95 and p99 of every stage
+        :return: none
+        """
+        print('{:22s} {:>7s} {:>10s} {:>9s} {:>9s} {:>9s} {:>9s}'.format(
+            'stage', 'count', 'total ms', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        for name, stats in self.summary().items():
+            print('{:22s} {:7d} {:10.2f} {:9.3f} {:9.3f} {:9.3f} {:9.3f}'.format(
+                name, stats['count'], stats['total_ms'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                stats['max_ms']))
+
+    def save(self, path) -> None:
+        """
+        Write summary and histograms, json or csv (summary only) from the extension
+        :param path: output file, .json or .csv
+        :return: none
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        if path.suffix == '.csv':
+            with path.open('w', newline='') as filestream:
+                writer = csv.writer(filestream)
+                columns = ['count', 'total_ms', 'mean_ms'] + ['p{}_ms'.format(p) for p in PERCENTILES] + ['max_ms']
+                writer.writerow(['stage'] + columns)
+                for name, stats in summary.items():
+                    writer.writerow([name] + [stats[column] for column in columns])
+        else:
+            with path.open('w') as filestream:
+                json.dump({'summary': summary, 'histograms': self.histograms()}, filestream, indent=2)
+
+
+# shared instrumentation of the package, enabled by the config or by ELECTROLUX_METRICS=1
+metrics = Instrumentation(os.environ.get('ELECTROLUX_METRICS', '') == '1')
+
+
+def span(name: str):
+    """
+    Measure the time of a block with the shared instrumentation
+    :param name: name of the stage
+    :return: context manager
+    """
+    if not metrics.enabled:
+        return _NULL_SPAN
+    return _Span(metrics._samples(name))
@@ -0,0 +1,164 @@
+"""
+The lookup tables and the banded kernels of src.transformation.conversions must give the results
+of the reference implementations with masks:
+
+    python -m pytest -q tests
+"""
+import numpy as np
+import pytest
+
+from src.transformation.conversions import compute_diff_spec, compute_diff_spec_uint8, linear_to_srgb, \
+    linear_to_srgb_reference, srgb_to_linear, srgb_to_linear_reference
+from src.transformation.tiling import TileExecutor
+from src.transformation.utils import min_max_scaling
+
+CONVERSIONS = (
+    (linear_to_srgb, linear_to_srgb_reference),
+    (srgb_to_linear, srgb_to_linear_reference),
+)
+
+# 1d, 0d, empty, single pixel, odd sizes and channels
+SHAPES = ((257, 311, 3), (31,), (), (0, 5), (1, 1), (7, 13), (3, 5, 7))
+
+# around the thresholds of the two conversions and the clipping at 0 and 1
+FLOAT_EDGES = np.array([-1.0, -1e-12, 0.0, 1e-12, 0.0031308, 0.0031309, 0.04045, 0.04046, 0.5, 1.0 - 1e-12, 1.0,
+                        1.0 + 1e-12, 2.0])
+UINT8_EDGES = np.array([0, 1, 2, 10, 11, 127, 128, 254, 255], dtype=np.uint8)
+
+
+def diff_spec_reference(orthogonal: np.ndarray, parallel: np.ndarray, max_value: int = 255) -> tuple:
+    """
+    compute_diff_spec made of the reference conversions, as it was before the banded kernel
+    """
+    linear_orthogonal = srgb_to_linear_reference(min_max_scaling(orthogonal.astype(float), 0, max_value))
+    linear_parallel = srgb_to_linear_reference(min_max_scaling(parallel.astype(float), 0, max_value))
+    return linear_to_srgb_reference(linear_orthogonal * 2), linear_to_srgb_reference(linear_parallel - linear_orthogonal)
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(0)
+
+
+@pytest.fixture(params=['shared', 'small bands'])
+def executor(request):
+    # small bands: many bands and a second thread even on small images
+    if request.param == 'shared':
+        yield None
+    else:
+        with TileExecutor(2, 64) as executor:
+            yield executor
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+@pytest.mark.parametrize('shape', SHAPES)
+def test_float64(fast, reference, shape, rng, executor):
+    img = rng.uniform(-0.1, 1.1, size=shape)
+    np.testing.assert_allclose(fast(img, executor=executor), reference(img), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+@pytest.mark.parametrize('shape', SHAPES)
+def test_float32(fast, reference, shape, rng, executor):
+    img = rng.uniform(-0.1, 1.1, size=shape).astype(np.float32)
+    out = np.empty(shape, dtype=np.float32)
+    assert fast(img, out=out, executor=executor) is out
+    np.testing.assert_allclose(out, reference(img.astype(float)), rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+def test_float_edges(fast, reference, executor):
+    np.testing.assert_allclose(fast(FLOAT_EDGES, executor=executor), reference(FLOAT_EDGES), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+@pytest.mark.parametrize('shape', SHAPES)
+def test_uint8_lut(fast, reference, shape, rng, executor):
+    img = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    expected = reference(min_max_scaling(img.astype(float), 0, 255))
+    np.testing.assert_array_equal(fast(img, executor=executor), expected)
+    out = np.empty(shape, dtype=np.float32)
+    np.testing.assert_array_equal(fast(img, out=out, executor=executor), expected.astype(np.float32))
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+def test_uint8_edges(fast, reference, executor):
+    img = np.concatenate([UINT8_EDGES, np.arange(256, dtype=np.uint8)])
+    np.testing.assert_array_equal(fast(img, executor=executor),
+                                  reference(min_max_scaling(img.astype(float), 0, 255)))
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+def test_uint8_not_contiguous(fast, reference, rng):
+    img = rng.integers(0, 256, size=(64, 96), dtype=np.uint8)[::3, 1::2]
+    np.testing.assert_array_equal(fast(img), reference(min_max_scaling(img.astype(float), 0, 255)))
+
+
+@pytest.mark.parametrize('fast, reference', CONVERSIONS)
+@pytest.mark.parametrize('max_value', [None, 1023, 4095])
+def test_uint16_lut(fast, reference, max_value, rng, executor):
+    white = 65535 if max_value is None else max_value
+    # values above max_value are white
+    img = rng.integers(0, 65536, size=(61, 37), dtype=np.uint16)
+    img[0, :3] = (0, white, min(white + 1, 65535))
+    expected = reference(min_max_scaling(img.astype(float), 0, white))
+    np.testing.assert_array_equal(fast(img, max_value=max_value, executor=executor), expected)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_compute_diff_spec(shape, rng, executor):
+    orthogonal = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    parallel = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    diffuse, pure_specular = compute_diff_spec(orthogonal, parallel, executor=executor)
+    expected_diffuse, expected_pure_specular = diff_spec_reference(orthogonal, parallel)
+    np.testing.assert_allclose(diffuse, expected_diffuse, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(pure_specular, expected_pure_specular, rtol=0, atol=1e-12)
+
+
+def test_compute_diff_spec_every_pair(executor):
+    # every (orthogonal, parallel) pair of 8 bit values
+    orthogonal, parallel = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8))
+    out_diffuse = np.empty(orthogonal.shape)
+    out_pure_specular = np.empty(orthogonal.shape)
+    compute_diff_spec(orthogonal, parallel, 255, out_diffuse, out_pure_specular, executor)
+    expected_diffuse, expected_pure_specular = diff_spec_reference(orthogonal, parallel)
+    np.testing.assert_allclose(out_diffuse, expected_diffuse, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(out_pure_specular, expected_pure_specular, rtol=0, atol=1e-12)
+
+
+def test_compute_diff_spec_12_bit(rng, executor):
+    orthogonal = rng.integers(0, 4096, size=(33, 65), dtype=np.uint16)
+    parallel = rng.integers(0, 4096, size=(33, 65), dtype=np.uint16)
+    orthogonal[0, :2] = parallel[0, 2:4] = (0, 4095)
+    for result, expected in zip(compute_diff_spec(orthogonal, parallel, 4095, executor=executor),
+                                diff_spec_reference(orthogonal, parallel, 4095)):
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+
+
+def test_compute_diff_spec_uint8_every_pair():
+    orthogonal, parallel = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8))
+    diffuse, pure_specular = compute_diff_spec_uint8(orthogonal, parallel)
+    expected_diffuse, expected_pure_specular = diff_spec_reference(orthogonal, parallel)
+    np.testing.assert_array_equal(diffuse, np.rint(255 * expected_diffuse).astype(np.uint8))
+    np.testing.assert_array_equal(pure_specular, np.rint(255 * expected_pure_specular).astype(np.uint8))
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_compute_diff_spec_uint8(shape, rng):
+    orthogonal = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    parallel = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    out_diffuse = np.empty(shape, dtype=np.uint8)
+    out_pure_specular = np.empty(shape, dtype=np.uint8)
+    compute_diff_spec_uint8(orthogonal, parallel, out_diffuse, out_pure_specular)
+    expected_diffuse, expected_pure_specular = diff_spec_reference(orthogonal, parallel)
+    np.testing.assert_array_equal(out_diffuse, np.rint(255 * expected_diffuse).astype(np.uint8))
+    np.testing.assert_array_equal(out_pure_specular, np.rint(255 * expected_pure_specular).astype(np.uint8))
+
+
+def test_compute_diff_spec_uint8_not_contiguous(rng):
+    orthogonal = rng.integers(0, 256, size=(80, 120), dtype=np.uint8)[1::2, ::3]
+    parallel = rng.integers(0, 256, size=(80, 120), dtype=np.uint8)[::2, 1::3]
+    diffuse, pure_specular = compute_diff_spec_uint8(orthogonal, parallel)
+    expected_diffuse, expected_pure_specular = diff_spec_reference(orthogonal, parallel)
+    np.testing.assert_array_equal(diffuse, np.rint(255 * expected_diffuse).astype(np.uint8))
+    np.testing.assert_array_equal(pure_specular, np.rint(255 * expected_pure_specular).astype(np.uint8))